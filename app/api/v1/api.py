@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, users, products, companies, orders, employees, accounts
+from app.api.v1.endpoints import auth, users, products, companies, orders, employees, accounts, admin, batch, stock, events, jobs
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
@@ -9,4 +9,9 @@ api_router.include_router(products.router, prefix="/products", tags=["products"]
 api_router.include_router(companies.router, prefix="/companies", tags=["companies"])
 api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
 api_router.include_router(employees.router, prefix="/employees", tags=["employees"])
-api_router.include_router(accounts.router, prefix="/accounts", tags=["accounts"])
\ No newline at end of file
+api_router.include_router(accounts.router, prefix="/accounts", tags=["accounts"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
+api_router.include_router(batch.router, prefix="/batch", tags=["batch"])
+api_router.include_router(stock.router, prefix="/stock", tags=["stock"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
@@ -1,10 +1,12 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from app import crud, schemas
 from app.core.database import get_db
+from app.core.journal_import import import_stream
+from app.core.serialization import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/", response_model=List[schemas.AccountRead])
 def read_accounts(
@@ -55,6 +57,19 @@ def create_journal_entry(
     entry = crud.journal_entry.create_with_lines(db, obj_in=entry_in)
     return entry
 
+@router.post("/journal-entries/import", response_model=schemas.JournalImportReport)
+async def import_journal_entries(
+    request: Request,
+    db: Session = Depends(get_db),
+    chunk_size: Optional[int] = Query(None, gt=0, le=10000),
+) -> Any:
+    """
+    Bulk-import journal entries from an NDJSON body (one entry per line, accounts by account_code or account_id).
+    Entries that fail validation are listed in the report; the rest are committed chunk by chunk.
+    """
+    report = await import_stream(db, request.stream(), chunk_size)
+    return report
+
 @router.get("/journal-entries/", response_model=List[schemas.JournalEntryRead])
 def read_journal_entries(
     db: Session = Depends(get_db),
@@ -0,0 +1,22 @@
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.core import profiler
+from app.core.auth import get_current_active_user
+from app.core.config import get_settings
+
+settings = get_settings()
+
+router = APIRouter()
+
+@router.get("/sql-profiles")
+def read_sql_profiles(
+    current_user = Depends(get_current_active_user),
+    limit: int = Query(50, ge=1, le=1000),
+    n_plus_one_only: bool = False,
+) -> Any:
+    """
+    Recent sampled SQL profiles, newest first (users listed in SQL_PROFILER_ADMIN_USER_IDS only).
+    """
+    if current_user.id not in settings.SQL_PROFILER_ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Not allowed to read SQL profiles")
+    return profiler.get_recent_profiles(limit=limit, n_plus_one_only=n_plus_one_only)
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app import crud, schemas
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.auth import (
     verify_password, 
     create_access_token, 
@@ -20,7 +20,7 @@ settings = get_settings()
 
 @router.post("/login", response_model=schemas.Token)
 def login(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
@@ -34,7 +34,9 @@ def login(
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+    # Hand the connection back before the slow bcrypt check (the user's columns are loaded)
+    db.close()
+
     # Verify password
     if not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
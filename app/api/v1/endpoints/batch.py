@@ -0,0 +1,146 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from fastapi import APIRouter, HTTPException, Request
+from app import schemas
+from app.core.config import get_settings
+from app.core.database import shared_session
+from app.core.writer import write_queue
+
+router = APIRouter()
+settings = get_settings()
+
+# Headers every sub-request inherits from the batch request (shared auth context)
+INHERITED_HEADERS = (b"authorization", b"cookie", b"accept-language")
+
+async def dispatch(request: Request, sub: schemas.BatchSubRequest) -> schemas.BatchSubResponse:
+    """Run one sub-request in-process through the app's router"""
+    parts = urlsplit(sub.path)
+    body = b"" if sub.body is None else json.dumps(sub.body).encode()
+    headers: Dict[bytes, bytes] = {
+        name: value for name, value in request.scope["headers"] if name in INHERITED_HEADERS
+    }
+    if body:
+        headers[b"content-type"] = b"application/json"
+    headers[b"content-length"] = str(len(body)).encode()
+    for name, value in sub.headers.items():
+        headers[name.lower().encode("latin-1")] = value.encode("latin-1")
+
+    scope = {
+        **{k: v for k, v in request.scope.items() if k in ("type", "asgi", "http_version", "scheme",
+                                                          "client", "server", "root_path", "app", "state",
+                                                          "starlette.exception_handlers")},
+        "method": sub.method,
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "headers": list(headers.items()),
+    }
+    scope["state"] = dict(scope.get("state") or {})
+
+    sent = False
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    status = 500
+    response_headers: Dict[str, str] = {}
+    chunks: List[bytes] = []
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for name, value in message.get("headers", ()):
+                response_headers[name.decode("latin-1")] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app.router(scope, receive, send)
+    except Exception as e:
+        return schemas.BatchSubResponse(id=sub.id, status=500, body={"detail": f"Internal error: {e}"})
+
+    raw = b"".join(chunks)
+    try:
+        payload: Any = json.loads(raw) if raw else None
+    except ValueError:
+        payload = raw.decode("utf-8", "replace")
+    response_headers.pop("content-length", None)
+    return schemas.BatchSubResponse(id=sub.id, status=status, headers=response_headers, body=payload)
+
+def read_groups(subs: List[schemas.BatchSubRequest]) -> List[Tuple[bool, List[Tuple[int, schemas.BatchSubRequest]]]]:
+    """Split into runs of consecutive GETs (run concurrently) and single writes (run in order)"""
+    groups: List[Tuple[bool, List[Tuple[int, schemas.BatchSubRequest]]]] = []
+    for index, sub in enumerate(subs):
+        is_read = sub.method == "GET"
+        if is_read and groups and groups[-1][0]:
+            groups[-1][1].append((index, sub))
+        else:
+            groups.append((is_read, [(index, sub)]))
+    return groups
+
+@router.post("", response_model=schemas.BatchResponse)
+async def run_batch(request: Request, batch_in: schemas.BatchRequest) -> Any:
+    """
+    Execute many API calls in one round-trip.
+
+    Sub-requests run in-process with the caller's Authorization header.
+    Consecutive GETs run concurrently; writes run in order. With
+    ``atomic`` every sub-request shares one DB transaction that is
+    committed only if all of them succeed.
+    """
+    if len(batch_in.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_REQUESTS} sub-requests per batch")
+    for sub in batch_in.requests:
+        if not sub.path.startswith(settings.API_V1_STR + "/") or sub.path.startswith(f"{settings.API_V1_STR}/batch"):
+            raise HTTPException(status_code=400, detail=f"Unsupported sub-request path: {sub.path}")
+
+    if batch_in.atomic:
+        return await run_atomic(request, batch_in.requests)
+
+    responses: List[Optional[schemas.BatchSubResponse]] = [None] * len(batch_in.requests)
+    for is_read, group in read_groups(batch_in.requests):
+        results = await asyncio.gather(*(dispatch(request, sub) for _, sub in group))
+        for (index, _), result in zip(group, results):
+            responses[index] = result
+    return schemas.BatchResponse(responses=responses, committed=True)
+
+class BatchRolledBack(Exception):
+    """Raised by the atomic batch's write unit so the writer rolls its savepoint back"""
+
+    def __init__(self, responses: List[schemas.BatchSubResponse]):
+        super().__init__(f"{len(responses)} sub-requests rolled back")
+        self.responses = responses
+
+async def run_atomic(request: Request, subs: List[schemas.BatchSubRequest]) -> schemas.BatchResponse:
+    """Sequential execution as one write unit on the writer thread; rollback on the first failure"""
+    # The sub-requests share the writer's session, each write a savepoint inside the unit's own one.
+    # Other writes queue behind the batch meanwhile (BATCH_MAX_REQUESTS bounds how long) instead of
+    # waiting for the single write connection and timing out.
+    loop = asyncio.get_running_loop()
+
+    def unit(wdb) -> List[schemas.BatchSubResponse]:
+        token = shared_session.set(wdb)
+        responses: List[schemas.BatchSubResponse] = []
+        try:
+            for sub in subs:
+                if responses and responses[-1].status >= 400:
+                    # 424 Failed Dependency: skipped because an earlier sub-request failed
+                    responses.append(schemas.BatchSubResponse(id=sub.id, status=424))
+                    continue
+                # The sub-request runs on the event loop and sees shared_session through this context
+                responses.append(asyncio.run_coroutine_threadsafe(dispatch(request, sub), loop).result())
+        finally:
+            shared_session.reset(token)
+        if any(r.status >= 400 for r in responses):
+            raise BatchRolledBack(responses)
+        return responses
+
+    try:
+        return schemas.BatchResponse(responses=await write_queue.run(unit), committed=True)
+    except BatchRolledBack as e:
+        return schemas.BatchResponse(responses=e.responses, committed=False)
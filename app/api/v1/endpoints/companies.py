@@ -3,8 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app import crud, schemas
 from app.core.database import get_db
+from app.core.serialization import FastJSONRoute
+from app.crud.base import StillReferencedError
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/", response_model=List[schemas.CompanyRead])
 def read_companies(
@@ -55,5 +57,8 @@ def delete_company(
     company = crud.company.get(db, id=company_id)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
-    company = crud.company.remove(db, id=company_id)
+    try:
+        company = crud.company.remove(db, id=company_id)
+    except StillReferencedError:
+        raise HTTPException(status_code=409, detail="Company is still referenced by other records")
     return {"message": "Company deleted successfully"}
\ No newline at end of file
@@ -3,21 +3,55 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app import crud, schemas
 from app.core.database import get_db
+from app.core.filters import FilterQuery, filter_params
+from app.core.serialization import FastJSONRoute
+from app.crud.base import StillReferencedError
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/", response_model=List[schemas.EmployeeRead])
 def read_employees(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    filters: FilterQuery = Depends(filter_params(crud.employee.filter_spec)),
 ) -> Any:
     """
-    Retrieve employees.
+    Retrieve employees, e.g. ?joined_at__gte=2024-01-01&sort=joined_at.
     """
-    employees = crud.employee.get_multi(db, skip=skip, limit=limit)
+    employees = crud.employee.get_multi(db, skip=skip, limit=limit, filters=filters)
     return employees
 
+@router.get("/attendance", response_model=List[schemas.AttendanceRead])
+def read_attendance(
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    include_archived: bool = False,
+    filters: FilterQuery = Depends(filter_params(crud.attendance.filter_spec)),
+) -> Any:
+    """
+    Retrieve attendance records, e.g. ?employee_id=7&date__between=2025-01-01,2025-01-31&sort=date.
+    Archived records are included with ?include_archived=true.
+    """
+    records = crud.attendance.get_multi(db, skip=skip, limit=limit, filters=filters,
+                                        include_archived=include_archived)
+    return records
+
+@router.post("/attendance", response_model=schemas.AttendanceRead)
+def create_attendance(
+    *,
+    db: Session = Depends(get_db),
+    record_in: schemas.AttendanceRecord,
+) -> Any:
+    """
+    Record a check-in (and optionally check-out).
+    """
+    if not crud.employee.get(db, id=record_in.employee_id):
+        raise HTTPException(status_code=404, detail="Employee not found")
+    record = crud.attendance.create(db, obj_in=record_in)
+    return record
+
 @router.post("/", response_model=schemas.EmployeeRead)
 def create_employee(
     *,
@@ -55,5 +89,8 @@ def delete_employee(
     employee = crud.employee.get(db, id=employee_id)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
-    employee = crud.employee.remove(db, id=employee_id)
+    try:
+        employee = crud.employee.remove(db, id=employee_id)
+    except StillReferencedError:
+        raise HTTPException(status_code=409, detail="Employee is still referenced by other records")
     return {"message": "Employee deleted successfully"}
\ No newline at end of file
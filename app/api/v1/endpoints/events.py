@@ -0,0 +1,32 @@
+from typing import Any, AsyncIterator, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.core.config import get_settings
+from app.core.events import TOPICS, broker
+
+settings = get_settings()
+
+router = APIRouter()
+
+@router.get("/stream")
+async def stream_events(
+    topics: str = Query(",".join(TOPICS), description="Comma-separated: " + ", ".join(TOPICS)),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+) -> Any:
+    """
+    Server-Sent Events feed of stock, order and product price changes.
+    Reconnect with Last-Event-ID to resume; a `stream.reset` event means the gap is too old and data should be refetched.
+    """
+    wanted = {topic.strip() for topic in topics.split(",") if topic.strip()}
+    unknown = wanted - set(TOPICS)
+    if unknown or not wanted:
+        raise HTTPException(status_code=400, detail=f"Unknown topics: {', '.join(sorted(unknown))}" if unknown
+                            else "No topics given")
+
+    async def frames() -> AsyncIterator[bytes]:
+        yield b"retry: 3000\n\n"
+        async for event in broker.stream(wanted, last_event_id, settings.EVENTS_HEARTBEAT_SECONDS):
+            yield b": keepalive\n\n" if event is None else event.encode()
+
+    return StreamingResponse(frames(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
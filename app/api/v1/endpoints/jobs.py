@@ -0,0 +1,83 @@
+import os
+from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from app import crud, schemas
+from app.core.database import get_db
+from app.core.filters import FilterQuery, filter_params
+from app.core.jobs import JOB_TYPES, JobError
+from app.core.serialization import FastJSONRoute
+
+router = APIRouter(route_class=FastJSONRoute)
+
+@router.get("/", response_model=List[schemas.JobRead])
+def read_jobs(
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    filters: FilterQuery = Depends(filter_params(crud.job.filter_spec)),
+) -> Any:
+    """
+    Retrieve jobs, e.g. ?status=running&sort=-created_at.
+    """
+    jobs = crud.job.get_multi(db, skip=skip, limit=limit, filters=filters)
+    return jobs
+
+@router.post("/", response_model=schemas.JobRead, status_code=202)
+def create_job(
+    *,
+    db: Session = Depends(get_db),
+    job_in: schemas.JobCreate,
+) -> Any:
+    """
+    Queue a background job: export_products, export_journal, rebuild_ledger or sales_report.
+    """
+    try:
+        job = crud.job.create(db, obj_in=job_in)
+    except JobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job
+
+@router.get("/{job_id}", response_model=schemas.JobRead)
+def read_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Get job status and progress.
+    """
+    job = crud.job.get(db, id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}/result")
+def download_job_result(
+    job_id: int,
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Download the result of a finished job.
+    """
+    job = crud.job.get(db, id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.result_available or not os.path.exists(job.result_path):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}; no result to download")
+    job_type = JOB_TYPES.get(job.type)
+    return FileResponse(job.result_path, media_type=job_type.media_type if job_type else None,
+                        filename=os.path.basename(job.result_path))
+
+@router.post("/{job_id}/cancel", response_model=schemas.JobRead)
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Cancel a queued job, or ask a running one to stop.
+    """
+    job = crud.job.cancel(db, id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,47 +1,99 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy.orm import Session
 from app import crud, schemas
 from app.core.database import get_db
+from app.core.fields import FieldSelection, sparse_fields
+from app.core.filters import FilterQuery, filter_params
+from app.core.idempotency import IdempotencyClaim, IdempotentReplay
+from app.crud.orders import OrderValidationError
+from app.core.serialization import FastJSONRoute
+from app.models.models import SalesOrder
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/", response_model=List[schemas.SalesOrderRead])
 def read_sales_orders(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    include_archived: bool = False,
+    fields: Optional[FieldSelection] = Depends(sparse_fields(schemas.SalesOrderRead)),
+    filters: FilterQuery = Depends(filter_params(crud.sales_order.filter_spec)),
 ) -> Any:
     """
-    Retrieve sales orders.
+    Retrieve sales orders, e.g. ?company_id=3&order_date__between=2025-01-01,2025-03-31&sort=-order_date.
+    Archived orders are included with ?include_archived=true.
     """
-    orders = crud.sales_order.get_multi(db, skip=skip, limit=limit)
-    return orders
+    options = fields.load_options(SalesOrder) if fields else ()
+    orders = crud.sales_order.get_multi(db, skip=skip, limit=limit, options=options, filters=filters,
+                                        include_archived=include_archived)
+    return fields.response(orders) if fields else orders
+
+@router.get("/page", response_model=schemas.Page[schemas.SalesOrderRead])
+def read_sales_orders_page(
+    db: Session = Depends(get_db),
+    pagination: schemas.Pagination = Depends(),
+    include_archived: bool = False,
+    filters: FilterQuery = Depends(filter_params(crud.sales_order.filter_spec)),
+) -> Any:
+    """
+    Retrieve one page of sales orders plus the total match count.
+    """
+    skip = (pagination.page - 1) * pagination.size
+    orders = crud.sales_order.get_multi(db, skip=skip, limit=pagination.size, filters=filters,
+                                        include_archived=include_archived)
+    total = crud.sales_order.count(db, filters=filters, include_archived=include_archived)
+    return {"total": total, "page": pagination.page, "size": pagination.size, "items": orders}
+
+def _replayed(db: Session, order_id: int) -> SalesOrder:
+    """The order an earlier request with the same Idempotency-Key created"""
+    order = crud.sales_order.get(db, id=order_id, include_archived=True)
+    if order is None:
+        # Deleted since; creating it again would not be what the key promised either
+        raise HTTPException(status_code=409, detail="The order created for this Idempotency-Key no longer exists")
+    return order
 
 @router.post("/", response_model=schemas.SalesOrderRead)
 def create_sales_order(
     *,
     db: Session = Depends(get_db),
     order_in: schemas.SalesOrderCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=200),
 ) -> Any:
     """
-    Create new sales order.
+    Create new sales order. Retries carrying the same Idempotency-Key return the original order
+    (409 once that order has been deleted).
     """
-    order = crud.sales_order.create_with_items(db, obj_in=order_in)
+    claim = IdempotencyClaim("sales_orders", idempotency_key, order_in) if idempotency_key else None
+    if claim is not None:
+        previous = claim.previous(db)
+        if previous is not None:
+            return _replayed(db, previous)
+    try:
+        order = crud.sales_order.create_with_items(db, obj_in=order_in, idempotency=claim)
+    except OrderValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    except IdempotentReplay as e:
+        # A concurrent retry won the race; its order is the result
+        return _replayed(db, e.resource_id)
     return order
 
 @router.get("/{order_id}", response_model=schemas.SalesOrderRead)
 def read_sales_order(
     order_id: int,
     db: Session = Depends(get_db),
+    include_archived: bool = False,
+    fields: Optional[FieldSelection] = Depends(sparse_fields(schemas.SalesOrderRead)),
 ) -> Any:
     """
-    Get sales order by ID.
+    Get sales order by ID (archived ones with ?include_archived=true).
     """
-    order = crud.sales_order.get(db, id=order_id)
+    options = fields.load_options(SalesOrder) if fields else ()
+    order = crud.sales_order.get(db, id=order_id, options=options, include_archived=include_archived)
     if not order:
         raise HTTPException(status_code=404, detail="Sales order not found")
-    return order
+    return fields.response(order) if fields else order
 
 @router.delete("/{order_id}")
 def delete_sales_order(
@@ -55,5 +107,8 @@ def delete_sales_order(
     order = crud.sales_order.get(db, id=order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Sales order not found")
-    order = crud.sales_order.remove(db, id=order_id)
+    try:
+        order = crud.sales_order.remove(db, id=order_id)
+    except OrderValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
     return {"message": "Sales order deleted successfully"}
\ No newline at end of file
@@ -1,22 +1,45 @@
-from typing import Any, List
+from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app import crud, schemas
 from app.core.database import get_db
+from app.core.fields import FieldSelection, sparse_fields
+from app.core.filters import FilterQuery, filter_params
+from app.core.serialization import FastJSONRoute
+from app.crud.base import StillReferencedError
+from app.models.models import Product
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/", response_model=List[schemas.ProductRead])
 def read_products(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[FieldSelection] = Depends(sparse_fields(schemas.ProductRead)),
+    filters: FilterQuery = Depends(filter_params(crud.product.filter_spec)),
 ) -> Any:
     """
-    Retrieve products.
+    Retrieve products, e.g. ?unit_price__between=10,50&is_active=true&sort=-unit_price.
     """
-    products = crud.product.get_multi(db, skip=skip, limit=limit)
-    return products
+    options = fields.load_options(Product) if fields else crud.product.read_options
+    products = crud.product.get_multi(db, skip=skip, limit=limit, options=options, filters=filters)
+    return fields.response(products) if fields else products
+
+@router.get("/page", response_model=schemas.Page[schemas.ProductRead])
+def read_products_page(
+    db: Session = Depends(get_db),
+    pagination: schemas.Pagination = Depends(),
+    filters: FilterQuery = Depends(filter_params(crud.product.filter_spec)),
+) -> Any:
+    """
+    Retrieve one page of products plus the total match count.
+    """
+    skip = (pagination.page - 1) * pagination.size
+    products = crud.product.get_multi(db, skip=skip, limit=pagination.size, options=crud.product.read_options,
+                                      filters=filters)
+    total = crud.product.count(db, filters=filters)
+    return {"total": total, "page": pagination.page, "size": pagination.size, "items": products}
 
 @router.post("/", response_model=schemas.ProductRead)
 def create_product(
@@ -40,14 +63,16 @@ def create_product(
 def read_product(
     product_id: int,
     db: Session = Depends(get_db),
+    fields: Optional[FieldSelection] = Depends(sparse_fields(schemas.ProductRead)),
 ) -> Any:
     """
     Get product by ID.
     """
-    product = crud.product.get(db, id=product_id)
+    options = fields.load_options(Product) if fields else crud.product.read_options
+    product = crud.product.get(db, id=product_id, options=options)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return fields.response(product) if fields else product
 
 @router.put("/{product_id}", response_model=schemas.ProductRead)
 def update_product(
@@ -59,7 +84,7 @@ def update_product(
     """
     Update product.
     """
-    product = crud.product.get(db, id=product_id)
+    product = crud.product.get(db, id=product_id, options=crud.product.read_options)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     product = crud.product.update(db, db_obj=product, obj_in=product_in)
@@ -77,7 +102,10 @@ def delete_product(
     product = crud.product.get(db, id=product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    product = crud.product.remove(db, id=product_id)
+    try:
+        product = crud.product.remove(db, id=product_id)
+    except StillReferencedError:
+        raise HTTPException(status_code=409, detail="Product is still referenced by other records")
     return {"message": "Product deleted successfully"}
 
 @router.get("/category/{category_id}", response_model=List[schemas.ProductRead])
@@ -0,0 +1,95 @@
+from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app import crud, schemas
+from app.core.database import get_db
+from app.core.filters import FilterQuery, filter_params
+from app.core.serialization import FastJSONRoute
+from app.crud.stock import StockError
+
+router = APIRouter(route_class=FastJSONRoute)
+
+@router.get("/balances", response_model=List[schemas.StockBalanceRead])
+def read_stock_balances(
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    filters: FilterQuery = Depends(filter_params(crud.stock_balance.filter_spec)),
+) -> Any:
+    """
+    Retrieve unreserved stock per product and warehouse, e.g. ?product_id=3.
+    """
+    balances = crud.stock_balance.get_multi(db, skip=skip, limit=limit, filters=filters)
+    return balances
+
+@router.get("/movements", response_model=List[schemas.StockMovementRead])
+def read_stock_movements(
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    include_archived: bool = False,
+    filters: FilterQuery = Depends(filter_params(crud.stock_movement.filter_spec)),
+) -> Any:
+    """
+    Retrieve stock movements, e.g. ?product_id=3&sort=-occurred_at.
+    Archived movements are included with ?include_archived=true.
+    """
+    movements = crud.stock_movement.get_multi(db, skip=skip, limit=limit, filters=filters,
+                                              include_archived=include_archived)
+    return movements
+
+@router.post("/movements", response_model=schemas.StockMovementRead)
+def create_stock_movement(
+    *,
+    db: Session = Depends(get_db),
+    movement_in: schemas.StockMovementBase,
+) -> Any:
+    """
+    Record a receipt (positive change) or an issue/adjustment (negative change).
+    """
+    try:
+        movement = crud.stock_movement.create(db, obj_in=movement_in)
+    except StockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return movement
+
+@router.get("/reservations", response_model=List[schemas.StockReservationRead])
+def read_stock_holds(
+    product_id: int,
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+) -> Any:
+    """
+    Retrieve the standalone holds on a product.
+    """
+    holds = crud.stock_reservation.get_holds(db, product_id=product_id, skip=skip, limit=limit)
+    return holds
+
+@router.post("/reservations", response_model=schemas.StockReservationRead)
+def create_stock_hold(
+    *,
+    db: Session = Depends(get_db),
+    hold_in: schemas.StockHoldCreate,
+) -> Any:
+    """
+    Hold stock for a while (e.g. during checkout); it is released automatically when it expires.
+    """
+    try:
+        hold = crud.stock_reservation.hold(db, obj_in=hold_in)
+    except StockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return hold
+
+@router.delete("/reservations/{reservation_id}")
+def release_stock_hold(
+    *,
+    db: Session = Depends(get_db),
+    reservation_id: int,
+) -> Any:
+    """
+    Release a standalone hold.
+    """
+    if not crud.stock_reservation.release_hold(db, id=reservation_id):
+        raise HTTPException(status_code=404, detail="Stock hold not found")
+    return {"message": "Stock hold released successfully"}
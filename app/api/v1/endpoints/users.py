@@ -4,9 +4,12 @@ from sqlalchemy.orm import Session
 from app import crud, schemas
 from app.api import deps
 from app.core.database import get_db
+from app.core.filters import FilterQuery, filter_params
+from app.core.serialization import FastJSONRoute
+from app.crud.base import StillReferencedError
 from app.core.auth import get_current_active_user
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/", response_model=List[schemas.UserRead])
 def read_users(
@@ -14,11 +17,12 @@ def read_users(
     current_user = Depends(get_current_active_user),
     skip: int = 0,
     limit: int = 100,
+    filters: FilterQuery = Depends(filter_params(crud.user.filter_spec)),
 ) -> Any:
     """
-    Retrieve users (requires authentication).
+    Retrieve users (requires authentication), e.g. ?is_active=true&sort=-created_at.
     """
-    users = crud.user.get_multi(db, skip=skip, limit=limit)
+    users = crud.user.get_multi(db, skip=skip, limit=limit, filters=filters)
     return users
 
 # User creation is now handled by /auth/register endpoint
@@ -65,5 +69,8 @@ def delete_user(
     user = crud.user.get(db, id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    user = crud.user.remove(db, id=user_id)
+    try:
+        user = crud.user.remove(db, id=user_id)
+    except StillReferencedError:
+        raise HTTPException(status_code=409, detail="User is still referenced by other records")
     return {"message": "User deleted successfully"}
\ No newline at end of file
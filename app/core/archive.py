@@ -0,0 +1,449 @@
+"""
+Hot/cold archival of stock movements, attendance and old orders.
+
+``stock_movements``, ``attendances`` and ``sales_orders`` (with their
+items) only grow, and so does every index on them. An archival run moves
+the rows older than ARCHIVE_HORIZON_DAYS into one SQLite file per year
+under ARCHIVE_DIR (``archive_2023.db``, ...) and leaves compact summaries
+in the hot database:
+
+- stock movements: one "opening balance" movement per product and
+  warehouse carrying the net change of everything archived, so the hot
+  movements still add up to the balances
+- attendance: days and checked-in minutes per employee and month
+  (``attendance_summaries``)
+- orders: orders, units and revenue per company and month
+  (``sales_summaries``, in the database or shard the orders were in; the
+  sales report adds them in). Their stock holds stay, keyed by
+  ``order_ref`` like the holds of sharded orders.
+
+Each batch is copied into its archive file first (ids kept, so a repeat
+copies nothing twice) and then deleted from the hot database in one write
+unit that also updates the summaries. A run can stop anywhere and the next
+one carries on; every run only looks at what is still hot.
+
+``archive_periods`` lists the files holding each table. List endpoints read
+them (in parallel, read-only) with ``?include_archived=true``; rows are
+merged with the hot ones in the requested order. Run it as the ``archive``
+job or::
+
+    python -m app.core.archive [--before 2024-01-01] [--dry-run]
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from sqlalchemy import create_engine, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core import statements
+from app.core.config import get_settings
+from app.core.counts import record_rows
+from app.core.database import SHARED, configure_sqlite, read_only_url, shards
+from app.core.filters import FilterQuery
+from app.core.metrics import instrument_pool
+from app.core.profiler import instrument_engine
+from app.core.sharding import fan_out, locations
+from app.core.stock import reservations
+from app.models.models import (
+    ArchivePeriod, Attendance, AttendanceSummary, Base, SalesOrder, SalesOrderItem, SalesSummary, StockMovement
+)
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+archive_periods = ArchivePeriod.__table__
+movements = StockMovement.__table__
+attendances = Attendance.__table__
+orders = SalesOrder.__table__
+items = SalesOrderItem.__table__
+attendance_summaries = AttendanceSummary.__table__
+sales_summaries = SalesSummary.__table__
+
+# Tables created in every archive file
+ARCHIVE_TABLES = (movements, attendances, orders, items)
+
+# Reason of the movement summing up the archived movements of a product in a warehouse
+OPENING_REASON = "Opening balance (archived)"
+
+
+# ---- archive files ----
+def archive_url(period: str) -> str:
+    return f"sqlite:///{os.path.join(settings.ARCHIVE_DIR, f'archive_{period}.db')}"
+
+
+_readers: Dict[str, Engine] = {}
+_readers_lock = threading.Lock()
+
+
+def _reader(url: str) -> Engine:
+    with _readers_lock:
+        engine = _readers.get(url)
+        if engine is None:
+            # Created on first use, i.e. in a worker after fork
+            engine = _readers[url] = create_engine(
+                read_only_url(url), connect_args={"check_same_thread": False}, pool_size=2, max_overflow=8)
+            configure_sqlite(engine, read_only=True)
+            instrument_pool(engine, "archive")
+            instrument_engine(engine)
+        return engine
+
+
+def session(url: str) -> Session:
+    """Read-only session on an archive file"""
+    return Session(bind=_reader(url), autoflush=False)
+
+
+# ---- reads ----
+def archive_urls(db: Session, model: type) -> List[str]:
+    """Archive files holding rows of ``model``, oldest first"""
+    return list(db.execute(
+        select(archive_periods.c.url).where(archive_periods.c.table_name == model.__tablename__)
+        .order_by(archive_periods.c.period)
+    ).scalars())
+
+
+def on_archives(db: Session, model: type, fn: Callable[[Session], T]) -> List[T]:
+    """``fn(session)`` on every archive file of ``model`` at once"""
+    urls = archive_urls(db, model)
+    if not urls:
+        return []
+    return list(fan_out(db, urls, fn, open_session=session).values())
+
+
+def count_archived(db: Session, model: type, filters: Optional[FilterQuery] = None) -> int:
+    query = select(func.count()).select_from(model)
+    if filters is not None and filters.clauses:
+        query = query.where(*filters.clauses)
+    return sum(on_archives(db, model, lambda archive: archive.execute(query).scalar()))
+
+
+def get_archived(db: Session, model: type, id: Any, options: Sequence[Any] = ()) -> Optional[Any]:
+    stmt = statements.lookup(model).options(*options)
+    found = on_archives(db, model, lambda archive: archive.execute(stmt, {"id": id}).scalars().first())
+    return next((row for row in found if row is not None), None)
+
+
+# ---- archival ----
+def _period(value: date) -> str:
+    return str(value.year)
+
+
+def _month(value: date) -> str:
+    return value.strftime("%Y-%m")
+
+
+def _chunks(values: Sequence[int], size: int = 500) -> Iterable[Sequence[int]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class Archiver:
+    """One archival run: everything dated before ``cutoff`` moves to the archive files"""
+
+    def __init__(self, cutoff: datetime, progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                 batch_size: Optional[int] = None):
+        self.cutoff = cutoff
+        self.progress = progress
+        self.batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        self.done = 0
+        self.total: Optional[int] = None
+        self._writers: Dict[str, Engine] = {}
+        self._registered: Set[Tuple[str, str]] = set()
+
+    # ---- candidates ----
+    def _movements_query(self, after: int = 0):
+        return (select(movements)
+                .where(movements.c.occurred_at < self.cutoff, movements.c.reason.is_distinct_from(OPENING_REASON),
+                       movements.c.id > after)
+                .order_by(movements.c.id))
+
+    def _attendance_query(self, after: int = 0):
+        return (select(attendances)
+                .where(attendances.c.date < self.cutoff.date(), attendances.c.id > after)
+                .order_by(attendances.c.id))
+
+    def _orders_query(self, after: int = 0):
+        return (select(orders)
+                .where(orders.c.order_date < self.cutoff.date(), orders.c.id > after)
+                .order_by(orders.c.id))
+
+    def pending(self) -> Dict[str, int]:
+        """Rows older than the cutoff still in the hot database(s), per table"""
+        def count(db: Session, query) -> int:
+            return db.execute(select(func.count()).select_from(query.subquery())).scalar()
+
+        with shards.session(SHARED, read_only=True) as db:
+            counts = {"stock_movements": count(db, self._movements_query()),
+                      "attendances": count(db, self._attendance_query())}
+            counts["sales_orders"] = sum(fan_out(db, locations(), lambda s: count(s, self._orders_query())).values())
+        return counts
+
+    # ---- run ----
+    def run(self) -> Dict[str, int]:
+        """Archive every table; rows moved per table"""
+        self.total = sum(self.pending().values())
+        try:
+            moved = {"stock_movements": self.archive_movements(), "attendances": self.archive_attendance(),
+                     "sales_orders": sum(self.archive_orders(name) for name in locations())}
+        finally:
+            for engine in self._writers.values():
+                engine.dispose()
+            self._writers.clear()
+        logger.info(f"Archived rows before {self.cutoff:%Y-%m-%d}: "
+                    + ", ".join(f"{table} {count}" for table, count in moved.items()))
+        return moved
+
+    def _advance(self, count: int) -> None:
+        self.done += count
+        if self.progress is not None:
+            self.progress(self.done, self.total)
+
+    def _batches(self, location: str, query_for: Callable[[int], Any]) -> Iterable[List[Dict[str, Any]]]:
+        """Hot rows in id order, a batch at a time (keyset, so rows kept hot are stepped over)"""
+        after = 0
+        while True:
+            with shards.session(location, read_only=True) as db:
+                rows = [dict(row._mapping) for row in db.execute(query_for(after).limit(self.batch_size))]
+            if not rows:
+                return
+            after = rows[-1]["id"]
+            yield rows
+
+    # ---- archive files ----
+    def _file(self, period: str) -> Engine:
+        engine = self._writers.get(period)
+        if engine is None:
+            os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+            # Plain rollback journal: the file is cold, and without -wal/-shm it is one file to copy
+            engine = self._writers[period] = create_engine(archive_url(period))
+            Base.metadata.create_all(bind=engine, tables=ARCHIVE_TABLES)
+        return engine
+
+    def _copy(self, table, rows: List[Dict[str, Any]], dated: str) -> None:
+        """Copy rows (keeping their ids) into the archive file of their year, and register the files"""
+        by_period: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_period[_period(row[dated])].append(row)
+        for period, period_rows in by_period.items():
+            with self._file(period).begin() as conn:
+                conn.execute(insert(table).prefix_with("OR IGNORE"), period_rows)
+        self._register(table.name, by_period)
+
+    def _register(self, table_name: str, periods: Iterable[str]) -> None:
+        """Readers find a file through archive_periods, so it is listed before any row leaves the hot database"""
+        new = [{"table_name": table_name, "period": period, "url": archive_url(period)}
+               for period in periods if (table_name, period) not in self._registered]
+        if not new:
+            return
+
+        def unit(wdb: Session) -> None:
+            wdb.execute(sqlite_insert(archive_periods).on_conflict_do_nothing(), new)
+
+        shards.writer(SHARED).submit(unit).result()
+        self._registered.update((row["table_name"], row["period"]) for row in new)
+
+    # ---- stock movements ----
+    def archive_movements(self) -> int:
+        moved = 0
+        for rows in self._batches(SHARED, self._movements_query):
+            self._copy(movements, rows, "occurred_at")
+            moved += shards.writer(SHARED).submit(lambda wdb: self._fold_movements(wdb, rows)).result()
+            self._advance(len(rows))
+        return moved
+
+    def _fold_movements(self, wdb: Session, rows: List[Dict[str, Any]]) -> int:
+        """Delete archived movements, adding their net change to the opening balance movements"""
+        # Only rows still here count (an overlapping run may have moved some already)
+        present = wdb.execute(
+            select(movements.c.id, movements.c.product_id, movements.c.warehouse_id, movements.c.change)
+            .where(movements.c.id.in_([row["id"] for row in rows]))
+        ).all()
+        if not present:
+            return 0
+        net: Dict[Tuple[int, int], int] = defaultdict(int)
+        for row in present:
+            net[(row.product_id, row.warehouse_id)] += row.change
+        openings = {
+            (row.product_id, row.warehouse_id): row
+            for row in wdb.execute(
+                select(movements.c.id, movements.c.product_id, movements.c.warehouse_id, movements.c.occurred_at)
+                .where(movements.c.reason == OPENING_REASON,
+                       movements.c.product_id.in_({product_id for product_id, _ in net}))
+            )
+        }
+        for (product_id, warehouse_id), change in net.items():
+            opening = openings.get((product_id, warehouse_id))
+            if opening is None:
+                wdb.execute(insert(movements).values(product_id=product_id, warehouse_id=warehouse_id, change=change,
+                                                     reason=OPENING_REASON, occurred_at=self.cutoff))
+            else:
+                wdb.execute(update(movements).where(movements.c.id == opening.id).values(
+                    change=movements.c.change + change, occurred_at=max(opening.occurred_at, self.cutoff)))
+        ids = [row.id for row in present]
+        for chunk in _chunks(ids):
+            wdb.execute(delete(movements).where(movements.c.id.in_(chunk)))
+        return len(ids)
+
+    # ---- attendance ----
+    def archive_attendance(self) -> int:
+        moved = 0
+        for rows in self._batches(SHARED, self._attendance_query):
+            self._copy(attendances, rows, "date")
+            moved += shards.writer(SHARED).submit(lambda wdb: self._fold_attendance(wdb, rows)).result()
+            self._advance(len(rows))
+        return moved
+
+    def _fold_attendance(self, wdb: Session, rows: List[Dict[str, Any]]) -> int:
+        present = wdb.execute(
+            select(attendances.c.id, attendances.c.employee_id, attendances.c.date, attendances.c.check_in,
+                   attendances.c.check_out)
+            .where(attendances.c.id.in_([row["id"] for row in rows]))
+        ).all()
+        if not present:
+            return 0
+        totals: Dict[Tuple[int, str], List[int]] = defaultdict(lambda: [0, 0])
+        for row in present:
+            bucket = totals[(row.employee_id, _month(row.date))]
+            bucket[0] += 1
+            if row.check_in is not None and row.check_out is not None:
+                bucket[1] += max(int((row.check_out - row.check_in).total_seconds() // 60), 0)
+        stmt = sqlite_insert(attendance_summaries)
+        wdb.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[attendance_summaries.c.employee_id, attendance_summaries.c.month],
+                set_={"days": attendance_summaries.c.days + stmt.excluded.days,
+                      "minutes": attendance_summaries.c.minutes + stmt.excluded.minutes},
+            ),
+            [{"employee_id": employee_id, "month": month, "days": days, "minutes": minutes}
+             for (employee_id, month), (days, minutes) in totals.items()],
+        )
+        ids = [row.id for row in present]
+        for chunk in _chunks(ids):
+            wdb.execute(delete(attendances).where(attendances.c.id.in_(chunk)))
+        return len(ids)
+
+    # ---- orders ----
+    def archive_orders(self, location: str) -> int:
+        """Old orders of one database (the shared one or a shard)"""
+        moved = 0
+        for rows in self._batches(location, self._orders_query):
+            self._copy_orders(location, rows)
+            ids = [row["id"] for row in rows]
+            moved += shards.writer(location).submit(lambda wdb: self._fold_orders(wdb, ids, location)).result()
+            self._advance(len(rows))
+        return moved
+
+    def _copy_orders(self, location: str, batch: List[Dict[str, Any]]) -> None:
+        ids = [row["id"] for row in batch]
+        with shards.session(location, read_only=True) as db:
+            order_items = [dict(row._mapping) for row in db.execute(
+                select(items).where(items.c.sales_order_id.in_(ids)).order_by(items.c.id))]
+        period_of = {row["id"]: _period(row["order_date"]) for row in batch}
+        by_period: Dict[str, Tuple[list, list]] = defaultdict(lambda: ([], []))
+        for row in batch:
+            by_period[period_of[row["id"]]][0].append(row)
+        for row in order_items:
+            del row["id"]  # Item ids are per database (shards reuse them); the order id keeps them together
+            by_period[period_of[row["sales_order_id"]]][1].append(row)
+        for period, (period_orders, period_items) in by_period.items():
+            with self._file(period).begin() as conn:
+                conn.execute(insert(orders).prefix_with("OR IGNORE"), period_orders)
+                period_ids = [row["id"] for row in period_orders]
+                for chunk in _chunks(period_ids):
+                    conn.execute(delete(items).where(items.c.sales_order_id.in_(chunk)))
+                if period_items:
+                    conn.execute(insert(items), period_items)
+        self._register(orders.name, by_period)
+
+    def _fold_orders(self, wdb: Session, ids: List[int], location: str) -> int:
+        """Delete archived orders and their items, adding them to the monthly sales summaries"""
+        present = wdb.execute(
+            select(orders.c.id, orders.c.company_id, orders.c.order_date).where(orders.c.id.in_(ids))
+        ).all()
+        if not present:
+            return 0
+        ids = [row.id for row in present]
+        key_of = {row.id: (row.company_id, _month(row.order_date)) for row in present}
+        totals: Dict[Tuple[int, str], list] = {key: [0, 0, Decimal("0")] for key in key_of.values()}
+        for row in present:
+            totals[key_of[row.id]][0] += 1
+        for chunk in _chunks(ids):
+            for order_id, quantity, unit_price in wdb.execute(
+                select(items.c.sales_order_id, items.c.quantity, items.c.unit_price)
+                .where(items.c.sales_order_id.in_(chunk))
+            ):
+                bucket = totals[key_of[order_id]]
+                bucket[1] += quantity
+                bucket[2] += quantity * unit_price
+
+        # Revenue is added in Python: SQLite would add the NUMERIC column as a float
+        stored = {
+            (row.company_id, row.month): row for row in wdb.execute(
+                select(sales_summaries).where(sales_summaries.c.company_id.in_({key[0] for key in totals})))
+        }
+        rows = []
+        for (company_id, month), (count, units, revenue) in totals.items():
+            previous = stored.get((company_id, month))
+            if previous is not None:
+                count, units, revenue = count + previous.orders, units + previous.units, revenue + previous.revenue
+            rows.append({"company_id": company_id, "month": month, "orders": count, "units": units,
+                         "revenue": revenue})
+        stmt = sqlite_insert(sales_summaries)
+        wdb.execute(stmt.on_conflict_do_update(
+            index_elements=[sales_summaries.c.company_id, sales_summaries.c.month],
+            set_={"orders": stmt.excluded.orders, "units": stmt.excluded.units, "revenue": stmt.excluded.revenue},
+        ), rows)
+
+        for chunk in _chunks(ids):
+            if location == SHARED:
+                # Holds outlive the order row: release_order() finds them by order_ref
+                wdb.execute(update(reservations).where(reservations.c.sales_order_id.in_(chunk))
+                            .values(order_ref=reservations.c.sales_order_id, sales_order_id=None))
+            wdb.execute(delete(items).where(items.c.sales_order_id.in_(chunk)))
+            wdb.execute(delete(orders).where(orders.c.id.in_(chunk)))
+        record_rows(wdb.connection(), SalesOrder, [{"company_id": row.company_id} for row in present], sign=-1)
+        return len(ids)
+
+
+def default_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(days=settings.ARCHIVE_HORIZON_DAYS)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move old movements, attendance and orders to archive files")
+    parser.add_argument("--before", type=date.fromisoformat,
+                        help=f"archive rows dated before this day (default: {settings.ARCHIVE_HORIZON_DAYS} days ago)")
+    parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count what would move")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from app.core.writer import write_queue
+
+    cutoff = datetime.combine(args.before, datetime.min.time()) if args.before else default_cutoff()
+    archiver = Archiver(cutoff, batch_size=args.batch_size)
+    if args.dry_run:
+        for table, count in archiver.pending().items():
+            print(f"{table:<16}{count:>10} rows before {cutoff:%Y-%m-%d}")
+        return 0
+    try:
+        archiver.run()
+    finally:
+        write_queue.stop()
+        shards.stop_writers()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
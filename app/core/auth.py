@@ -1,8 +1,7 @@
 
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional, Union, Any
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
@@ -13,16 +12,19 @@ from app import crud
 settings = get_settings()
 security = HTTPBearer()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (passlib/bcrypt and jose are imported on first use to keep cold start fast)
+@lru_cache()
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
@@ -33,11 +35,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[dict]:
     """Verify and decode JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
@@ -55,16 +59,13 @@ def get_current_user_from_token(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = verify_token(credentials.credentials)
-        if payload is None:
-            raise credentials_exception
-        
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-            
-    except JWTError:
+    # verify_token already maps JWTError to None
+    payload = verify_token(credentials.credentials)
+    if payload is None:
+        raise credentials_exception
+    
+    user_id: int = payload.get("sub")
+    if user_id is None:
         raise credentials_exception
     
     user = crud.user.get(db, id=user_id)
@@ -74,15 +75,15 @@ def get_current_user_from_token(
     return user
 
 # Dependency for protected routes
-async def get_current_user(
+def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
-    """Dependency to get current authenticated user"""
+    """Dependency to get current authenticated user (sync: its query must not block the event loop)"""
     return get_current_user_from_token(credentials, db)
 
 # Optional: Dependency for active users only
-async def get_current_active_user(
+def get_current_active_user(
     current_user = Depends(get_current_user)
 ):
     """Get current active user"""
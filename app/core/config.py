@@ -7,10 +7,73 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "FastAPI Backend - Optimized"
     VERSION: str = "2.0.0"
     API_V1_STR: str = "/api/v1"
+    DEBUG: bool = False
+    OPENAPI_CACHE_PATH: Optional[str] = None  # Prebuilt schema from `python -m app.core.openapi`
+    FAST_SERIALIZATION: bool = True  # TypeAdapter -> JSON bytes on routers using FastJSONRoute
     
     # Database
     DATABASE_URL: str = "sqlite:///./sql_app.db"
     ASYNC_DATABASE_URL: str = "sqlite+aiosqlite:///./sql_app.db"
+    DB_POOL_PRE_PING: bool = False  # Extra SELECT 1 per checkout; useless for a local file
+    DB_POOL_RECYCLE: int = -1  # Seconds; -1 keeps connections (and their page cache) alive
+    DATABASE_READ_URL: Optional[str] = None  # Read-only pool; default: DATABASE_URL opened with mode=ro
+    DB_READ_POOL_SIZE: int = 16  # Read-only connections kept open
+    DB_READ_MAX_OVERFLOW: int = 24  # Extra read connections under load (the threadpool runs 40 handlers)
+    
+    # Per-company sharding of the order tables (see app.core.sharding)
+    SHARDS: Dict[str, str] = {}  # Shard name -> database URL; empty = everything in DATABASE_URL
+    SHARD_PENDING_TTL_SECONDS: int = 300  # Stock held for an order whose shard insert has not been confirmed
+    
+    # SQLite tuning profile, applied to every connection
+    SQLITE_TUNING: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Durable in WAL mode except on power loss
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_FOREIGN_KEYS: bool = True  # Deleting a still-referenced row answers 409 (StillReferencedError)
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB of memory-mapped I/O
+    SQLITE_CACHE_SIZE: int = -65536  # Negative = KiB, i.e. 64 MiB page cache per connection
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_OPTIMIZE_INTERVAL: int = 3600  # Seconds between PRAGMA optimize runs; 0 disables
+    
+    # Single-writer queue (group commit)
+    WRITE_QUEUE_ENABLED: bool = True
+    WRITE_QUEUE_MAX_BATCH: int = 64  # Units of work per group commit
+    WRITE_QUEUE_WINDOW_MS: float = 0.0  # Extra wait to grow a group; 0 = only what is already queued
+    
+    # Maintained row counts (paginated totals)
+    ROW_COUNT_VERIFY_INTERVAL: int = 3600  # Seconds between drift checks against COUNT(*); 0 disables
+    
+    # Idempotency-Key store for POSTs
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # How long a key replays its original result
+    
+    # Stock reservations
+    STOCK_HOLD_TTL_SECONDS: int = 900  # Default lifetime of a standalone stock hold
+    STOCK_SWEEP_INTERVAL: int = 60  # Seconds between releases of expired holds; 0 disables
+    
+    # Bulk journal import
+    JOURNAL_IMPORT_CHUNK_SIZE: int = 2000  # Entries per multi-row insert and commit
+    JOURNAL_IMPORT_MAX_REPORTED: int = 1000  # Rejected entries listed in the report
+    
+    # Change events (SSE)
+    EVENTS_BUFFER_SIZE: int = 1000  # Recent events kept for Last-Event-ID replay
+    EVENTS_SUBSCRIBER_QUEUE: int = 100  # Events a slow stream may lag before it falls back to the buffer
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0  # Comment line sent on idle streams to keep proxies from closing them
+    
+    # Background jobs
+    JOBS_MAX_THREADS: int = 4  # Thread-pool workers for I/O-bound jobs (exports, rebuilds)
+    JOBS_MAX_PROCESSES: int = 2  # Process-pool workers for CPU-bound jobs
+    JOBS_POLL_INTERVAL: float = 5.0  # Seconds between queue checks when nothing wakes the runner
+    JOBS_RETRY_DELAY_SECONDS: int = 30  # Backoff per failed attempt
+    JOBS_PROGRESS_INTERVAL: float = 1.0  # Minimum seconds between progress writes
+    JOBS_RESULT_DIR: str = "./job_results"
+    
+    # Hot/cold archival (see app.core.archive)
+    ARCHIVE_HORIZON_DAYS: int = 730  # Movements, attendance and orders older than this move to archive files
+    ARCHIVE_DIR: str = "./archive"  # One SQLite file per year: archive_<year>.db
+    ARCHIVE_BATCH_SIZE: int = 2000  # Rows per copy-then-delete step (one short write unit each)
+    
+    # Reference data snapshot (categories, accounts, warehouses, roles, permissions)
+    REFERENCE_CHECK_INTERVAL: float = 1.0  # Seconds a worker trusts its snapshot before re-checking versions
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -24,6 +87,20 @@ class Settings(BaseSettings):
     # Performance
     CACHE_TTL: int = 300  # 5 minutes
     MAX_CONNECTIONS_PER_USER: int = 10
+    BATCH_MAX_REQUESTS: int = 50  # Sub-requests allowed in one /batch call
+    
+    # Metrics
+    METRICS_MULTIPROC_DIR: Optional[str] = None  # Shared dir for multi-worker aggregation
+    METRICS_FLUSH_INTERVAL: float = 5.0  # Seconds between worker snapshots
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5  # Seconds between event-loop lag samples
+    
+    # SQL profiler
+    SQL_SLOW_QUERY_SECONDS: float = 0.25  # Statements slower than this go to the slow-query log
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # Same fingerprint this often in one request = likely N+1
+    SQL_PROFILER_TOP_N: int = 5  # Slowest statements kept per request
+    SQL_PROFILER_SAMPLE_RATE: float = 0.1  # Share of requests kept in the ring buffer
+    SQL_PROFILER_BUFFER_SIZE: int = 200
+    SQL_PROFILER_ADMIN_USER_IDS: List[int] = []  # Users allowed to read /admin/sql-profiles; empty = nobody
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
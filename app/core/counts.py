@@ -0,0 +1,205 @@
+"""
+Maintained row counts.
+
+Paginated endpoints need a ``total``; ``COUNT(*)`` walks the whole table or
+index on every page. Instead the ``row_counts`` table keeps one counter per
+tracked table (``"products"``) and per value of a few commonly filtered
+columns (``"products:category_id=3"``, ``"sales_orders:company_id=5"``).
+
+Counters are adjusted in an ``after_flush`` hook, i.e. on the same
+connection and in the same transaction as the ORM write that changed the
+rows (including the writer's per-unit savepoints), so a rolled back write
+rolls its counter change back too. Writes that bypass the ORM unit of work
+(bulk ``insert()``) call :func:`record_rows` themselves. A periodic verifier
+recounts through the write queue and corrects any drift.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.filters import FilterQuery
+from app.core.writer import write_queue
+from app.models.models import Company, Employee, Product, RowCount, SalesOrder, User
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# model -> columns with a counter per value
+TRACKED: Dict[type, Tuple[str, ...]] = {
+    Product: ("category_id", "is_active"),
+    SalesOrder: ("company_id",),
+    Company: (),
+    Employee: (),
+    User: ("is_active",),
+}
+
+row_counts = RowCount.__table__
+
+
+def counter_key(table: str, column: Optional[str] = None, value: Any = None) -> str:
+    if column is None:
+        return table
+    if isinstance(value, bool):
+        value = int(value)
+    return f"{table}:{column}={value}"
+
+
+def _row_keys(model: type, values: Dict[str, Any]) -> Iterable[str]:
+    table = model.__tablename__
+    yield counter_key(table)
+    for column in TRACKED[model]:
+        value = values.get(column)
+        if value is not None:
+            yield counter_key(table, column, value)
+
+
+def adjust(conn: Connection, deltas: Dict[str, int]) -> None:
+    """Add ``deltas`` to their counters (upsert) on ``conn``'s current transaction"""
+    params = [{"key": key, "count": delta} for key, delta in deltas.items() if delta]
+    if not params:
+        return
+    stmt = sqlite_insert(row_counts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[row_counts.c.key],
+        set_={"count": row_counts.c.count + stmt.excluded.count},
+    )
+    conn.execute(stmt, params)
+
+
+def record_rows(conn: Connection, model: type, rows: Sequence[Dict[str, Any]], sign: int = 1) -> None:
+    """Counter update for rows written with Core ``insert()``/``delete()`` instead of the ORM"""
+    if model not in TRACKED:
+        return
+    deltas: Dict[str, int] = defaultdict(int)
+    for values in rows:
+        for key in _row_keys(model, values):
+            deltas[key] += sign
+    adjust(conn, deltas)
+
+
+@event.listens_for(Session, "after_flush")
+def _count_flushed_rows(session: Session, flush_context: Any) -> None:
+    deltas: Dict[str, int] = defaultdict(int)
+    for obj in session.new:
+        if type(obj) in TRACKED:
+            for key in _row_keys(type(obj), inspect(obj).dict):
+                deltas[key] += 1
+    for obj in session.deleted:
+        if type(obj) in TRACKED:
+            # Unloaded columns are skipped; the verifier settles those counters
+            for key in _row_keys(type(obj), inspect(obj).dict):
+                deltas[key] -= 1
+    for obj in session.dirty:
+        model = type(obj)
+        if model not in TRACKED or not TRACKED[model] or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        for column in TRACKED[model]:
+            history = state.attrs[column].history
+            if not history.has_changes():
+                continue
+            for old in history.deleted:
+                if old is not None:
+                    deltas[counter_key(model.__tablename__, column, old)] -= 1
+            for new in history.added:
+                if new is not None:
+                    deltas[counter_key(model.__tablename__, column, new)] += 1
+    if any(deltas.values()):
+        adjust(session.connection(), deltas)
+
+
+# ---- reads ----
+def get_count(db: Session, model: type, column: Optional[str] = None, value: Any = None) -> Optional[int]:
+    """Maintained counter value, or None when that counter is not tracked"""
+    if model not in TRACKED or (column is not None and column not in TRACKED[model]):
+        return None
+    key = counter_key(model.__tablename__, column, value)
+    return db.execute(select(row_counts.c.count).where(row_counts.c.key == key)).scalar() or 0
+
+
+def count_rows(db: Session, model: type, filters: Optional[FilterQuery] = None) -> int:
+    """Total matching ``filters``: O(1) from a counter when one exists, else an index-backed COUNT"""
+    if filters is None or not filters.clauses:
+        total = get_count(db, model)
+    elif len(filters.clauses) == 1 and len(filters.equal) == 1:
+        (column, value), = filters.equal.items()
+        total = get_count(db, model, column, value)
+    else:
+        total = None
+    if total is not None:
+        return total
+    query = db.query(func.count()).select_from(model)
+    if filters is not None and filters.clauses:
+        query = query.filter(*filters.clauses)
+    return query.scalar()
+
+
+# ---- verification ----
+def expected_counts(conn: Connection) -> Dict[str, int]:
+    expected: Dict[str, int] = {}
+    for model, columns in TRACKED.items():
+        table = model.__table__
+        expected[counter_key(table.name)] = conn.execute(select(func.count()).select_from(table)).scalar()
+        for column in columns:
+            rows = conn.execute(
+                select(table.c[column], func.count()).where(table.c[column].isnot(None)).group_by(table.c[column]))
+            for value, count in rows:
+                expected[counter_key(table.name, column, value)] = count
+    return expected
+
+
+def reconcile_counts(conn: Connection) -> int:
+    """Recount every tracked counter and fix the ones that drifted; returns how many were fixed"""
+    expected = expected_counts(conn)
+    stored = dict(conn.execute(select(row_counts.c.key, row_counts.c.count)).all())
+    drift = {key: count - stored.get(key, 0) for key, count in expected.items() if stored.get(key, 0) != count}
+    stale = [key for key, count in stored.items() if key not in expected and count != 0]
+    if drift:
+        adjust(conn, drift)
+    if stale:
+        conn.execute(delete(row_counts).where(row_counts.c.key.in_(stale)))
+    fixed = len(drift) + len(stale)
+    if fixed and stored:
+        logger.warning(f"Corrected {fixed} drifted row counters")
+    return fixed
+
+
+async def verify_counts() -> int:
+    """Reconcile through the write queue so the recount sees no concurrent writes"""
+    return await write_queue.run(lambda db: reconcile_counts(db.connection()))
+
+
+_verify_task: Optional[asyncio.Task] = None
+
+async def _verify_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await verify_counts()
+        except Exception as e:
+            logger.warning(f"Row count verification failed: {e}")
+
+def start_count_verifier() -> None:
+    """Reconcile row counters every ROW_COUNT_VERIFY_INTERVAL seconds"""
+    global _verify_task
+    if settings.ROW_COUNT_VERIFY_INTERVAL <= 0:
+        return
+    if _verify_task is None or _verify_task.done():
+        _verify_task = asyncio.create_task(_verify_periodically(settings.ROW_COUNT_VERIFY_INTERVAL))
+
+async def stop_count_verifier() -> None:
+    global _verify_task
+    if _verify_task is not None:
+        _verify_task.cancel()
+        try:
+            await _verify_task
+        except asyncio.CancelledError:
+            pass
+        _verify_task = None
@@ -1,29 +1,142 @@
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import threading
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import Request
 from app.core.config import get_settings
+from app.core.metrics import instrument_pool, instrument_statement_cache
+from app.core.profiler import instrument_engine
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 import asyncio
 
+def sqlite_pragmas(read_only: bool = False) -> List[str]:
+    """Per-connection PRAGMAs of the tuned SQLite profile (see SQLITE_* settings)"""
+    if read_only:
+        # journal_mode is a property of the file, set by the read-write connections
+        return ["PRAGMA query_only=ON", *sqlite_pragmas()[1:]]
+    return [
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA foreign_keys={'ON' if settings.SQLITE_FOREIGN_KEYS else 'OFF'}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+    ]
+
+def set_sqlite_pragmas(dbapi_connection, connection_record, read_only: bool = False) -> None:
+    """Connect event: apply the tuned profile to every new DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas(read_only):
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+def set_sqlite_read_pragmas(dbapi_connection, connection_record) -> None:
+    set_sqlite_pragmas(dbapi_connection, connection_record, read_only=True)
+
+def configure_sqlite(sync_engine, read_only: bool = False) -> None:
+    """Register the tuned SQLite profile on a (sync) ``Engine``"""
+    if sync_engine.dialect.name == "sqlite" and settings.SQLITE_TUNING:
+        event.listen(sync_engine, "connect", set_sqlite_read_pragmas if read_only else set_sqlite_pragmas)
+
+def read_only_url(url: str) -> str:
+    """``url`` opened read-only: a SQLite file becomes ``sqlite:///file:<path>?mode=ro&uri=true``"""
+    parsed = make_url(url)
+    database = parsed.database
+    if parsed.get_backend_name() != "sqlite" or not database or database == ":memory:" or database.startswith("file:"):
+        return url
+    return parsed.set(database=f"file:{database}", query={**parsed.query, "mode": "ro", "uri": "true"}) \
+        .render_as_string(hide_password=False)
+
 # Sync engine for compatibility
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False},  # Only needed for SQLite
-    pool_pre_ping=True,  # Validate connections
-    pool_recycle=300,  # Recycle connections every 5 minutes
+    pool_pre_ping=settings.DB_POOL_PRE_PING,  # A local SQLite file cannot drop connections
+    pool_recycle=settings.DB_POOL_RECYCLE,  # Recycling would throw away the warm page cache
 )
 
 # Async engine for performance
 async_engine = create_async_engine(
     settings.ASYNC_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    pool_pre_ping=True,
-    pool_recycle=300,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
     echo=False,  # Set to True for SQL debugging
 )
 
+# Tuned SQLite profile: WAL, synchronous=NORMAL, busy_timeout, mmap, page cache
+configure_sqlite(engine)
+configure_sqlite(async_engine.sync_engine)
+
+# Single connection owned by the writer thread (app.core.writer)
+write_engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+)
+configure_sqlite(write_engine)
+
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+def _begin_immediate(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+def configure_writer(sync_engine) -> None:
+    """Explicit ``BEGIN IMMEDIATE`` transactions on a writer's engine"""
+    if sync_engine.dialect.name == "sqlite":
+        # pysqlite's implicit transactions break SAVEPOINT; take over BEGIN ourselves.
+        # IMMEDIATE grabs the write lock up front instead of failing on lock upgrade.
+        event.listen(sync_engine, "connect", _disable_pysqlite_transactions)
+        event.listen(sync_engine, "begin", _begin_immediate)
+
+configure_writer(write_engine)
+
+# Read-only connections for GET handlers, reports and the reference snapshot. In WAL mode
+# every reader has its own snapshot of the file and runs in parallel with the writer.
+read_engine = create_engine(
+    settings.DATABASE_READ_URL or read_only_url(settings.DATABASE_URL),
+    connect_args={"check_same_thread": False},
+    pool_size=settings.DB_READ_POOL_SIZE,
+    max_overflow=settings.DB_READ_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+)
+configure_sqlite(read_engine, read_only=True)
+
+# Pool checkout stats for /metrics
+instrument_pool(engine, "sync")
+instrument_pool(read_engine, "read")
+instrument_pool(async_engine.sync_engine, "async")
+instrument_pool(write_engine, "writer")
+
+# Compiled statement cache hit rate for /metrics (see app.core.statements)
+instrument_statement_cache(engine, "sync")
+instrument_statement_cache(read_engine, "read")
+instrument_statement_cache(async_engine.sync_engine, "async")
+instrument_statement_cache(write_engine, "writer")
+
+# Per-request SQL profiling / slow-query log
+instrument_engine(engine)
+instrument_engine(read_engine)
+instrument_engine(async_engine.sync_engine)
+instrument_engine(write_engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
 AsyncSessionLocal = async_sessionmaker(
     async_engine, 
     class_=AsyncSession, 
@@ -31,18 +144,181 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
-def get_db():
-    """Sync database session - for compatibility"""
-    db = SessionLocal()
+# Session shared by every sub-request of an atomic batch (see endpoints/batch.py)
+shared_session: ContextVar[Optional[Session]] = ContextVar("shared_session", default=None)
+
+# Requests routed to the read-only pool by get_db
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+def _session(factory: sessionmaker):
+    shared = shared_session.get()
+    if shared is not None:
+        # The batch endpoint commits/rolls back and closes it
+        yield shared
+        return
+    db = factory()
     try:
         yield db
     finally:
         db.close()
 
+def get_db(request: Request):
+    """Sync database session: read-only for GET/HEAD/OPTIONS, read-write for every other method"""
+    yield from _session(ReadSessionLocal if request.method in READ_METHODS else SessionLocal)
+
+def get_read_db():
+    """Read-only session whatever the method, for handlers that only read (e.g. login)"""
+    yield from _session(ReadSessionLocal)
+
+def get_write_db():
+    """Read-write session whatever the method, for a GET that must write"""
+    yield from _session(SessionLocal)
+
+# ---- Per-company shards (see app.core.sharding) ----
+SHARED = "shared"  # Location name of the main database
+
+def _disable_foreign_keys(dbapi_connection, connection_record) -> None:
+    # A shard's rows point at companies and products, which live in the shared file
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA foreign_keys=OFF")
+    finally:
+        cursor.close()
+
+class ShardRouter:
+    """Engines, sessions and writer queues of the shard files in SHARDS"""
+
+    def __init__(self, urls: Dict[str, str]):
+        if SHARED in urls:
+            raise ValueError(f"{SHARED!r} is reserved for the main database; rename that shard")
+        self.urls = dict(urls)
+        self._engines: Dict[str, Engine] = {}
+        self._factories: Dict[Tuple[str, bool], sessionmaker] = {}
+        self._writers: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        for name, url in self.urls.items():
+            # One connection for the shard's writer queue (and tools), a read-only pool for handlers
+            writer = create_engine(
+                url,
+                connect_args={"check_same_thread": False},
+                pool_size=1,
+                max_overflow=0,
+                pool_pre_ping=settings.DB_POOL_PRE_PING,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+            )
+            reader = create_engine(
+                read_only_url(url),
+                connect_args={"check_same_thread": False},
+                pool_size=settings.DB_READ_POOL_SIZE,
+                max_overflow=settings.DB_READ_MAX_OVERFLOW,
+                pool_pre_ping=settings.DB_POOL_PRE_PING,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+            )
+            configure_sqlite(writer)
+            configure_writer(writer)
+            configure_sqlite(reader, read_only=True)
+            for read_only, shard_engine in ((False, writer), (True, reader)):
+                label = f"shard:{name}:read" if read_only else f"shard:{name}"
+                if shard_engine.dialect.name == "sqlite":
+                    event.listen(shard_engine, "connect", _disable_foreign_keys)
+                instrument_pool(shard_engine, label)
+                instrument_statement_cache(shard_engine, label)
+                instrument_engine(shard_engine)
+                self._engines[label] = shard_engine
+                self._factories[(name, read_only)] = sessionmaker(
+                    autocommit=False, autoflush=False, bind=shard_engine)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.urls)
+
+    def engine(self, name: str, read_only: bool = False) -> Engine:
+        if name == SHARED:
+            return read_engine if read_only else engine
+        return self._engines[f"shard:{name}:read" if read_only else f"shard:{name}"]
+
+    def engines(self) -> Dict[str, Engine]:
+        return dict(self._engines)
+
+    def session(self, name: str, read_only: bool = False) -> Session:
+        """New session on a shard, or on the main database for ``SHARED``"""
+        if name == SHARED:
+            return (ReadSessionLocal if read_only else SessionLocal)()
+        return self._factories[(name, read_only)]()
+
+    def writer(self, name: str):
+        """The shard's own write queue (the main ``write_queue`` for ``SHARED``)"""
+        from app.core.writer import WriteQueue, write_queue  # imports this module
+
+        if name == SHARED:
+            return write_queue
+        with self._lock:
+            queue = self._writers.get(name)
+            if queue is None:
+                queue = self._writers[name] = WriteQueue(
+                    self._factories[(name, False)],
+                    max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+                    window_ms=settings.WRITE_QUEUE_WINDOW_MS,
+                )
+            return queue
+
+    def stop_writers(self) -> None:
+        with self._lock:
+            writers, self._writers = list(self._writers.values()), {}
+        for queue in writers:
+            queue.stop()
+
+shards = ShardRouter(settings.SHARDS)
+
 async def get_async_db():
     """Async database session - for performance"""
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+# ---- Scheduled PRAGMA optimize / ANALYZE ----
+_optimize_task: Optional[asyncio.Task] = None
+
+async def optimize_database() -> None:
+    """Refresh query planner statistics (ANALYZE on first run, PRAGMA optimize after)"""
+    async with async_engine.connect() as conn:
+        analyzed = (await conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        )).first()
+        if analyzed is None:
+            await conn.execute(text("ANALYZE"))
+        else:
+            await conn.execute(text("PRAGMA optimize"))
+        await conn.commit()
+
+async def _optimize_periodically(interval: float) -> None:
+    while True:
+        try:
+            await optimize_database()
+        except Exception as e:
+            logger.warning(f"PRAGMA optimize failed: {e}")
+        await asyncio.sleep(interval)
+
+def start_optimize_scheduler() -> None:
+    """Run ``optimize_database`` now and then every SQLITE_OPTIMIZE_INTERVAL seconds"""
+    global _optimize_task
+    if async_engine.dialect.name != "sqlite" or settings.SQLITE_OPTIMIZE_INTERVAL <= 0:
+        return
+    if _optimize_task is None or _optimize_task.done():
+        _optimize_task = asyncio.create_task(_optimize_periodically(settings.SQLITE_OPTIMIZE_INTERVAL))
+
+async def stop_optimize_scheduler() -> None:
+    global _optimize_task
+    if _optimize_task is not None:
+        _optimize_task.cancel()
+        try:
+            await _optimize_task
+        except asyncio.CancelledError:
+            pass
+        _optimize_task = None
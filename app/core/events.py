@@ -0,0 +1,216 @@
+"""
+Change events for dashboards (Server-Sent Events).
+
+The CRUD layer publishes an event once its write has committed::
+
+    events.publish("orders", "created", {"id": 7, ...}, db=db)
+
+The in-process broker assigns it an id, keeps the last EVENTS_BUFFER_SIZE
+events in a ring buffer and fans it out to every subscriber of that topic.
+Subscribers each get a bounded queue: a consumer that falls more than
+EVENTS_SUBSCRIBER_QUEUE events behind is never waited for; its queue is
+dropped and it catches up from the ring buffer instead, or, if it fell past
+the buffer too, receives a ``reset`` event telling it to refetch. The same
+replay serves reconnects with ``Last-Event-ID``.
+
+Ids are ``<boot time>.<pid>-<sequence>``, so an id from before a restart
+(or from another worker) also leads to a ``reset``. Each worker process has
+its own broker; a forked worker starts a fresh one.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.core.database import shared_session
+
+settings = get_settings()
+
+TOPICS = ("stock", "orders", "products")
+
+EVENTS_PUBLISHED = metrics.registry.counter("events_published_total", "Change events published", ("topic",))
+EVENT_SUBSCRIBERS = metrics.registry.gauge("event_subscribers", "Open event streams")
+EVENT_OVERFLOWS = metrics.registry.counter(
+    "event_subscriber_overflows_total", "Times a slow event stream fell back to the replay buffer")
+
+
+class Event:
+    __slots__ = ("seq", "id", "topic", "type", "data")
+
+    def __init__(self, seq: int, id: str, topic: str, type: str, data: Dict[str, Any]):
+        self.seq = seq
+        self.id = id
+        self.topic = topic
+        self.type = type
+        self.data = data
+
+    def encode(self) -> bytes:
+        """SSE frame; the event name is ``<topic>.<type>``"""
+        payload = json.dumps(self.data, default=str, separators=(",", ":"))
+        return f"id: {self.id}\nevent: {self.topic}.{self.type}\ndata: {payload}\n\n".encode()
+
+
+class Subscription:
+    """One open stream: its topics and bounded queue, owned by an event loop"""
+
+    def __init__(self, topics: FrozenSet[str], loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.topics = topics
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def _drain(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def offer(self, item: Optional[Event]) -> None:
+        """Runs on ``loop``; never blocks the publisher"""
+        if item is None:  # broker closing
+            self._drain()
+            self.queue.put_nowait(None)
+            return
+        if item.topic not in self.topics or self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too slow: drop what is queued; the stream catches up from the ring buffer
+            self.overflowed = True
+            self._drain()
+            self.queue.put_nowait(item)
+            EVENT_OVERFLOWS.inc()
+
+
+class EventBroker:
+    """Per-topic fan-out with a replay buffer; ``publish`` is safe from any thread"""
+
+    def __init__(self, buffer_size: int, queue_size: int):
+        self.epoch = f"{int(time.time())}.{os.getpid()}"
+        self.queue_size = queue_size
+        self._seq = 0
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def publish(self, topic: str, type: str, data: Dict[str, Any]) -> Event:
+        with self._lock:
+            self._seq += 1
+            item = Event(self._seq, f"{self.epoch}-{self._seq}", topic, type, data)
+            self._buffer.append(item)
+            subscribers = list(self._subscribers)
+        EVENTS_PUBLISHED.inc(topic)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, item)
+            except RuntimeError:  # loop already closed
+                pass
+        return item
+
+    def since(self, seq: int, topics: FrozenSet[str]) -> Optional[List[Event]]:
+        """Buffered events after ``seq``; None if some of them are no longer buffered"""
+        with self._lock:
+            if seq > self._seq or (self._buffer and self._buffer[0].seq > seq + 1):
+                return None
+            return [item for item in self._buffer if item.seq > seq and item.topic in topics]
+
+    def parse_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequence number of a Last-Event-ID from this broker, else None"""
+        epoch, _, seq = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _reset(self) -> Event:
+        with self._lock:
+            return Event(self._seq, f"{self.epoch}-{self._seq}", "stream", "reset", {})
+
+    async def stream(self, topics: Iterable[str], last_event_id: Optional[str] = None,
+                     heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Event]]:
+        """Events for ``topics``, replaying from ``last_event_id``; None marks a heartbeat"""
+        subscription = Subscription(frozenset(topics), asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            cursor = self._seq
+        EVENT_SUBSCRIBERS.inc()
+        try:
+            if last_event_id:
+                resume = self.parse_id(last_event_id)
+                backlog = self.since(resume, subscription.topics) if resume is not None else None
+                if backlog is None:
+                    reset = self._reset()
+                    cursor = reset.seq
+                    yield reset
+                else:
+                    # Anything published since subscribing is in the queue too; the cursor skips it
+                    for item in backlog:
+                        cursor = item.seq
+                        yield item
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if item is None:
+                    return
+                if subscription.overflowed:
+                    # ``item`` is in the ring buffer as well, so the backlog covers it
+                    subscription.overflowed = False
+                    backlog = self.since(cursor, subscription.topics)
+                    if backlog is None:
+                        reset = self._reset()
+                        cursor = reset.seq
+                        yield reset
+                    else:
+                        for buffered in backlog:
+                            cursor = buffered.seq
+                            yield buffered
+                elif item.seq > cursor:
+                    cursor = item.seq
+                    yield item
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscription)
+            EVENT_SUBSCRIBERS.dec()
+
+    def close(self) -> None:
+        """End every open stream (shutdown would otherwise wait for them)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, None)
+            except RuntimeError:
+                pass
+
+
+broker = EventBroker(settings.EVENTS_BUFFER_SIZE, settings.EVENTS_SUBSCRIBER_QUEUE)
+# Pre-forked workers (app.server) must not share the master's epoch, sequence or lock
+os.register_at_fork(after_in_child=lambda: broker.__init__(settings.EVENTS_BUFFER_SIZE, settings.EVENTS_SUBSCRIBER_QUEUE))
+
+
+def publish(topic: str, type: str, data: Dict[str, Any], db: Optional[Session] = None) -> None:
+    """Publish after commit; inside an atomic batch the event waits for the batch's commit"""
+    if db is not None and shared_session.get() is db:
+        db.info.setdefault("pending_events", []).append((topic, type, data))
+        return
+    broker.publish(topic, type, data)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    for topic, type, data in session.info.pop("pending_events", ()):
+        broker.publish(topic, type, data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop("pending_events", None)
@@ -0,0 +1,198 @@
+"""
+Sparse fieldsets.
+
+``?fields=id,sku,name,unit_price`` narrows a response to the listed fields
+and pushes the same selection down to SQL: requested columns are loaded
+with ``load_only`` and relationships are only loaded when a field names
+them. Dotted names select inside a relationship, e.g.
+``?fields=id,order_date,items.product_id``; naming a relationship alone
+(``items``) returns it whole.
+
+Endpoints opt in with a dependency and hand the selection's loader
+options to the CRUD query::
+
+    fields: Optional[FieldSelection] = Depends(sparse_fields(schemas.ProductRead))
+    products = crud.product.get_multi(db, options=fields.load_options(Product) if fields else ())
+    return fields.response(products) if fields else products
+"""
+import copy
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+
+from app.core.serialization import JSONBytesResponse, dump_json, get_type_adapter
+from app.models.models import Product, SalesOrder
+
+# Nested selection: field name -> sub-selection (empty = the whole field)
+FieldTree = Dict[str, "FieldTree"]
+# Hashable form of a FieldTree, used as a cache key
+FrozenTree = Tuple[Tuple[str, "FrozenTree"], ...]
+
+# Properties computed in Python: what they read, so it is loaded with them
+COMPUTED_FIELDS: Dict[Tuple[type, str], FieldTree] = {
+    (SalesOrder, "total_amount"): {"items": {"quantity": {}, "unit_price": {}}},
+}
+
+# Relationships served from the reference snapshot (app.core.reference): only the foreign key is loaded
+REFERENCE_FIELDS: Dict[Tuple[type, str], str] = {
+    (Product, "category"): "category_id",
+}
+
+
+def parse_fields(value: str) -> FieldTree:
+    """``"id,items.product_id"`` -> ``{"id": {}, "items": {"product_id": {}}}``"""
+    tree: FieldTree = {}
+    for raw in value.split(","):
+        name = raw.strip()
+        if not name:
+            continue
+        node = tree
+        for part in name.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def freeze(tree: FieldTree) -> FrozenTree:
+    return tuple(sorted((name, freeze(sub)) for name, sub in tree.items()))
+
+
+def _nested_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    """The pydantic model inside ``X``, ``Optional[X]`` or ``List[X]``, if any"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = _nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+def _swap_model(annotation: Any, old: type, new: type) -> Any:
+    if annotation is old:
+        return new
+    args = get_args(annotation)
+    if not args:
+        return annotation
+    origin = get_origin(annotation)
+    swapped = tuple(_swap_model(arg, old, new) for arg in args)
+    if origin is Union:
+        return Union[swapped]
+    if origin is list:
+        return List[swapped[0]]
+    return annotation
+
+
+def validate_tree(schema: Type[BaseModel], tree: FieldTree, prefix: str = "") -> None:
+    for name, sub in tree.items():
+        field = schema.model_fields.get(name)
+        if field is None:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{prefix}{name}'")
+        if sub:
+            nested = _nested_model(field.annotation)
+            if nested is None:
+                raise HTTPException(status_code=400, detail=f"Field '{prefix}{name}' has no sub-fields")
+            validate_tree(nested, sub, f"{prefix}{name}.")
+
+
+@lru_cache(maxsize=256)
+def narrowed_schema(schema: Type[BaseModel], tree: FrozenTree) -> Type[BaseModel]:
+    """``schema`` restricted to the selected fields (recursively); cached per selection"""
+    selected = dict(tree)
+    definitions: Dict[str, Any] = {}
+    for name, field in schema.model_fields.items():
+        if name not in selected:
+            continue
+        sub = selected[name]
+        annotation = field.annotation
+        if sub:
+            nested = _nested_model(annotation)
+            annotation = _swap_model(annotation, nested, narrowed_schema(nested, sub))
+        definitions[name] = (annotation, field)
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+def _merge(target: FieldTree, extra: FieldTree) -> None:
+    for name, sub in extra.items():
+        if name in target and not target[name]:
+            continue  # already loading the whole relationship
+        if name in target and not sub:
+            target[name] = {}
+        else:
+            _merge(target.setdefault(name, {}), sub)
+
+
+def _loader_options(model: type, tree: FieldTree, parent: Any = None) -> List[Any]:
+    mapper = inspect(model)
+    load_tree = copy.deepcopy(tree)
+    for name in tree:
+        dependency = COMPUTED_FIELDS.get((model, name))
+        if dependency:
+            _merge(load_tree, dependency)
+        foreign_key = REFERENCE_FIELDS.get((model, name))
+        if foreign_key:
+            del load_tree[name]
+            load_tree.setdefault(foreign_key, {})
+
+    # Primary key and the local side of loaded relationships are always needed to link rows
+    keys = {mapper.get_property_by_column(column).key for column in mapper.primary_key}
+    keys.update(name for name in load_tree if name in mapper.column_attrs)
+    for name in load_tree:
+        if name in mapper.relationships:
+            keys.update(mapper.get_property_by_column(column).key
+                        for column in mapper.relationships[name].local_columns)
+    columns = [getattr(model, key) for key in sorted(keys)]
+    options: List[Any] = [parent.load_only(*columns) if parent is not None else load_only(*columns)]
+    for name, sub in load_tree.items():
+        relationship = mapper.relationships.get(name)
+        if relationship is None:
+            continue
+        attr = getattr(model, name)
+        loader = parent.selectinload(attr) if parent is not None else selectinload(attr)
+        if sub:
+            options.extend(_loader_options(relationship.mapper.class_, sub, loader))
+        else:
+            options.append(loader)
+    return options
+
+
+class FieldSelection:
+    """A validated ``?fields=`` selection for one response schema"""
+
+    def __init__(self, schema: Type[BaseModel], tree: FieldTree):
+        self.schema = schema
+        self.tree = tree
+        self.model = narrowed_schema(schema, freeze(tree))
+
+    def load_options(self, model: type) -> List[Any]:
+        """Loader options selecting only what the response needs from ``model``"""
+        return _loader_options(model, self.tree)
+
+    def response(self, content: Any, status_code: int = 200) -> JSONBytesResponse:
+        tp = List[self.model] if isinstance(content, list) else self.model
+        return JSONBytesResponse(dump_json(get_type_adapter(tp), content), status_code=status_code)
+
+
+def sparse_fields(schema: Type[BaseModel]) -> Callable[..., Optional[FieldSelection]]:
+    """Dependency parsing ``?fields=`` against ``schema``; None when absent"""
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None, description="Comma-separated fields to return; dotted names select nested fields"),
+    ) -> Optional[FieldSelection]:
+        if not fields:
+            return None
+        tree = parse_fields(fields)
+        if not tree:
+            return None
+        validate_tree(schema, tree)
+        return FieldSelection(schema, tree)
+
+    return dependency
@@ -0,0 +1,286 @@
+"""
+Index-aware filtering and sorting for list endpoints.
+
+Each resource declares which columns can be filtered (and how) and which
+can be sorted on::
+
+    product_filters = FilterSpec(Product, filters={"unit_price": RANGE, "is_active": EQUAL}, sorts=("unit_price",))
+
+Clients then use ``?unit_price__gte=10&is_active=true&sort=-unit_price``.
+Operators: ``field`` / ``field__eq``, ``__in`` (comma-separated),
+``__gt``, ``__gte``, ``__lt``, ``__lte`` and ``__between`` (``lo,hi``).
+
+A request is only accepted when one of the table's indexes can serve it:
+equality filters cover a leading prefix of the index, at most one range
+filter sits on the next column, every filtered column is part of the index,
+and the sort column (if any) is the column the index is ordered by right
+after the (then complete) equality prefix. Anything else would be a full table scan or a temp-b-tree sort and is
+rejected with 400. Verify the rule against SQLite's planner with::
+
+    python -m app.core.filters
+"""
+import itertools
+import sys
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request
+from sqlalchemy import Column, and_, select
+from sqlalchemy.sql import operators
+
+EQUAL = ("eq", "in")
+RANGE = ("eq", "gt", "gte", "lt", "lte", "between")
+
+RANGE_OPS = frozenset(("gt", "gte", "lt", "lte", "between"))
+RESERVED_PARAMS = frozenset(("skip", "limit", "fields", "sort", "page", "size", "include_archived"))
+
+# Every FilterSpec, for the plan checker
+FILTER_SPECS: List["FilterSpec"] = []
+
+
+def _coerce(column: Column, raw: str) -> Any:
+    python_type = column.type.python_type
+    if python_type is bool:
+        if raw.lower() in ("1", "true", "yes"):
+            return True
+        if raw.lower() in ("0", "false", "no"):
+            return False
+        raise ValueError(raw)
+    if python_type is datetime:
+        return datetime.fromisoformat(raw)
+    if python_type is date:
+        return date.fromisoformat(raw)
+    if python_type is Decimal:
+        try:
+            return Decimal(raw)
+        except InvalidOperation:
+            raise ValueError(raw)
+    return python_type(raw)
+
+
+class FilterQuery:
+    """Validated filters and sort for one request"""
+
+    def __init__(self, clauses: Sequence[Any] = (), order_by: Sequence[Any] = (),
+                 equal: Optional[Dict[str, Any]] = None):
+        self.clauses = list(clauses)
+        self.order_by = list(order_by)
+        self.equal = equal or {}  # column -> value of the plain equality filters
+
+    def apply(self, query: Any) -> Any:
+        """Add the WHERE and ORDER BY parts to a Query or Select"""
+        if self.clauses:
+            query = query.filter(and_(*self.clauses))
+        if self.order_by:
+            query = query.order_by(*self.order_by)
+        return query
+
+
+def merge_pages(pages: Iterable[Sequence[Any]], order_by: Sequence[Any], skip: int, limit: int) -> List[Any]:
+    """Rows ``skip:skip + limit`` of several sources, each queried for its rows ``0:skip + limit``.
+
+    Rows are ordered like ``ORDER BY <order_by>, id``; a row found in more
+    than one source (same id) is kept from the first.
+    """
+    seen = set()
+    merged = []
+    for row in itertools.chain.from_iterable(pages):
+        if row.id not in seen:
+            seen.add(row.id)
+            merged.append(row)
+    merged.sort(key=lambda row: row.id)
+    for clause in reversed(order_by):  # Stable sorts, last key first
+        column = clause.element.key
+        # SQLite sorts NULL first
+        merged.sort(key=lambda row: (getattr(row, column) is not None, getattr(row, column)),
+                    reverse=clause.modifier is operators.desc_op)
+    return merged[skip:skip + limit]
+
+
+class FilterSpec:
+    """Declarative filter/sort spec for one model, checked against its indexes"""
+
+    def __init__(self, model: type, *, filters: Mapping[str, Sequence[str]], sorts: Sequence[str] = ()):
+        self.model = model
+        self.table = model.__table__
+        self.filters = {name: tuple(ops) for name, ops in filters.items()}
+        pk = tuple(column.key for column in self.table.primary_key.columns)
+        self.primary_key = pk
+        self.sorts = tuple(dict.fromkeys((*sorts, *pk)))
+        # SQLite appends the rowid to every index, so it orders ties by primary key
+        self.indexes = [tuple(column.key for column in index.columns) + pk for index in self.table.indexes]
+        self.indexes.append(pk)
+        FILTER_SPECS.append(self)
+
+    # ---- index rule ----
+    def index_for(self, equal: FrozenSet[str], multi: FrozenSet[str], ranged: FrozenSet[str],
+                  sort: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """First index able to serve the combination, or None"""
+        if len(ranged) > 1 or (multi and sort):
+            # Two ranges, or IN (several index ranges) with ORDER BY, need a sort step
+            return None
+        for columns in self.indexes:
+            if not (equal | multi | ranged) <= set(columns):
+                continue
+            prefix = 0
+            while prefix < len(columns) and columns[prefix] in equal | multi:
+                prefix += 1
+            following = columns[prefix] if prefix < len(columns) else None
+            if ranged and next(iter(ranged)) != following:
+                continue
+            if sort is not None and (sort != following or not equal <= set(columns[:prefix])):
+                # Ordered reads need every equality inside the prefix; a leftover one makes
+                # the planner pick that column's index and sort afterwards
+                continue
+            if prefix or ranged or sort is not None:
+                return columns
+        return None
+
+    # ---- request parsing ----
+    def parse(self, params: Mapping[str, str]) -> FilterQuery:
+        clauses = []
+        equal_values: Dict[str, Any] = {}
+        equal, multi, ranged = set(), set(), set()
+        for key, raw in params.items():
+            if key in RESERVED_PARAMS:
+                continue
+            name, _, op = key.partition("__")
+            op = op or "eq"
+            if name not in self.filters:
+                if "__" in key:
+                    raise HTTPException(status_code=400, detail=f"Unknown filter '{key}'")
+                continue
+            if op not in self.filters[name]:
+                raise HTTPException(status_code=400, detail=f"Operator '{op}' is not supported for '{name}'")
+            column = self.table.columns[name]
+            try:
+                if op in ("in", "between"):
+                    values = [_coerce(column, part.strip()) for part in raw.split(",")]
+                else:
+                    value = _coerce(column, raw)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail=f"Invalid value for '{key}': {raw!r}")
+
+            if op == "eq":
+                equal.add(name)
+                equal_values[name] = value
+                clauses.append(column == value)
+            elif op == "in":
+                multi.add(name)
+                clauses.append(column.in_(values))
+            elif op == "between":
+                if len(values) != 2:
+                    raise HTTPException(status_code=400, detail=f"'{key}' takes two values: lo,hi")
+                ranged.add(name)
+                clauses.append(column.between(*values))
+            else:
+                ranged.add(name)
+                clauses.append({"gt": column > value, "gte": column >= value,
+                                "lt": column < value, "lte": column <= value}[op])
+
+        order_by = []
+        sort = params.get("sort")
+        sort_name = None
+        if sort:
+            sort_name = sort.lstrip("-")
+            if sort_name not in self.sorts:
+                raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort_name}'")
+            column = self.table.columns[sort_name]
+            order_by.append(column.desc() if sort.startswith("-") else column.asc())
+
+        if (equal or multi or ranged or sort_name) and self.index_for(
+                frozenset(equal), frozenset(multi), frozenset(ranged), sort_name) is None:
+            used = ", ".join(sorted(equal | multi | ranged)) or "nothing"
+            detail = f"Filtering on {used}" + (f" sorted by {sort_name}" if sort_name else "")
+            raise HTTPException(status_code=400, detail=f"{detail} is not backed by an index")
+        return FilterQuery(clauses, order_by, equal_values)
+
+    # ---- plan checking ----
+    def combinations(self) -> Iterator[Tuple[FrozenSet[str], FrozenSet[str], FrozenSet[str], Optional[str]]]:
+        """Every accepted (equal, in, range, sort) combination"""
+        kinds: Dict[str, List[Optional[str]]] = {}
+        for name, ops in self.filters.items():
+            kinds[name] = [None] + [kind for kind, allowed in (
+                ("eq", "eq" in ops), ("in", "in" in ops), ("range", bool(RANGE_OPS & set(ops)))) if allowed]
+        names = list(kinds)
+        for choice in itertools.product(*(kinds[name] for name in names)):
+            equal = frozenset(n for n, k in zip(names, choice) if k == "eq")
+            multi = frozenset(n for n, k in zip(names, choice) if k == "in")
+            ranged = frozenset(n for n, k in zip(names, choice) if k == "range")
+            for sort in (None, *self.sorts):
+                if not (equal or multi or ranged or sort):
+                    continue
+                if self.index_for(equal, multi, ranged, sort) is not None:
+                    yield equal, multi, ranged, sort
+
+    def sample_query(self, equal: FrozenSet[str], multi: FrozenSet[str], ranged: FrozenSet[str],
+                     sort: Optional[str]) -> Any:
+        def sample(name: str) -> Any:
+            python_type = self.table.columns[name].type.python_type
+            return {bool: True, date: date(2025, 1, 1), datetime: datetime(2025, 1, 1),
+                    Decimal: Decimal("1"), str: "x"}.get(python_type, 1)
+
+        stmt = select(self.model)
+        for name in sorted(equal):
+            stmt = stmt.where(self.table.columns[name] == sample(name))
+        for name in sorted(multi):
+            stmt = stmt.where(self.table.columns[name].in_([sample(name), sample(name)]))
+        for name in sorted(ranged):
+            stmt = stmt.where(self.table.columns[name] >= sample(name))
+        if sort is not None:
+            stmt = stmt.order_by(self.table.columns[sort])
+        return stmt
+
+
+def filter_params(spec: FilterSpec) -> Callable[..., FilterQuery]:
+    """Dependency turning the request's query string into a FilterQuery"""
+
+    def dependency(request: Request) -> FilterQuery:
+        return spec.parse(request.query_params)
+
+    return dependency
+
+
+def explain(conn: Any, stmt: Any) -> List[str]:
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def check_plans(conn: Any) -> List[str]:
+    """Run EXPLAIN QUERY PLAN for every accepted combination; returns the failures"""
+    failures = []
+    for spec in FILTER_SPECS:
+        for equal, multi, ranged, sort in spec.combinations():
+            plan = explain(conn, spec.sample_query(equal, multi, ranged, sort))
+            table_plan = [line for line in plan if spec.table.name in line]
+            uses_index = all("USING" in line for line in table_plan) or (
+                not (equal or multi or ranged) and sort in spec.primary_key)  # plain rowid-order scan
+            if not uses_index or any("TEMP B-TREE" in line for line in plan):
+                failures.append(f"{spec.table.name} eq={sorted(equal)} in={sorted(multi)} "
+                                f"range={sorted(ranged)} sort={sort}: {' | '.join(plan)}")
+    return failures
+
+
+def main() -> int:
+    from sqlalchemy import create_engine
+
+    import app.crud  # noqa: F401  registers the resource specs
+    from app.models.models import Base
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        checked = sum(1 for spec in FILTER_SPECS for _ in spec.combinations())
+        failures = check_plans(conn)
+    for failure in failures:
+        print(f"NOT INDEX-BACKED: {failure}")
+    print(f"{checked - len(failures)}/{checked} filter/sort combinations use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    # Go through the importable module: that is where app.crud registers its specs
+    from app.core.filters import main as checked_main
+
+    sys.exit(checked_main())
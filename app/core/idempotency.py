@@ -0,0 +1,71 @@
+"""
+Idempotency keys for POST endpoints.
+
+A client sends ``Idempotency-Key: <uuid>`` with a create request and may
+retry it freely: the first request stores the key together with a
+fingerprint of its payload and the id of the row it created, *in the same
+write unit as that row*. A retry finds the key and gets the original
+resource back without writing again; reusing a key for a different payload
+is rejected with 422. Rows expire after IDEMPOTENCY_TTL_SECONDS and are
+purged by later writes.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import IdempotencyKey
+
+settings = get_settings()
+
+idempotency_keys = IdempotencyKey.__table__
+
+
+class IdempotentReplay(Exception):
+    """Raised inside a write unit when the key was claimed meanwhile; carries the earlier resource id"""
+
+    def __init__(self, resource_id: int):
+        super().__init__(resource_id)
+        self.resource_id = resource_id
+
+
+class IdempotencyClaim:
+    """One request's Idempotency-Key, scoped to an endpoint"""
+
+    def __init__(self, scope: str, key: str, payload: BaseModel):
+        self.key = f"{scope}:{key}"
+        self.fingerprint = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+    def _lookup(self, db: Session) -> Optional[int]:
+        row = db.execute(
+            select(idempotency_keys.c.fingerprint, idempotency_keys.c.resource_id)
+            .where(idempotency_keys.c.key == self.key, idempotency_keys.c.expires_at > datetime.utcnow())
+        ).first()
+        if row is None:
+            return None
+        if row.fingerprint != self.fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        return row.resource_id
+
+    def previous(self, db: Session) -> Optional[int]:
+        """Resource created by an earlier request with this key, if any"""
+        return self._lookup(db)
+
+    def save(self, wdb: Session, resource_id: int) -> None:
+        """Record the key in the caller's write unit (raises IdempotentReplay if it is taken)"""
+        now = datetime.utcnow()
+        wdb.execute(delete(idempotency_keys).where(idempotency_keys.c.expires_at <= now))
+        earlier = self._lookup(wdb)
+        if earlier is not None:
+            raise IdempotentReplay(earlier)
+        wdb.execute(idempotency_keys.insert().values(
+            key=self.key,
+            fingerprint=self.fingerprint,
+            resource_id=resource_id,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+        ))
@@ -0,0 +1,358 @@
+"""
+Background jobs.
+
+Heavy work (exports, ledger rebuilds, reports) is queued as a row in the
+``jobs`` table and run by an asyncio dispatcher inside the app process
+instead of holding a request open::
+
+    @job_type("export_products", params=ExportParams, concurrency=2, max_attempts=3)
+    def export_products(ctx: JobContext, params: ExportParams) -> None:
+        with open(ctx.result_path, "w") as f:
+            ...
+            ctx.progress(done, total)  # also raises JobCancelled once cancellation was requested
+
+Thread jobs run on a pool of JOBS_MAX_THREADS; ``executor="process"`` jobs
+(CPU-bound) on JOBS_MAX_PROCESSES spawned processes, where progress and
+cancellation are not reported back. A job is claimed with one conditional
+UPDATE that also enforces its type's concurrency limit, so several workers
+can share the table. Failed attempts are retried after
+JOBS_RETRY_DELAY_SECONDS x attempt until ``max_attempts``; jobs left
+``running`` by a dead process are requeued on startup.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.core.database import ReadSessionLocal
+from app.core.writer import write_queue
+from app.models.models import Job
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+jobs_table = Job.__table__
+
+JOBS_FINISHED = metrics.registry.counter("jobs_finished_total", "Background jobs finished", ("type", "status"))
+JOBS_RUNNING = metrics.registry.gauge("jobs_running", "Background jobs running in this process", ("type",))
+
+
+class JobCancelled(Exception):
+    """Raised from ``JobContext.progress`` when the job was cancelled"""
+
+
+class JobContext:
+    """Handed to a job function: where to write the result, and how to report progress"""
+
+    def __init__(self, job_id: int, result_path: str, reporter: Optional[Callable[..., bool]] = None):
+        self.job_id = job_id
+        self.result_path = result_path
+        self._reporter = reporter
+        self._reported = 0.0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Process jobs get a context without the reporter (it is bound to this process's writer)
+        return {"job_id": self.job_id, "result_path": self.result_path, "_reporter": None, "_reported": 0.0}
+
+    def progress(self, done: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+        """Record progress (at most every JOBS_PROGRESS_INTERVAL seconds); raises JobCancelled if cancelled"""
+        if self._reporter is None:
+            return
+        now = time.monotonic()
+        if now - self._reported < settings.JOBS_PROGRESS_INTERVAL:
+            return
+        self._reported = now
+        fraction = min(done / total, 1.0) if total else done
+        if self._reporter(fraction, message):
+            raise JobCancelled()
+
+
+class JobType:
+    def __init__(self, name: str, fn: Callable[[JobContext, BaseModel], Any], *, params: Type[BaseModel],
+                 executor: str, concurrency: int, max_attempts: int, media_type: str, extension: str):
+        self.name = name
+        self.fn = fn
+        self.params = params
+        self.executor = executor
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.media_type = media_type
+        self.extension = extension
+
+
+JOB_TYPES: Dict[str, JobType] = {}
+
+
+def job_type(name: str, *, params: Type[BaseModel], executor: str = "thread", concurrency: int = 1,
+             max_attempts: int = 1, media_type: str = "text/csv", extension: str = "csv") -> Callable:
+    """Register a job function under ``name``"""
+    if executor not in ("thread", "process"):
+        raise ValueError(f"Unknown executor {executor!r}")
+
+    def register(fn: Callable[[JobContext, BaseModel], Any]) -> Callable:
+        JOB_TYPES[name] = JobType(name, fn, params=params, executor=executor, concurrency=concurrency,
+                                  max_attempts=max_attempts, media_type=media_type, extension=extension)
+        return fn
+
+    return register
+
+
+def load_job_types() -> Dict[str, JobType]:
+    import app.core.reports  # noqa: F401  registers the built-in job types
+
+    return JOB_TYPES
+
+
+def result_path(job_id: int, job: JobType) -> str:
+    return os.path.join(settings.JOBS_RESULT_DIR, f"{job.name}-{job_id}.{job.extension}")
+
+
+def _run_job(fn: Callable[[JobContext, BaseModel], Any], ctx: JobContext, params: BaseModel) -> None:
+    # Module-level so process pools can pickle it
+    fn(ctx, params)
+
+
+# ---- queue operations (used by the CRUD layer) ----
+class JobError(ValueError):
+    """Unknown job type or invalid params"""
+
+
+def validate_params(type: str, params: Dict[str, Any]) -> str:
+    """Checked params as the JSON stored on the job"""
+    job = load_job_types().get(type)
+    if job is None:
+        raise JobError(f"Unknown job type '{type}'; available: {', '.join(sorted(JOB_TYPES))}")
+    try:
+        return job.params.model_validate(params).model_dump_json()
+    except ValidationError as e:
+        raise JobError(f"Invalid params for '{type}': {e.errors(include_url=False)}")
+
+
+def request_cancel(wdb: Session, job_id: int) -> bool:
+    """Cancel a queued job outright, flag a running one; False if it already finished"""
+    cancelled = wdb.execute(
+        update(jobs_table).where(jobs_table.c.id == job_id, jobs_table.c.status == "queued")
+        .values(status="cancelled", finished_at=datetime.utcnow())
+    ).rowcount
+    if cancelled:
+        return True
+    return bool(wdb.execute(
+        update(jobs_table).where(jobs_table.c.id == job_id, jobs_table.c.status == "running")
+        .values(cancel_requested=True)
+    ).rowcount)
+
+
+# ---- runner ----
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def requeue_orphans(wdb: Session) -> int:
+    """Jobs left ``running`` by a process that no longer exists go back to the queue"""
+    orphans = [row.id for row in wdb.execute(
+        select(jobs_table.c.id, jobs_table.c.worker_pid).where(jobs_table.c.status == "running"))
+        if row.worker_pid is None or not _pid_alive(row.worker_pid)]
+    if orphans:
+        wdb.execute(update(jobs_table).where(jobs_table.c.id.in_(orphans))
+                    .values(status="queued", worker_pid=None, started_at=None))
+    return len(orphans)
+
+
+class JobRunner:
+    """Dispatcher task plus the thread/process pools it runs jobs on"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running: Dict[int, str] = {}  # job id -> executor kind
+        self._tasks: Set[asyncio.Task] = set()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def capacity(self) -> int:
+        return settings.JOBS_MAX_THREADS + settings.JOBS_MAX_PROCESSES
+
+    def _has_room(self, executor: str) -> bool:
+        size = settings.JOBS_MAX_PROCESSES if executor == "process" else settings.JOBS_MAX_THREADS
+        return sum(1 for kind in self._running.values() if kind == executor) < size
+
+    def wake(self) -> None:
+        """Check the queue now (called after a job was submitted or cancelled); safe from any thread"""
+        if self._wake is not None:
+            try:
+                self._event_loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:  # loop closed
+                pass
+
+    def _executor(self, job: JobType) -> Executor:
+        if job.executor == "process":
+            if self._processes is None:
+                # spawn: a forked child would inherit the writer thread's locks and open connections
+                self._processes = ProcessPoolExecutor(
+                    settings.JOBS_MAX_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(settings.JOBS_MAX_THREADS, thread_name_prefix="job")
+        return self._threads
+
+    async def _run(self) -> None:
+        requeued = await write_queue.run(requeue_orphans)
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs left running by a stopped process")
+        while True:
+            try:
+                await self._dispatch()
+            except Exception as e:
+                logger.warning(f"Job dispatch failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.JOBS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _due(self) -> List[Any]:
+        with ReadSessionLocal() as db:
+            now = datetime.utcnow()
+            return db.execute(
+                select(jobs_table.c.id, jobs_table.c.type, jobs_table.c.params)
+                .where(jobs_table.c.status == "queued")
+                .where((jobs_table.c.run_after.is_(None)) | (jobs_table.c.run_after <= now))
+                .order_by(jobs_table.c.status, jobs_table.c.created_at)
+                .limit(self.capacity * 4)
+            ).all()
+
+    async def _dispatch(self) -> None:
+        if len(self._running) >= self.capacity:
+            return
+        for row in await run_in_threadpool(self._due):
+            if len(self._running) >= self.capacity:
+                break
+            job = JOB_TYPES.get(row.type)
+            if job is None or not self._has_room(job.executor):
+                continue
+            if await write_queue.run(lambda wdb: self._claim(wdb, row.id, job)):
+                self._running[row.id] = job.executor
+                task = asyncio.create_task(self._execute(row.id, job, row.params))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _claim(wdb: Session, job_id: int, job: JobType) -> bool:
+        """queued -> running, unless the type already runs ``concurrency`` jobs anywhere"""
+        running = (select(func.count()).select_from(jobs_table)
+                   .where(jobs_table.c.type == job.name, jobs_table.c.status == "running").scalar_subquery())
+        return bool(wdb.execute(
+            update(jobs_table)
+            .where(jobs_table.c.id == job_id, jobs_table.c.status == "queued", running < job.concurrency)
+            .values(status="running", attempts=jobs_table.c.attempts + 1, worker_pid=os.getpid(),
+                    started_at=datetime.utcnow(), progress=0, message=None, error=None)
+        ).rowcount)
+
+    @staticmethod
+    def _reporter(job_id: int) -> Callable[[float, Optional[str]], bool]:
+        def report(fraction: float, message: Optional[str]) -> bool:
+            values: Dict[str, Any] = {"progress": round(fraction, 4)}
+            if message is not None:
+                values["message"] = message
+            return bool(write_queue.submit(lambda wdb: wdb.execute(
+                update(jobs_table).where(jobs_table.c.id == job_id).values(**values)
+                .returning(jobs_table.c.cancel_requested)
+            ).scalar()).result())
+
+        return report
+
+    async def _execute(self, job_id: int, job: JobType, params_json: str) -> None:
+        JOBS_RUNNING.inc(job.name)
+        path = result_path(job_id, job)
+        ctx = JobContext(job_id, path, self._reporter(job_id))
+        status, error, values = "succeeded", None, {}
+        try:
+            os.makedirs(settings.JOBS_RESULT_DIR, exist_ok=True)
+            params = job.params.model_validate(json.loads(params_json))
+            await asyncio.get_running_loop().run_in_executor(self._executor(job), _run_job, job.fn, ctx, params)
+            values = {"progress": 1, "result_path": path if os.path.exists(path) else None}
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+            logger.warning(f"Job {job_id} ({job.name}) failed: {error}")
+        finally:
+            JOBS_RUNNING.dec(job.name)
+
+        def finish(wdb: Session) -> str:
+            row = wdb.execute(select(jobs_table.c.attempts, jobs_table.c.max_attempts, jobs_table.c.cancel_requested)
+                              .where(jobs_table.c.id == job_id)).one()
+            final = "cancelled" if row.cancel_requested and status != "failed" else status
+            if final == "failed" and row.attempts < row.max_attempts:
+                backoff = timedelta(seconds=settings.JOBS_RETRY_DELAY_SECONDS * row.attempts)
+                wdb.execute(update(jobs_table).where(jobs_table.c.id == job_id).values(
+                    status="queued", error=error, worker_pid=None, run_after=datetime.utcnow() + backoff))
+                return "retrying"
+            if final != "succeeded":
+                values.pop("result_path", None)
+            wdb.execute(update(jobs_table).where(jobs_table.c.id == job_id).values(
+                status=final, error=error, finished_at=datetime.utcnow(), **values))
+            return final
+
+        try:
+            outcome = await write_queue.run(finish)
+            if outcome not in ("succeeded", "retrying") and os.path.exists(path):
+                os.remove(path)
+            JOBS_FINISHED.inc(job.name, outcome)
+        finally:
+            self._running.pop(job_id, None)
+            self.wake()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            load_job_types()
+            self._wake = asyncio.Event()
+            self._event_loop = asyncio.get_running_loop()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop dispatching; running jobs are abandoned and requeued by the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._tasks):
+            task.cancel()
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
+        self._running.clear()
+
+
+job_runner = JobRunner()
+
+
+def start_job_runner() -> None:
+    job_runner.start()
+
+async def stop_job_runner() -> None:
+    await job_runner.stop()
@@ -0,0 +1,232 @@
+"""
+Bulk journal import from NDJSON.
+
+One entry per line, accounts given by ``account_code`` or ``account_id``::
+
+    {"date": "2025-03-31", "narration": "Opening", "lines": [{"account_code": "1000", "debit": "250.00"},
+                                                              {"account_code": "3000", "credit": "250.00"}]}
+
+Account codes and ids are resolved against the reference snapshot
+(app.core.reference), taken once before the first line.
+Every entry is validated as it streams in (schema, known accounts, debits
+equal credits), so a bad entry is reported by line number and never stops
+the rest of the file. Accepted entries are buffered and written
+JOURNAL_IMPORT_CHUNK_SIZE at a time as one write unit: one multi-row INSERT
+for the entries, one for their lines, one commit.
+
+CLI (imports into ./sql_app.db)::
+
+    python -m app.core.journal_import entries.ndjson [--chunk-size 2000] [--report rejected.json]
+"""
+import argparse
+import sys
+from decimal import Decimal
+from typing import Any, AsyncIterable, AsyncIterator, Collection, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.reference import reference
+from app.core.writer import UnitOfWork, write_queue
+from app.models.models import JournalEntry, JournalEntryLine
+from app.schemas.schemas import JournalImportEntry, JournalImportRejection, JournalImportReport
+
+settings = get_settings()
+
+entries_table = JournalEntry.__table__
+lines_table = JournalEntryLine.__table__
+
+# (entry row, its line rows)
+ImportRow = Tuple[Dict[str, Any], List[Dict[str, Any]]]
+
+
+class JournalImport:
+    """Validation state and pending chunk for one import"""
+
+    def __init__(self, db: Session, chunk_size: Optional[int] = None):
+        accounts = reference.current(db).accounts  # One snapshot for both maps
+        self.codes = accounts.key_map()
+        self.account_ids: Collection[int] = accounts.by_id.keys()
+        self.chunk_size = chunk_size or settings.JOURNAL_IMPORT_CHUNK_SIZE
+        self.report = JournalImportReport()
+        self._pending: List[ImportRow] = []
+        self._pending_lines: List[int] = []
+
+    def _reject(self, number: int, errors: List[str]) -> None:
+        self.report.rejected += 1
+        if len(self.report.rejections) < settings.JOURNAL_IMPORT_MAX_REPORTED:
+            self.report.rejections.append(JournalImportRejection(line=number, errors=errors))
+
+    def _resolve(self, entry: JournalImportEntry) -> Tuple[List[Dict[str, Any]], List[str]]:
+        rows, errors = [], []
+        for position, line in enumerate(entry.lines, 1):
+            account_id = line.account_id
+            if line.account_code is not None:
+                if line.account_code not in self.codes:
+                    errors.append(f"lines.{position}: unknown account code {line.account_code!r}")
+                    continue
+                account_id = self.codes[line.account_code]
+                if account_id is None:
+                    errors.append(f"lines.{position}: account code {line.account_code!r} is ambiguous")
+                    continue
+            if account_id is None:
+                errors.append(f"lines.{position}: account_code or account_id is required")
+            elif account_id not in self.account_ids:
+                errors.append(f"lines.{position}: unknown account id {account_id}")
+            elif line.debit and line.credit:
+                errors.append(f"lines.{position}: a line is either a debit or a credit")
+            else:
+                rows.append({"account_id": account_id, "debit": line.debit, "credit": line.credit,
+                             "narration": line.narration})
+        debit = sum((line.debit for line in entry.lines), Decimal("0"))
+        credit = sum((line.credit for line in entry.lines), Decimal("0"))
+        if debit != credit:
+            errors.append(f"entry does not balance: debits {debit} != credits {credit}")
+        elif not debit:
+            errors.append("entry has no amounts")
+        return rows, errors
+
+    def add(self, number: int, raw: Any) -> bool:
+        """Validate one NDJSON line; True once a full chunk is pending"""
+        if not raw.strip():
+            return False
+        try:
+            entry = JournalImportEntry.model_validate_json(raw)
+        except ValidationError as e:
+            self._reject(number, [f"{'.'.join(str(part) for part in error['loc']) or 'entry'}: {error['msg']}"
+                                  for error in e.errors()])
+            return False
+        rows, errors = self._resolve(entry)
+        if errors:
+            self._reject(number, errors)
+            return False
+        self._pending.append(({"date": entry.date, "narration": entry.narration}, rows))
+        self._pending_lines.append(number)
+        return len(self._pending) >= self.chunk_size
+
+    def take(self) -> Tuple[List[ImportRow], List[int]]:
+        """Pending chunk with the input line numbers of its entries"""
+        chunk, numbers = self._pending, self._pending_lines
+        self._pending, self._pending_lines = [], []
+        return chunk, numbers
+
+    def written(self, numbers: List[int], error: Optional[Exception] = None) -> None:
+        if error is None:
+            self.report.accepted += len(numbers)
+            self.report.chunks += 1
+        else:
+            for number in numbers:
+                self._reject(number, [f"chunk was not written: {error}"])
+
+
+def insert_chunk(chunk: List[ImportRow]) -> UnitOfWork:
+    """Write unit inserting a chunk of entries and their lines"""
+
+    def unit(wdb: Session) -> int:
+        # The unit holds the write lock, so ids can be assigned up front; an ordered
+        # RETURNING would make SQLAlchemy fall back to one INSERT per row on SQLite
+        first = wdb.execute(select(func.coalesce(func.max(entries_table.c.id), 0))).scalar() + 1
+        entry_ids = range(first, first + len(chunk))
+        wdb.execute(insert(entries_table), [
+            {"id": entry_id, **entry} for entry_id, (entry, _) in zip(entry_ids, chunk)
+        ])
+        wdb.execute(insert(lines_table), [
+            {"journal_entry_id": entry_id, **line}
+            for entry_id, (_, lines) in zip(entry_ids, chunk) for line in lines
+        ])
+        return len(entry_ids)
+
+    return unit
+
+
+def import_lines(db: Session, lines: Iterable[Any], chunk_size: Optional[int] = None) -> JournalImportReport:
+    """Import NDJSON lines, committing each chunk through the write queue"""
+    job = JournalImport(db, chunk_size)
+
+    def flush() -> None:
+        chunk, numbers = job.take()
+        if not chunk:
+            return
+        try:
+            write_queue.execute(db, insert_chunk(chunk))
+        except Exception as e:
+            job.written(numbers, e)
+        else:
+            job.written(numbers)
+
+    for number, raw in enumerate(lines, 1):
+        if job.add(number, raw):
+            flush()
+    flush()
+    return job.report
+
+
+async def ndjson_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Split a streamed request body into lines without holding the whole body"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def import_stream(db: Session, body: AsyncIterable[bytes],
+                        chunk_size: Optional[int] = None) -> JournalImportReport:
+    """Async variant of :func:`import_lines` for a streamed request body"""
+    job = await run_in_threadpool(JournalImport, db, chunk_size)
+
+    async def flush() -> None:
+        chunk, numbers = job.take()
+        if not chunk:
+            return
+        try:
+            await write_queue.run(insert_chunk(chunk))
+        except Exception as e:
+            job.written(numbers, e)
+        else:
+            job.written(numbers)
+
+    number = 0
+    async for raw in ndjson_lines(body):
+        number += 1
+        if job.add(number, raw):
+            await flush()
+    await flush()
+    return job.report
+
+
+def main() -> int:
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import journal entries from an NDJSON file ('-' for stdin)")
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--report", help="Write the rejected-entry report to this JSON file")
+    args = parser.parse_args()
+
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        with SessionLocal() as db:
+            report = import_lines(db, source, args.chunk_size)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        write_queue.stop()
+
+    for rejection in report.rejections:
+        print(f"line {rejection.line}: {'; '.join(rejection.errors)}")
+    print(f"{report.accepted} entries imported in {report.chunks} chunks, {report.rejected} rejected")
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(report.model_dump_json(indent=2))
+    return 1 if report.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+"""
+Prometheus-style instrumentation.
+
+Metrics aggregate lock-free: every thread that records a sample gets its own
+shard (a plain dict reached through ``threading.local``) and shards are only
+summed when ``/metrics`` is scraped. With several worker processes each worker
+periodically writes a JSON snapshot into ``METRICS_MULTIPROC_DIR`` and the
+scraped worker merges all of them.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, Any]] = []
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            self._shards.append(shard)  # list.append is atomic under the GIL
+            return shard
+
+    def _add(self, labels: LabelValues, amount: float) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        merged: Dict[LabelValues, float] = {}
+        for shard in list(self._shards):
+            for labels, value in list(shard.items()):
+                merged[labels] = merged.get(labels, 0) + value
+        return merged
+
+    def describe(self) -> Dict[str, Any]:
+        return {"type": self.kind, "help": self.documentation, "labelnames": list(self.labelnames)}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._add(labels, amount)
+
+
+class Gauge(_Metric):
+    """Gauge supporting ``inc``/``dec`` (sharded) and ``set`` (last write wins)"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._add(labels, amount)
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._add(labels, -amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def samples(self) -> Dict[LabelValues, float]:
+        merged = super().samples()
+        for labels, value in list(self._values.items()):
+            merged[labels] = merged.get(labels, 0) + value
+        return merged
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, last slot is +Inf, then the sum
+            state = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self) -> Dict[LabelValues, list]:
+        merged: Dict[LabelValues, list] = {}
+        for shard in list(self._shards):
+            for labels, (counts, total) in list(shard.items()):
+                current = merged.setdefault(labels, [[0] * len(counts), 0.0])
+                current[0] = [a + b for a, b in zip(current[0], counts)]
+                current[1] += total
+        return merged
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+
+class Registry:
+    """Holds metrics and sampling callbacks; renders the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> Any:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callback that refreshes sampled gauges right before a scrape"""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Any]:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.debug(f"Metrics collector failed: {e}")
+        return {
+            "pid": os.getpid(),
+            "metrics": {
+                name: {**metric.describe(), "samples": [[list(k), v] for k, v in metric.samples().items()]}
+                for name, metric in self._metrics.items()
+            },
+        }
+
+
+registry = Registry()
+
+# ---- HTTP ----
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests currently being served", ("method",))
+
+# ---- Database pool ----
+DB_POOL_CONNECTIONS = registry.counter(
+    "db_pool_connections_created_total", "DBAPI connections opened by the pool", ("engine",))
+DB_POOL_CHECKOUTS = registry.counter("db_pool_checkouts_total", "Connections checked out of the pool", ("engine",))
+DB_POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "Connections currently checked out", ("engine",))
+DB_POOL_SIZE = registry.gauge("db_pool_size", "Configured pool size", ("engine",))
+DB_POOL_OVERFLOW = registry.gauge("db_pool_overflow", "Connections opened beyond the pool size", ("engine",))
+DB_STATEMENT_CACHE = registry.counter(
+    "db_statement_cache_total", "Statements executed, by compiled-cache outcome (hit, miss, uncached)",
+    ("engine", "result"))
+DB_STATEMENT_CACHE_SIZE = registry.gauge(
+    "db_statement_cache_size", "Compiled statements held in the engine's cache", ("engine",))
+
+# ---- Runtime ----
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds", "Delay between a scheduled wake-up and when the loop ran it", buckets=LAG_BUCKETS)
+EVENT_LOOP_LAG_LAST = registry.gauge("event_loop_lag_last_seconds", "Most recent event-loop lag sample")
+THREADPOOL_BUSY = registry.gauge("threadpool_busy_threads", "Threadpool tokens in use by sync endpoints")
+THREADPOOL_QUEUE = registry.gauge("threadpool_queue_depth", "Tasks waiting for a threadpool thread")
+THREADPOOL_CAPACITY = registry.gauge("threadpool_capacity", "Threadpool size")
+
+
+def instrument_pool(engine, name: str) -> None:
+    """Record pool checkout/checkin events of a (sync) ``Engine``"""
+    from sqlalchemy import event
+
+    event.listen(engine, "connect", lambda *args: DB_POOL_CONNECTIONS.inc(name))
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(*args):
+        DB_POOL_CHECKOUTS.inc(name)
+        DB_POOL_CHECKED_OUT.inc(name)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(*args):
+        DB_POOL_CHECKED_OUT.dec(name)
+
+    def _collect_pool_size():
+        pool = engine.pool
+        if hasattr(pool, "size"):
+            DB_POOL_SIZE.set(pool.size(), name)
+        if hasattr(pool, "overflow"):
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0), name)
+
+    registry.add_collector(_collect_pool_size)
+
+
+def instrument_statement_cache(engine, name: str) -> None:
+    """Count compiled-cache hits and misses of a (sync) ``Engine``"""
+    from sqlalchemy import event
+    from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+    outcomes = {CACHE_HIT: "hit", CACHE_MISS: "miss"}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            DB_STATEMENT_CACHE.inc(name, outcomes.get(context.cache_hit, "uncached"))
+
+    def _collect_cache_size():
+        cache = getattr(engine, "_compiled_cache", None)
+        if cache is not None:
+            DB_STATEMENT_CACHE_SIZE.set(len(cache), name)
+
+    registry.add_collector(_collect_cache_size)
+
+
+# ---- Background sampling ----
+_sampler_task: Optional[asyncio.Task] = None
+
+
+async def _sample_runtime(interval: float) -> None:
+    import anyio.to_thread
+
+    loop = asyncio.get_running_loop()
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    flush_every = max(1, int(settings.METRICS_FLUSH_INTERVAL / interval))
+    ticks = 0
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+
+        stats = limiter.statistics()
+        THREADPOOL_BUSY.set(stats.borrowed_tokens)
+        THREADPOOL_QUEUE.set(stats.tasks_waiting)
+        THREADPOOL_CAPACITY.set(limiter.total_tokens)
+
+        ticks += 1
+        if settings.METRICS_MULTIPROC_DIR and ticks % flush_every == 0:
+            write_snapshot(settings.METRICS_MULTIPROC_DIR)
+
+
+def start_samplers() -> None:
+    """Start the event-loop lag / threadpool sampler on the running loop"""
+    global _sampler_task
+    if _sampler_task is None or _sampler_task.done():
+        _sampler_task = asyncio.create_task(_sample_runtime(settings.EVENT_LOOP_LAG_INTERVAL))
+
+
+async def stop_samplers() -> None:
+    global _sampler_task
+    if _sampler_task is not None:
+        _sampler_task.cancel()
+        try:
+            await _sampler_task
+        except asyncio.CancelledError:
+            pass
+        _sampler_task = None
+    if settings.METRICS_MULTIPROC_DIR:
+        write_snapshot(settings.METRICS_MULTIPROC_DIR)
+
+
+# ---- Multi-worker aggregation ----
+ARCHIVE_FILE = "metrics-archive.json"  # Counters and histograms of workers that have exited
+
+_snapshot_file: Optional[Tuple[int, str]] = None
+
+
+def _own_file() -> str:
+    """This worker's snapshot file; pid plus start time, since a recycled worker's pid comes back"""
+    global _snapshot_file
+    pid = os.getpid()
+    if _snapshot_file is None or _snapshot_file[0] != pid:  # Also after a fork
+        _snapshot_file = (pid, f"metrics-{pid}-{time.time_ns() // 1_000_000}.json")
+    return _snapshot_file[1]
+
+
+def _dump(path: str, snapshot: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(directory: str) -> None:
+    """Atomically write this worker's snapshot to ``directory``, then fold in the exited workers'"""
+    os.makedirs(directory, exist_ok=True)
+    _dump(os.path.join(directory, _own_file()), registry.snapshot())
+    fold_exited(directory)
+
+
+def fold_exited(directory: str) -> None:
+    """Add the snapshots of exited workers to ARCHIVE_FILE and delete them, so the directory stays small"""
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # One worker folds at a time
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        try:
+            with open(archive_path) as f:
+                archive = json.load(f)
+        except (OSError, ValueError):
+            archive = {"pid": None, "metrics": {}, "folded": []}
+        # Left behind if the previous fold stopped between writing the archive and deleting them
+        for filename in archive["folded"]:
+            if os.path.exists(os.path.join(directory, filename)):
+                os.remove(os.path.join(directory, filename))
+        exited = {}
+        for filename in os.listdir(directory):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")) or filename == ARCHIVE_FILE:
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(snapshot["pid"]):
+                exited[filename] = snapshot
+        if not exited:
+            return
+        merged = merge_snapshots([archive, *exited.values()])  # Gauges of exited workers are dropped
+        _dump(archive_path, {"pid": None, "folded": sorted(exited), "metrics": {
+            name: {**metric, "samples": [[list(k), v] for k, v in metric["samples"].items()]}
+            for name, metric in merged.items()}})
+        for filename in exited:
+            os.remove(os.path.join(directory, filename))
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if pid is None:  # The archive
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Sum counters and histograms across workers; gauges only from live workers"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snap in snapshots:
+        alive = _pid_alive(snap["pid"])
+        for name, metric in snap["metrics"].items():
+            if metric["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if metric["type"] == "histogram":
+                    current = samples.get(key)
+                    if current is None:
+                        samples[key] = [list(value[0]), value[1]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                else:
+                    samples[key] = samples.get(key, 0) + value
+    return merged
+
+
+def collect() -> Dict[str, Dict[str, Any]]:
+    """Current metrics for this worker, merged with sibling workers if configured"""
+    own = registry.snapshot()
+    snapshots = [own]
+    directory = settings.METRICS_MULTIPROC_DIR
+    if directory and os.path.isdir(directory):
+        with open(os.path.join(directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)  # Never half-way through a fold (counters would jump)
+            for filename in os.listdir(directory):
+                if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                    continue
+                if filename == _own_file():
+                    continue
+                try:
+                    with open(os.path.join(directory, filename)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError) as e:
+                    logger.debug(f"Skipping metrics snapshot {filename}: {e}")
+    return merge_snapshots(snapshots)
+
+
+# ---- Text exposition ----
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(metrics: Dict[str, Dict[str, Any]]) -> str:
+    lines: List[str] = []
+    for name, metric in sorted(metrics.items()):
+        names = metric["labelnames"]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["type"] == "histogram":
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip([*metric["buckets"], math.inf], counts):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(names, labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def render_latest() -> str:
+    return render(collect())
@@ -1,9 +1,12 @@
 from typing import Callable
+import itertools
+import os
+import secrets
 import time
 import asyncio
 from functools import wraps
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from starlette.responses import Response, JSONResponse
 from starlette.middleware.gzip import GZipMiddleware
 from starlette.middleware.cors import CORSMiddleware
@@ -13,105 +16,203 @@ from slowapi.errors import RateLimitExceeded
 from fastapi.security import HTTPBearer
 from fastapi import HTTPException, status
 from app.core.config import get_settings
+from app.core import metrics, profiler
 import logging
 import json
 
-# Try to import redis, but don't crash if not available
-try:
-    import redis.asyncio as redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    redis = None
-    REDIS_AVAILABLE = False
-
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
 # Rate Limiter Setup
 limiter = Limiter(key_func=get_remote_address)
 
-# Redis Connection for Caching (optional - falls back to memory)
-redis_client = None
-if REDIS_AVAILABLE:
-    try:
-        redis_client = redis.Redis.from_url("redis://localhost:6379", decode_responses=True)
-    except Exception as e:
-        redis_client = None
-        logger.warning(f"Redis not available: {e}")
-else:
-    logger.warning("Redis package not installed, caching disabled")
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all responses"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-        
-        # Security Headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        # Updated CSP to allow Swagger UI external resources including source maps
-        csp = (
-            "default-src 'self'; "
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-            "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-            "img-src 'self' data: https://fastapi.tiangolo.com; "
-            "font-src 'self' https://cdn.jsdelivr.net; "
-            "connect-src 'self' https://cdn.jsdelivr.net"
-        )
-        response.headers["Content-Security-Policy"] = csp
-        
-        # Cache Control for API responses
-        if request.url.path.startswith("/api/"):
-            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-        
-        return response
-
-class PerformanceMiddleware(BaseHTTPMiddleware):
-    """Add performance monitoring and optimization"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
-        
-        # Add request ID for tracking
-        request_id = f"{int(time.time() * 1000000)}"
-        
+# Redis Connection for Caching (optional - falls back to no caching).
+# Built on first use so importing the app does not pay for the redis package.
+_redis_client = None
+_redis_checked = False
+
+def get_redis_client():
+    """Return the shared Redis client, or None if redis is unavailable"""
+    global _redis_client, _redis_checked
+    if not _redis_checked:
+        _redis_checked = True
+        try:
+            import redis.asyncio as redis
+            _redis_client = redis.Redis.from_url("redis://localhost:6379", decode_responses=True)
+        except ImportError:
+            logger.warning("Redis package not installed, caching disabled")
+        except Exception as e:
+            logger.warning(f"Redis not available: {e}")
+    return _redis_client
+
+class SecurityHeadersMiddleware:
+    """Add security headers to all responses (pure ASGI)"""
+
+    # Updated CSP to allow Swagger UI external resources including source maps
+    CSP = (
+        "default-src 'self'; "
+        "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+        "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+        "img-src 'self' data: https://fastapi.tiangolo.com; "
+        "font-src 'self' https://cdn.jsdelivr.net; "
+        "connect-src 'self' https://cdn.jsdelivr.net"
+    )
+
+    # Precomputed once as raw (name, value) byte pairs
+    SECURITY_HEADERS = [
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+        (b"referrer-policy", b"strict-origin-when-cross-origin"),
+        (b"content-security-policy", CSP.encode("latin-1")),
+    ]
+
+    # Cache Control for API responses
+    NO_CACHE_HEADERS = [
+        (b"cache-control", b"no-cache, no-store, must-revalidate"),
+        (b"pragma", b"no-cache"),
+        (b"expires", b"0"),
+    ]
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.api_headers = self.SECURITY_HEADERS + self.NO_CACHE_HEADERS
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        extra = self.api_headers if scope["path"].startswith("/api/") else self.SECURITY_HEADERS
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *extra]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+# Collision-free request IDs: a random per-process prefix plus a monotonic counter
+def _new_request_id_prefix() -> None:
+    global _request_id_prefix
+    _request_id_prefix = f"{os.getpid():x}-{secrets.token_hex(4)}"
+
+_new_request_id_prefix()
+os.register_at_fork(after_in_child=_new_request_id_prefix)  # Pre-forked workers (app.server)
+_request_counter = itertools.count(1)
+
+def next_request_id() -> str:
+    """Return a request ID unique across workers and restarts"""
+    return f"{_request_id_prefix}-{next(_request_counter):x}"
+
+class PerformanceMiddleware:
+    """Add request IDs and timing, log slow requests (pure ASGI)"""
+
+    SLOW_REQUEST_SECONDS = 1.0
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        request_id = next_request_id()
+        scope.setdefault("state", {})["request_id"] = request_id
+        streaming = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal streaming
+            if message["type"] == "http.response.start":
+                streaming = any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                for name, value in message.get("headers", ()))
+                # Time to first byte; streaming bodies are not held back
+                process_time = time.perf_counter() - start_time
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"x-process-time", f"{process_time:.6f}".encode("latin-1")),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            await send(message)
+
         try:
-            response = await call_next(request)
-            
-            # Calculate processing time
-            process_time = time.time() - start_time
-            response.headers["X-Process-Time"] = str(process_time)
-            response.headers["X-Request-ID"] = request_id
-            
-            # Log slow requests (> 1 second)
-            if process_time > 1.0:
-                logger.warning(f"Slow request: {request.method} {request.url.path} took {process_time:.2f}s")
-            
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            process_time = time.time() - start_time
-            logger.error(f"Request failed: {request.method} {request.url.path} after {process_time:.2f}s - {str(e)}")
+            process_time = time.perf_counter() - start_time
+            logger.error(f"Request failed: {scope['method']} {scope['path']} after {process_time:.2f}s - {str(e)}")
             raise
 
-class DatabaseConnectionMiddleware(BaseHTTPMiddleware):
-    """Optimize database connections"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Set connection pool limits based on request load
-        if hasattr(request.state, 'db_pool_size'):
-            request.state.db_pool_size = min(20, request.state.db_pool_size + 1)
-        else:
-            request.state.db_pool_size = 1
-            
-        response = await call_next(request)
-        return response
+        # Log slow requests (> 1 second)
+        process_time = time.perf_counter() - start_time
+        if process_time > self.SLOW_REQUEST_SECONDS and not streaming:  # event streams stay open on purpose
+            logger.warning(f"Slow request: {scope['method']} {scope['path']} took {process_time:.2f}s")
+
+class MetricsMiddleware:
+    """Per-route request counters, latency histograms and in-flight gauge (pure ASGI)"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.HTTP_IN_FLIGHT.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.HTTP_IN_FLIGHT.dec(method)
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            metrics.HTTP_REQUESTS.inc(method, route, str(status_code))
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - start_time, method, route)
+
+class SQLProfilerMiddleware:
+    """Attribute SQL statements to the request; expose stats as headers in DEBUG (pure ASGI)"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.debug_headers = settings.DEBUG
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile, token = profiler.start_profile(scope["method"], scope["path"])
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and self.debug_headers:
+                headers = [
+                    *message.get("headers", ()),
+                    (b"x-db-query-count", str(profile.query_count).encode("latin-1")),
+                    (b"x-db-time-ms", f"{profile.total_time * 1000:.3f}".encode("latin-1")),
+                ]
+                suspects = profile.n_plus_one()
+                if suspects:
+                    value = ",".join(f"{s['fingerprint']}x{s['count']}" for s in suspects)
+                    headers.append((b"x-db-n-plus-one", value.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.finish_profile(profile, token)
 
 # Authentication helpers
 security = HTTPBearer()
@@ -162,9 +263,10 @@ def add_compression_middleware(app):
 
 def add_custom_middleware(app):
     """Add all custom middleware"""
+    app.add_middleware(SQLProfilerMiddleware)
     app.add_middleware(SecurityHeadersMiddleware)
     app.add_middleware(PerformanceMiddleware)
-    app.add_middleware(DatabaseConnectionMiddleware)
+    app.add_middleware(MetricsMiddleware)
 
 # Rate limiting decorators for endpoints
 def rate_limit_per_minute(requests: int = 100):
@@ -181,6 +283,7 @@ def cache_response(ttl: int = 300):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
+            redis_client = get_redis_client()
             if redis_client:
                 # Generate cache key
                 cache_key = f"cache:{func.__name__}:{hash(str(args) + str(kwargs))}"
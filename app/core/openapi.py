@@ -0,0 +1,99 @@
+"""
+Cached OpenAPI document.
+
+The schema is generated at most once per process. If a cache path is
+configured the generated document is written there, and a later process
+whose routes match (same version and route table) loads it instead of
+walking every route and pydantic model again. Prebuild it during deploy:
+
+    python -m app.core.openapi openapi.json
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI
+from fastapi.openapi.utils import get_openapi
+
+logger = logging.getLogger(__name__)
+
+
+def routes_fingerprint(app: FastAPI) -> str:
+    """Cheap key identifying the app version and its route table"""
+    digest = hashlib.sha1(f"{app.title}|{app.version}|{app.openapi_version}".encode())
+    for route in app.routes:
+        methods = ",".join(sorted(getattr(route, "methods", None) or ()))
+        endpoint = getattr(route, "endpoint", None)
+        name = f"{endpoint.__module__}.{endpoint.__qualname__}" if endpoint else ""
+        digest.update(f"{route.path}|{methods}|{name}\n".encode())
+    return digest.hexdigest()
+
+
+def build_openapi(app: FastAPI) -> Dict[str, Any]:
+    return get_openapi(
+        title=app.title,
+        version=app.version,
+        openapi_version=app.openapi_version,
+        summary=app.summary,
+        description=app.description,
+        terms_of_service=app.terms_of_service,
+        contact=app.contact,
+        license_info=app.license_info,
+        routes=app.routes,
+        webhooks=app.webhooks.routes,
+        tags=app.openapi_tags,
+        servers=app.servers,
+        separate_input_output_schemas=app.separate_input_output_schemas,
+    )
+
+
+def _load(path: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("x-cache-key") != key:
+        logger.info(f"Prebuilt OpenAPI schema at {path} is stale, regenerating")
+        return None
+    return cached["schema"]
+
+
+def write_openapi(app: FastAPI, path: str) -> Dict[str, Any]:
+    schema = app.openapi()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"x-cache-key": routes_fingerprint(app), "schema": schema}, f)
+    os.replace(tmp_path, path)
+    return schema
+
+
+def install_cached_openapi(app: FastAPI, cache_path: Optional[str] = None) -> None:
+    """Replace ``app.openapi`` with a build-once version backed by ``cache_path``"""
+
+    def openapi() -> Dict[str, Any]:
+        if app.openapi_schema is None:
+            schema = _load(cache_path, routes_fingerprint(app)) if cache_path else None
+            if schema is None:
+                schema = build_openapi(app)
+                if cache_path:
+                    app.openapi_schema = schema
+                    try:
+                        write_openapi(app, cache_path)
+                    except OSError as e:
+                        logger.warning(f"Could not write OpenAPI cache {cache_path}: {e}")
+            app.openapi_schema = schema
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+
+if __name__ == "__main__":
+    from app.main import app
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "openapi.json"
+    write_openapi(app, target)
+    print(f"Wrote OpenAPI schema to {target}")
@@ -0,0 +1,160 @@
+"""
+Per-request SQL profiler.
+
+Cursor events on both engines attribute every statement to the request
+profile held in a ContextVar (sync endpoints inherit it through the
+threadpool's copied context). Statements are grouped by a normalized
+fingerprint so a request that runs the same query many times is flagged
+as a likely N+1.
+"""
+import hashlib
+import logging
+import random
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("sql_profile", default=None)
+
+# Sampled ring buffer of finished request profiles, served by the admin endpoint
+recent_profiles: Deque[Dict[str, Any]] = deque(maxlen=settings.SQL_PROFILER_BUFFER_SIZE)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Strip literals and collapse IN-lists so equivalent queries compare equal"""
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+class RequestProfile:
+    """SQL statistics for one request"""
+
+    __slots__ = ("method", "path", "query_count", "total_time", "statements", "slowest")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.query_count = 0
+        self.total_time = 0.0
+        # fingerprint -> [normalized statement, count, total seconds]
+        self.statements: Dict[str, list] = {}
+        # (seconds, fingerprint, statement), longest first, capped at SQL_PROFILER_TOP_N
+        self.slowest: List[tuple] = []
+
+    def record(self, statement: str, elapsed: float) -> None:
+        normalized = normalize_statement(statement)
+        fp = fingerprint(normalized)
+        self.query_count += 1
+        self.total_time += elapsed
+        stats = self.statements.get(fp)
+        if stats is None:
+            self.statements[fp] = [normalized, 1, elapsed]
+        else:
+            stats[1] += 1
+            stats[2] += elapsed
+        top_n = settings.SQL_PROFILER_TOP_N
+        if len(self.slowest) < top_n or elapsed > self.slowest[-1][0]:
+            self.slowest.append((elapsed, fp, normalized))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[top_n:]
+
+    def n_plus_one(self) -> List[Dict[str, Any]]:
+        """Fingerprints repeated at least SQL_N_PLUS_ONE_THRESHOLD times"""
+        threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+        return [
+            {"fingerprint": fp, "count": count, "total_ms": round(total * 1000, 3), "statement": normalized}
+            for fp, (normalized, count, total) in self.statements.items()
+            if count >= threshold
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "query_count": self.query_count,
+            "db_time_ms": round(self.total_time * 1000, 3),
+            "slowest": [
+                {"fingerprint": fp, "duration_ms": round(elapsed * 1000, 3), "statement": normalized}
+                for elapsed, fp, normalized in self.slowest
+            ],
+            "n_plus_one": self.n_plus_one(),
+        }
+
+
+def start_profile(method: str, path: str):
+    """Begin profiling the current request; returns the profile and a reset token"""
+    profile = RequestProfile(method, path)
+    return profile, _current_profile.set(profile)
+
+
+def finish_profile(profile: RequestProfile, token) -> None:
+    """Stop profiling; log N+1 suspects and sample into the ring buffer"""
+    _current_profile.reset(token)
+    suspects = profile.n_plus_one()
+    for suspect in suspects:
+        logger.warning(
+            f"Possible N+1: {profile.method} {profile.path} ran {suspect['count']}x "
+            f"[{suspect['fingerprint']}] {suspect['statement'][:200]}"
+        )
+    if suspects or random.random() < settings.SQL_PROFILER_SAMPLE_RATE:
+        recent_profiles.append(profile.to_dict())
+
+
+def get_recent_profiles(limit: int = 50, n_plus_one_only: bool = False) -> List[Dict[str, Any]]:
+    profiles = [p for p in reversed(recent_profiles) if p["n_plus_one"] or not n_plus_one_only]
+    return profiles[:limit]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    if elapsed >= settings.SQL_SLOW_QUERY_SECONDS:
+        normalized = normalize_statement(statement)
+        slow_query_logger.warning(
+            f"Slow query {elapsed * 1000:.1f}ms [{fingerprint(normalized)}] {normalized[:500]}"
+        )
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    conn = exception_context.connection
+    if conn is not None and exception_context.statement is not None:
+        starts = conn.info.get("query_start_time")
+        if starts:
+            starts.pop()
+
+
+def instrument_engine(engine) -> None:
+    """Attach the profiler to a (sync) ``Engine``"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
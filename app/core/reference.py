@@ -0,0 +1,296 @@
+"""
+In-memory snapshot of the reference tables.
+
+Categories, the chart of accounts, warehouses, roles and permissions are
+small, change rarely and are read on hot paths (every product in a listing
+carries its category, every imported journal line names an account).
+``reference.current()`` returns an immutable :class:`Snapshot` of all of
+them: rows are ``NamedTuple``s, indexed by id and by code/name, so those
+lookups never query SQLite.
+
+Every table has a version in ``reference_versions``, bumped by an
+``after_flush`` hook in the same transaction as the ORM write that changed
+it (Core writers call :func:`bump`). A commit in this process drops the
+local snapshot at once; other worker processes compare versions at most
+every REFERENCE_CHECK_INTERVAL seconds, and immediately when a lookup by id
+misses. A refresh reloads only the tables whose version moved, builds a new
+snapshot and swaps it in with one assignment, so a reader holding the old
+snapshot keeps a consistent view of it.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from itertools import chain
+from types import MappingProxyType
+from typing import (
+    Any, Callable, Dict, FrozenSet, Generic, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence,
+    Tuple, TypeVar
+)
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Account, Category, Permission, ReferenceVersion, Role, Warehouse, role_permission
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+reference_versions = ReferenceVersion.__table__
+
+
+# ---- rows ----
+class CategoryRef(NamedTuple):
+    id: int
+    name: str
+    parent_id: Optional[int]
+
+
+class AccountRef(NamedTuple):
+    id: int
+    name: str
+    code: Optional[str]
+    account_type: Optional[str]
+    # balance is left out: it changes with every posting
+
+
+class WarehouseRef(NamedTuple):
+    id: int
+    name: str
+    location: Optional[str]
+
+
+class PermissionRef(NamedTuple):
+    id: int
+    code: str
+    description: Optional[str]
+
+
+class RoleRef(NamedTuple):
+    id: int
+    name: str
+    description: Optional[str]
+    permissions: FrozenSet[str]  # Permission codes
+
+
+Row = TypeVar("Row", bound=tuple)
+
+
+class RefTable(Generic[Row]):
+    """One table's rows in id order, indexed by id and by a code/name column"""
+
+    __slots__ = ("version", "rows", "by_id", "by_key", "ambiguous")
+
+    def __init__(self, version: Tuple[int, ...], rows: Sequence[Row], key: str):
+        by_key: Dict[Any, Row] = {}
+        ambiguous = set()
+        for row in rows:
+            value = getattr(row, key)
+            if value is None:
+                continue
+            if value in by_key:
+                ambiguous.add(value)  # The first row keeps the key, as a LIMIT 1 query would
+            else:
+                by_key[value] = row
+        self.version = version
+        self.rows: Tuple[Row, ...] = tuple(rows)
+        self.by_id: Mapping[int, Row] = MappingProxyType({row.id: row for row in rows})
+        self.by_key: Mapping[Any, Row] = MappingProxyType(by_key)
+        self.ambiguous: FrozenSet[Any] = frozenset(ambiguous)
+
+    def get(self, id: Optional[int]) -> Optional[Row]:
+        return self.by_id.get(id)
+
+    def find(self, key: Any) -> Optional[Row]:
+        return self.by_key.get(key)
+
+    def key_map(self) -> Dict[Any, Optional[int]]:
+        """key -> id, None for keys shared by several rows"""
+        return {key: None if key in self.ambiguous else row.id for key, row in self.by_key.items()}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Row]:
+        return iter(self.rows)
+
+
+class Snapshot(NamedTuple):
+    categories: RefTable[CategoryRef]
+    accounts: RefTable[AccountRef]
+    warehouses: RefTable[WarehouseRef]
+    permissions: RefTable[PermissionRef]
+    roles: RefTable[RoleRef]
+
+
+# ---- loading ----
+def _rows(conn: Connection, model: type, ref: Callable[..., Row]) -> List[Row]:
+    table = model.__table__
+    columns = [table.c[name] for name in ref._fields]
+    return [ref(*row) for row in conn.execute(select(*columns).order_by(table.c.id))]
+
+
+def _load_roles(conn: Connection) -> List[RoleRef]:
+    roles = Role.__table__
+    permissions = Permission.__table__
+    codes: Dict[int, set] = defaultdict(set)
+    for role_id, code in conn.execute(
+        select(role_permission.c.role_id, permissions.c.code)
+        .join(permissions, permissions.c.id == role_permission.c.permission_id)
+    ):
+        codes[role_id].add(code)
+    return [RoleRef(role_id, name, description, frozenset(codes[role_id]))
+            for role_id, name, description in conn.execute(
+                select(roles.c.id, roles.c.name, roles.c.description).order_by(roles.c.id))]
+
+
+class Source(NamedTuple):
+    key: str  # Column indexed in RefTable.by_key
+    versions: Tuple[str, ...]  # reference_versions names the table depends on
+    load: Callable[[Connection], List[Any]]
+
+
+SOURCES: Dict[str, Source] = {
+    "categories": Source("name", ("categories",), lambda conn: _rows(conn, Category, CategoryRef)),
+    "accounts": Source("code", ("accounts",), lambda conn: _rows(conn, Account, AccountRef)),
+    "warehouses": Source("name", ("warehouses",), lambda conn: _rows(conn, Warehouse, WarehouseRef)),
+    "permissions": Source("code", ("permissions",), lambda conn: _rows(conn, Permission, PermissionRef)),
+    # A role carries its permission codes, so renaming a permission reloads the roles too
+    "roles": Source("name", ("roles", "permissions"), _load_roles),
+}
+
+# ORM class -> reference_versions name bumped when one of its rows is written
+TRACKED: Dict[type, str] = {
+    Category: "categories",
+    Account: "accounts",
+    Warehouse: "warehouses",
+    Permission: "permissions",
+    Role: "roles",
+}
+
+
+class ReferenceData:
+    """Holder of the current snapshot; ``reference`` is the process-wide instance"""
+
+    def __init__(self):
+        self._snapshot: Optional[Snapshot] = None
+        self._checked = 0.0  # monotonic time of the last version check
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def current(self, db: Optional[Session] = None) -> Snapshot:
+        """The snapshot, re-checked against the stored versions when it is old or invalidated.
+
+        Pass the caller's session so a check reuses its connection instead of taking another from the pool.
+        """
+        snapshot = self._snapshot
+        if (snapshot is None or self._stale
+                or time.monotonic() - self._checked >= settings.REFERENCE_CHECK_INTERVAL):
+            return self.refresh(db)
+        return snapshot
+
+    def refresh(self, db: Optional[Session] = None, conn: Optional[Connection] = None) -> Snapshot:
+        """Reload the tables whose version moved (one small query when none did)"""
+        with self._lock:
+            if conn is not None:
+                return self._refresh(conn)
+            if db is not None:
+                return self._refresh(db.connection())
+            from app.core.database import read_engine
+
+            with read_engine.connect() as own:
+                return self._refresh(own)
+
+    def _refresh(self, conn: Connection) -> Snapshot:
+        # Cleared before reading, so an invalidation that races with this load is not lost. Versions are
+        # read before the rows: a write committed in between gives newer rows under an older version,
+        # which only causes one extra reload on the next check.
+        self._stale = False
+        stored = dict(conn.execute(select(reference_versions.c.name, reference_versions.c.version)).all())
+        old = self._snapshot
+        tables: Dict[str, RefTable] = {}
+        reloaded = []
+        for name, source in SOURCES.items():
+            version = tuple(stored.get(dependency, 0) for dependency in source.versions)
+            previous = getattr(old, name) if old is not None else None
+            if previous is not None and previous.version == version:
+                tables[name] = previous
+            else:
+                tables[name] = RefTable(version, source.load(conn), source.key)
+                reloaded.append(name)
+        if reloaded:
+            self._snapshot = Snapshot(**tables)
+            logger.debug(f"Reference data reloaded: {', '.join(reloaded)}")
+        self._checked = time.monotonic()
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        """Re-check the versions on the next access"""
+        self._stale = True
+
+    def _lookup(self, table: str, id: Optional[int], db: Optional[Session]) -> Any:
+        if id is None:
+            return None
+        row = getattr(self.current(db), table).get(id)
+        if row is None:
+            # Possibly created by another worker since the last check
+            row = getattr(self.refresh(db), table).get(id)
+        return row
+
+    # ---- lookups by id ----
+    def category(self, category_id: Optional[int], db: Optional[Session] = None) -> Optional[CategoryRef]:
+        return self._lookup("categories", category_id, db)
+
+    def account(self, account_id: Optional[int], db: Optional[Session] = None) -> Optional[AccountRef]:
+        return self._lookup("accounts", account_id, db)
+
+    def warehouse(self, warehouse_id: Optional[int], db: Optional[Session] = None) -> Optional[WarehouseRef]:
+        return self._lookup("warehouses", warehouse_id, db)
+
+    def role(self, role_id: Optional[int], db: Optional[Session] = None) -> Optional[RoleRef]:
+        return self._lookup("roles", role_id, db)
+
+    def permission(self, permission_id: Optional[int], db: Optional[Session] = None) -> Optional[PermissionRef]:
+        return self._lookup("permissions", permission_id, db)
+
+
+reference = ReferenceData()
+
+
+# ---- version bumps ----
+def bump(conn: Connection, names: Iterable[str]) -> None:
+    """Increment the versions of ``names`` on ``conn``'s current transaction (Core writes call this)"""
+    params = [{"name": name, "version": 1} for name in sorted(set(names))]
+    if not params:
+        return
+    stmt = sqlite_insert(reference_versions)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[reference_versions.c.name],
+        set_={"version": reference_versions.c.version + 1},
+    )
+    conn.execute(stmt, params)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session: Session, flush_context: Any) -> None:
+    names = {TRACKED[type(obj)] for obj in chain(session.new, session.dirty, session.deleted)
+             if type(obj) in TRACKED}
+    if names:
+        bump(session.connection(), names)
+        session.info["reference_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    if session.info.pop("reference_changed", False):
+        reference.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _invalidate_rolled_back(session: Session) -> None:
+    # A check on this session's connection may have read the uncommitted rows
+    if session.info.pop("reference_changed", False):
+        reference.invalidate()
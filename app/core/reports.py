@@ -0,0 +1,171 @@
+"""
+Built-in background jobs: exports, the ledger rebuild, the sales report and archival.
+
+Each writes its result to ``ctx.result_path`` (downloadable from
+``GET /jobs/{id}/result``) and reads through its own read-only session, so
+it never holds a request's connection and runs beside the writer.
+"""
+import csv
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import case, func, select, update
+
+from app.core.archive import Archiver, default_cutoff
+from app.core.counts import count_rows
+from app.core.database import ReadSessionLocal
+from app.core.jobs import JobContext, job_type
+from app.core.sharding import fan_out, locations
+from app.core.writer import write_queue
+from app.models.models import (
+    Account, Company, JournalEntry, JournalEntryLine, Product, SalesOrder, SalesOrderItem, SalesSummary
+)
+
+# Debit-normal account types; every other type carries a credit balance
+DEBIT_NORMAL = ("Asset", "Expense")
+
+
+class ExportProductsParams(BaseModel):
+    active_only: bool = False
+
+
+class ExportJournalParams(BaseModel):
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+
+class RebuildLedgerParams(BaseModel):
+    pass
+
+
+class SalesReportParams(BaseModel):
+    year: Optional[int] = None
+
+
+class ArchiveParams(BaseModel):
+    before: Optional[date] = None  # Default: ARCHIVE_HORIZON_DAYS ago
+
+
+@job_type("export_products", params=ExportProductsParams, concurrency=2, max_attempts=3)
+def export_products(ctx: JobContext, params: ExportProductsParams) -> None:
+    """Catalog CSV with available stock"""
+    with ReadSessionLocal() as db, open(ctx.result_path, "w", newline="") as f:
+        query = select(Product.id, Product.sku, Product.name, Product.unit_price, Product.cost_price,
+                       Product.is_active, Product.category_id, Product.available_stock).order_by(Product.id)
+        if params.active_only:
+            query = query.where(Product.is_active == True)  # noqa: E712
+        total = count_rows(db, Product)
+        writer = csv.writer(f)
+        writer.writerow(["id", "sku", "name", "unit_price", "cost_price", "is_active", "category_id",
+                         "available_stock"])
+        for done, row in enumerate(db.execute(query.execution_options(yield_per=1000)), 1):
+            writer.writerow(row)
+            ctx.progress(done, total)
+
+
+@job_type("export_journal", params=ExportJournalParams, concurrency=2, max_attempts=3)
+def export_journal(ctx: JobContext, params: ExportJournalParams) -> None:
+    """Journal lines with their entry and account code, in entry order"""
+    with ReadSessionLocal() as db, open(ctx.result_path, "w", newline="") as f:
+        query = (
+            select(JournalEntry.id, JournalEntry.date, JournalEntry.narration, Account.code, Account.name,
+                   JournalEntryLine.debit, JournalEntryLine.credit, JournalEntryLine.narration)
+            .join(JournalEntryLine, JournalEntryLine.journal_entry_id == JournalEntry.id)
+            .join(Account, Account.id == JournalEntryLine.account_id)
+            .order_by(JournalEntry.id, JournalEntryLine.id)
+        )
+        if params.date_from is not None:
+            query = query.where(JournalEntry.date >= params.date_from)
+        if params.date_to is not None:
+            query = query.where(JournalEntry.date <= params.date_to)
+        total = db.scalar(select(func.count()).select_from(JournalEntryLine))
+        writer = csv.writer(f)
+        writer.writerow(["entry_id", "date", "entry_narration", "account_code", "account_name",
+                         "debit", "credit", "line_narration"])
+        for done, row in enumerate(db.execute(query.execution_options(yield_per=5000)), 1):
+            writer.writerow(row)
+            ctx.progress(done, total)
+
+
+@job_type("rebuild_ledger", params=RebuildLedgerParams, media_type="application/json", extension="json")
+def rebuild_ledger(ctx: JobContext, params: RebuildLedgerParams) -> None:
+    """Recompute every account balance from the journal lines in one write unit"""
+    lines = JournalEntryLine.__table__
+    accounts = Account.__table__
+    net = (select(func.coalesce(func.sum(lines.c.debit - lines.c.credit), 0))
+           .where(lines.c.account_id == accounts.c.id).scalar_subquery())
+    ctx.progress(0, message="recomputing balances")
+
+    def unit(wdb) -> int:
+        return wdb.execute(update(accounts).values(
+            balance=case((accounts.c.account_type.in_(DEBIT_NORMAL), net), else_=-net))).rowcount
+
+    updated = write_queue.submit(unit).result()
+    with open(ctx.result_path, "w") as f:
+        f.write(f'{{"accounts_updated": {updated}}}\n')
+
+
+def _sales_totals(db, year: Optional[int]) -> Dict[Tuple[int, str], list]:
+    """[revenue, units, order ids, archived orders] per (company id, month) of one database"""
+    totals: Dict[Tuple[int, str], list] = defaultdict(lambda: [Decimal("0"), 0, set(), 0])
+    query = (
+        select(SalesOrder.company_id, SalesOrder.id, SalesOrder.order_date, SalesOrderItem.quantity,
+               SalesOrderItem.unit_price)
+        .join(SalesOrderItem, SalesOrderItem.sales_order_id == SalesOrder.id)
+    )
+    if year is not None:
+        query = query.where(SalesOrder.order_date.between(date(year, 1, 1), date(year, 12, 31)))
+    for company_id, order_id, order_date, quantity, unit_price in db.execute(query.execution_options(yield_per=5000)):
+        bucket = totals[(company_id, order_date.strftime("%Y-%m"))]
+        bucket[0] += quantity * unit_price
+        bucket[1] += quantity
+        bucket[2].add(order_id)
+    # Archived orders only left their monthly summaries behind
+    summaries = select(SalesSummary.company_id, SalesSummary.month, SalesSummary.orders, SalesSummary.units,
+                       SalesSummary.revenue)
+    if year is not None:
+        summaries = summaries.where(SalesSummary.month.like(f"{year}-%"))
+    for company_id, month, orders, units, revenue in db.execute(summaries):
+        bucket = totals[(company_id, month)]
+        bucket[0] += revenue
+        bucket[1] += units
+        bucket[3] += orders
+    return totals
+
+
+@job_type("sales_report", params=SalesReportParams, executor="process")
+def sales_report(ctx: JobContext, params: SalesReportParams) -> None:
+    """Revenue and units per company and month (CPU-bound aggregation, runs in a worker process)"""
+    totals: Dict[Tuple[str, str], list] = defaultdict(lambda: [Decimal("0"), 0, set(), 0])
+    with ReadSessionLocal() as db:
+        # Every order shard is aggregated in parallel; companies are named from the shared database
+        parts = fan_out(db, locations(), lambda session: _sales_totals(session, params.year))
+        names = dict(db.execute(select(Company.id, Company.name)).all())
+        for part in parts.values():
+            for (company_id, month), (revenue, units, orders, archived) in part.items():
+                if company_id not in names:
+                    continue
+                bucket = totals[(names[company_id], month)]
+                bucket[0] += revenue
+                bucket[1] += units
+                bucket[2] |= orders
+                bucket[3] += archived
+    with open(ctx.result_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["company", "month", "orders", "units", "revenue"])
+        for (company, month), (revenue, units, orders, archived) in sorted(totals.items()):
+            writer.writerow([company, month, len(orders) + archived, units, revenue])
+
+
+@job_type("archive", params=ArchiveParams, media_type="application/json", extension="json")
+def archive(ctx: JobContext, params: ArchiveParams) -> None:
+    """Move rows older than the horizon to the yearly archive files (see app.core.archive)"""
+    cutoff = datetime.combine(params.before, datetime.min.time()) if params.before else default_cutoff()
+    moved = Archiver(cutoff, progress=ctx.progress).run()
+    with open(ctx.result_path, "w") as f:
+        json.dump({"before": cutoff.date().isoformat(), "moved": moved}, f)
+        f.write("\n")
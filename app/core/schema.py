@@ -0,0 +1,83 @@
+"""
+Versioned schema management.
+
+The schema version is kept in SQLite's ``PRAGMA user_version``, so on a
+current database startup costs one pragma read instead of a
+``create_all`` that inspects every table. Bump ``SCHEMA_VERSION`` whenever
+models change; ``create_all`` then adds new tables/indexes and any
+migration registered for the new version runs once.
+"""
+import logging
+from typing import Callable, Dict
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.counts import reconcile_counts
+from app.core.stock import add_reservation_order_ref, seed_stock_balances
+from app.models.models import Base
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 9
+
+# Indexes that only cost writes, found by ``python -m benchmarks.index_audit``:
+# no captured query plan uses them, or another index starts with the same columns
+DROPPED_INDEXES = (
+    "idx_address_city_state", "idx_address_postal_country",
+    "ix_addresses_city", "ix_addresses_country", "ix_addresses_postal_code", "ix_addresses_state",
+    "ix_attendances_check_out",
+    "idx_company_name_active", "ix_companies_contact_email", "ix_companies_contact_phone", "ix_companies_created_at",
+    "ix_companies_name",
+    "ix_employees_joined_at",  # Same column as idx_employee_joined
+    "ix_employees_phone",
+    "ix_sales_order_items_quantity",
+    "ix_sales_order_items_sales_order_id",  # Prefix of idx_orderitem_order_product
+    "ix_sales_orders_due_date",  # Same column as idx_order_due_date
+    "ix_stock_movements_change",
+    "ix_tenant_shards_shard",
+    "idx_user_email_active", "ix_users_full_name",
+    "ix_users_id",  # Duplicates the rowid
+)
+
+
+def drop_unused_indexes(conn: Connection) -> None:
+    """Migration: drop ``DROPPED_INDEXES`` (the models no longer declare them)"""
+    for name in DROPPED_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+# version -> migration applied when upgrading to that version (after create_all)
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {
+    2: reconcile_counts,  # row_counts: seed the counters from the existing rows
+    # 3: idempotency_keys table, created by create_all
+    4: seed_stock_balances,  # stock_balances: opening balances from the movement history
+    # 5: jobs table, created by create_all
+    # 6: reference_versions table, created by create_all
+    7: add_reservation_order_ref,  # plus tenant_shards and shard_sequences, created by create_all
+    # 8: archive_periods, attendance_summaries and sales_summaries tables, created by create_all
+    9: drop_unused_indexes,
+}
+
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+
+def ensure_schema(conn: Connection) -> int:
+    """Bring the database up to ``SCHEMA_VERSION``; returns the version found"""
+    current = get_schema_version(conn)
+    if current == SCHEMA_VERSION:
+        return current
+    if current > SCHEMA_VERSION:
+        logger.warning(f"Database schema v{current} is newer than this code (v{SCHEMA_VERSION})")
+        return current
+
+    logger.info(f"Upgrading database schema v{current} -> v{SCHEMA_VERSION}")
+    Base.metadata.create_all(bind=conn)
+    for version in range(current + 1, SCHEMA_VERSION + 1):
+        migration = MIGRATIONS.get(version)
+        if migration is not None:
+            migration(conn)
+    conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
+    return current
@@ -0,0 +1,494 @@
+"""
+Synthetic dataset generator.
+
+Builds a realistic, referentially consistent database for performance work:
+users with roles and permissions, companies with addresses, a three-level
+category tree, products, warehouses, stock movements with the balances and
+order reservations they imply, orders with items at catalog prices, a chart
+of accounts with balanced journal entries and the balances they sum to,
+employees and their attendance. Jobs and idempotency keys are runtime state
+and stay empty; ``row_counts`` is reconciled at the end.
+
+Row counts grow linearly with ``--scale`` (about 1.2M rows at 1, 10M at 8)
+and the same ``--seed`` and scale always produce the same rows. Every table
+is written with explicit ids through multi-row ``executemany`` on one
+connection, with secondary indexes dropped until the end and the journal
+and fsyncs off during the load, so an interrupted run leaves a broken file:
+rerun with ``--replace``.
+
+CLI::
+
+    python -m app.core.seed [--database sql_app.db] [--scale 1] [--seed 42] [--replace] [--verify]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import Table, create_engine
+from sqlalchemy.engine import Connection
+
+from app.core.auth import get_password_hash
+from app.core.config import get_settings
+from app.core.counts import reconcile_counts
+from app.core.reports import DEBIT_NORMAL
+from app.core.schema import ensure_schema
+from app.models.models import (
+    Account, Address, Attendance, Base, Category, Company, Employee, JournalEntry, JournalEntryLine,
+    Permission, Product, Role, SalesOrder, SalesOrderItem, StockBalance, StockMovement, StockReservation,
+    User, Warehouse, role_permission, user_role
+)
+
+settings = get_settings()
+
+CHUNK_SIZE = 50_000
+END_DATE = date(2025, 6, 30)  # Fixed, so a seed reproduces the same dates whenever it runs
+HISTORY_DAYS = 730
+ATTENDANCE_DAYS = 60  # Working days of attendance per employee
+PASSWORD = "password123"
+
+# Rows per table at scale 1
+BASE_COUNTS = {
+    "users": 200,
+    "companies": 500,
+    "categories": 200,
+    "products": 20_000,
+    "warehouses": 8,
+    "stock_movements": 400_000,
+    "sales_orders": 50_000,
+    "journal_entries": 100_000,
+    "employees": 2_000,
+}
+
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Vihaan", "Arjun", "Sai", "Reyansh", "Ayaan", "Krishna", "Ishaan",
+               "Ananya", "Diya", "Saanvi", "Aadhya", "Pari", "Anika", "Navya", "Myra", "Sara", "Kiara",
+               "Rohan", "Priya", "Rahul", "Neha", "Amit", "Pooja", "Vikram", "Sneha", "Karan", "Meera"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Singh", "Kumar", "Patel", "Reddy", "Iyer", "Nair", "Das",
+              "Mehta", "Joshi", "Rao", "Bose", "Chopra", "Malhotra", "Kapoor", "Agarwal", "Mishra", "Pandey"]
+CITIES = [("Mumbai", "Maharashtra", "400"), ("Pune", "Maharashtra", "411"), ("New Delhi", "Delhi", "110"),
+          ("Bengaluru", "Karnataka", "560"), ("Chennai", "Tamil Nadu", "600"), ("Hyderabad", "Telangana", "500"),
+          ("Kolkata", "West Bengal", "700"), ("Ahmedabad", "Gujarat", "380"), ("Jaipur", "Rajasthan", "302"),
+          ("Lucknow", "Uttar Pradesh", "226")]
+STREETS = ["MG Road", "Station Road", "Nehru Nagar", "Industrial Area", "Ring Road", "Park Street", "Civil Lines",
+           "Market Yard", "Link Road", "Gandhi Chowk"]
+INDUSTRIES = ["Textiles", "Traders", "Electronics", "Foods", "Pharma", "Logistics", "Retail", "Engineering",
+              "Agro", "Hardware"]
+LEGAL_FORMS = ["Pvt Ltd", "LLP", "& Sons", "Enterprises", "Ltd"]
+ROOT_CATEGORIES = ["Electronics", "Furniture", "Stationery", "Apparel", "Groceries", "Hardware", "Kitchen",
+                   "Sports", "Toys", "Health", "Automotive", "Books"]
+SUBCATEGORIES = ["Accessories", "Essentials", "Premium", "Basics", "Outdoor", "Professional", "Home", "Kids",
+                 "Spares", "Bulk"]
+ADJECTIVES = ["Classic", "Premium", "Compact", "Deluxe", "Eco", "Smart", "Heavy Duty", "Portable", "Pro", "Mini"]
+NOUNS = ["Kit", "Set", "Pack", "Unit", "Box", "Bundle", "Module", "Case", "Roll", "Pair"]
+RECEIPT_REASONS = ["Purchase receipt", "Transfer in", "Customer return"]
+ISSUE_REASONS = ["Sales dispatch", "Transfer out", "Damaged", "Stock count adjustment"]
+WAREHOUSE_NAMES = ["Central", "North", "South", "East", "West", "Port", "Hub", "Overflow"]
+
+ROLES = {
+    "admin": ("Full access", ("products", "orders", "stock", "accounts", "employees", "users"), ("read", "write")),
+    "accountant": ("Books and ledgers", ("accounts", "orders"), ("read", "write")),
+    "sales": ("Orders and catalog", ("orders", "products"), ("read", "write")),
+    "warehouse": ("Stock and catalog", ("stock", "products"), ("read", "write")),
+    "hr": ("Employees and attendance", ("employees",), ("read", "write")),
+}
+PERMISSION_CODES = [f"{resource}:{action}" for resource in ROLES["admin"][1] for action in ROLES["admin"][2]]
+
+# code, name, type
+CHART_OF_ACCOUNTS = [
+    ("1000", "Cash", "Asset"), ("1100", "Bank", "Asset"), ("1200", "Accounts Receivable", "Asset"),
+    ("1300", "Inventory", "Asset"), ("1400", "Input GST", "Asset"), ("1500", "Fixed Assets", "Asset"),
+    ("2000", "Accounts Payable", "Liability"), ("2100", "Output GST", "Liability"),
+    ("2200", "Salaries Payable", "Liability"), ("2300", "Term Loan", "Liability"),
+    ("3000", "Owner's Capital", "Equity"), ("3100", "Retained Earnings", "Equity"),
+    ("4000", "Sales", "Revenue"), ("4100", "Service Income", "Revenue"), ("4200", "Interest Income", "Revenue"),
+    ("5000", "Cost of Goods Sold", "Expense"), ("6000", "Salaries", "Expense"), ("6100", "Rent", "Expense"),
+    ("6200", "Utilities", "Expense"), ("6300", "Travel", "Expense"), ("6400", "Office Supplies", "Expense"),
+    ("6500", "Bank Charges", "Expense"),
+]
+GST_RATE = 0.18
+
+
+def insert_rows(conn: Connection, table: Table, columns: Sequence[str], rows: Iterable[Tuple],
+                chunk_size: int = CHUNK_SIZE) -> int:
+    """``executemany`` of positional ``rows`` in chunks, bypassing SQLAlchemy's per-row processing"""
+    sql = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    written = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return written
+        conn.exec_driver_sql(sql, chunk)
+        written += len(chunk)
+
+
+def _datetime(value: datetime) -> str:
+    # SQLAlchemy's SQLite DATETIME storage format, so ORM reads and comparisons see the same strings
+    return value.isoformat(" ", "microseconds")
+
+
+def _money(cents: int) -> float:
+    return cents / 100
+
+
+class Seeder:
+    """Generates every table in dependency order, keeping just enough state to stay consistent"""
+
+    def __init__(self, conn: Connection, scale: float, seed: int, chunk_size: int = CHUNK_SIZE):
+        self.conn = conn
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.counts = {name: max(1, round(count * scale)) for name, count in BASE_COUNTS.items()}
+        self.counts["warehouses"] = max(2, self.counts["warehouses"])
+        self.start = datetime.combine(END_DATE - timedelta(days=HISTORY_DAYS), datetime.min.time())
+        self.span = timedelta(days=HISTORY_DAYS).total_seconds()
+        self.written: List[Tuple[str, int, float]] = []
+
+    def rng(self, name: str) -> random.Random:
+        """Independent stream per table: changing one generator leaves the others' rows alone"""
+        return random.Random(f"{self.seed}:{name}")
+
+    def write(self, table: Table, columns: Sequence[str], rows: Iterable[Tuple]) -> int:
+        started = time.perf_counter()
+        written = insert_rows(self.conn, table, columns, rows, self.chunk_size)
+        self.conn.commit()
+        self.written.append((table.name, written, time.perf_counter() - started))
+        return written
+
+    def moment(self, rng: random.Random, fraction: float) -> datetime:
+        """Point ``fraction`` of the way through the history window"""
+        return self.start + timedelta(seconds=fraction * self.span + rng.random() * 3600)
+
+    def run(self) -> None:
+        self.users()
+        self.companies()
+        self.catalog()
+        self.stock_and_orders()
+        self.accounting()
+        self.employees()
+
+    # ---- users ----
+    def users(self) -> None:
+        rng = self.rng("users")
+        self.write(Permission.__table__, ("id", "code", "description"),
+                   ((i, code, f"Can {code.split(':')[1]} {code.split(':')[0]}")
+                    for i, code in enumerate(PERMISSION_CODES, 1)))
+        self.write(Role.__table__, ("id", "name", "description"),
+                   ((i, name, description) for i, (name, (description, _, _)) in enumerate(ROLES.items(), 1)))
+        self.write(role_permission, ("role_id", "permission_id"), (
+            (role_id, PERMISSION_CODES.index(f"{resource}:{action}") + 1)
+            for role_id, (_, resources, actions) in enumerate(ROLES.values(), 1)
+            for resource in resources for action in actions
+        ))
+        hashed = get_password_hash(PASSWORD)  # bcrypt once; every seeded user shares it
+        users = self.counts["users"]
+        self.write(User.__table__, ("id", "email", "full_name", "hashed_password", "is_active", "created_at"), (
+            (i, f"user{i}@example.com", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", hashed,
+             int(rng.random() < 0.95), _datetime(self.moment(rng, i / users)))
+            for i in range(1, users + 1)
+        ))
+        self.write(user_role, ("user_id", "role_id"),
+                   ((i, 1 if i == 1 else rng.randint(2, len(ROLES))) for i in range(1, users + 1)))
+
+    # ---- companies ----
+    def companies(self) -> None:
+        rng = self.rng("companies")
+        companies = self.counts["companies"]
+        cities = [rng.choice(CITIES) for _ in range(companies)]
+        self.write(Address.__table__, ("id", "line1", "line2", "city", "state", "postal_code", "country"), (
+            (i, f"{rng.randint(1, 999)}, {rng.choice(STREETS)}", None if rng.random() < 0.6 else f"Floor {rng.randint(1, 12)}",
+             city, state, f"{prefix}{rng.randint(1, 99):03d}", "India")
+            for i, (city, state, prefix) in enumerate(cities, 1)
+        ))
+        self.write(Company.__table__, ("id", "name", "gstin", "contact_email", "contact_phone", "address_id",
+                                       "created_at"), (
+            (i, f"{rng.choice(LAST_NAMES)} {rng.choice(INDUSTRIES)} {rng.choice(LEGAL_FORMS)}",
+             f"{27 + i % 10:02d}AABC{i:06d}1Z{i % 10}", f"accounts{i}@company{i}.example.com",
+             f"+91 9{rng.randint(100000000, 999999999)}", i, _datetime(self.moment(rng, i / companies)))
+            for i in range(1, companies + 1)
+        ))
+
+    # ---- catalog ----
+    def catalog(self) -> None:
+        rng = self.rng("catalog")
+        total = self.counts["categories"]
+        children = max(1, (total - len(ROOT_CATEGORIES)) // 3)
+        grandchildren = max(1, total - len(ROOT_CATEGORIES) - children)
+        categories: List[Tuple[int, str, Any]] = [(i, name, None) for i, name in enumerate(ROOT_CATEGORIES, 1)]
+        for _ in range(children):
+            parent = rng.randint(1, len(ROOT_CATEGORIES))
+            categories.append((len(categories) + 1, f"{ROOT_CATEGORIES[parent - 1]} {rng.choice(SUBCATEGORIES)}", parent))
+        first_child = len(ROOT_CATEGORIES) + 1
+        for n in range(grandchildren):
+            parent = rng.randint(first_child, first_child + children - 1)
+            categories.append((len(categories) + 1, f"{categories[parent - 1][1]} Line {n + 1}", parent))
+        self.write(Category.__table__, ("id", "name", "parent_id"), categories)
+
+        # Products mostly sit in the leaves
+        leaves = [category[0] for category in categories[first_child - 1 + children:]] or [1]
+        self.prices: List[int] = [0]
+        products = []
+        for i in range(1, self.counts["products"] + 1):
+            price = max(50, int(rng.lognormvariate(7.5, 1.1)))  # cents; median around Rs 18
+            self.prices.append(price)
+            products.append((
+                i, f"SKU-{i:07d}", f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                None if rng.random() < 0.5 else f"Catalog item {i}", _money(price),
+                _money(int(price * rng.uniform(0.55, 0.85))), int(rng.random() < 0.95),
+                rng.choice(leaves),
+            ))
+        self.write(Product.__table__, ("id", "sku", "name", "description", "unit_price", "cost_price", "is_active",
+                                       "category_id"), products)
+        self.write(Warehouse.__table__, ("id", "name", "location"), (
+            (i, f"{WAREHOUSE_NAMES[(i - 1) % len(WAREHOUSE_NAMES)]} {(i - 1) // len(WAREHOUSE_NAMES) + 1}",
+             rng.choice(CITIES)[0]) for i in range(1, self.counts["warehouses"] + 1)
+        ))
+
+    # ---- stock and orders ----
+    def stock_and_orders(self) -> None:
+        """Movements keep a running balance per (product, warehouse); order items reserve from it"""
+        rng = self.rng("stock")
+        products, warehouses = self.counts["products"], self.counts["warehouses"]
+        # Each product is stocked in two warehouses: pair 2*(p-1)+j
+        pairs = [(p, w) for p in range(1, products + 1)
+                 for w in rng.sample(range(1, warehouses + 1), 2)]
+        on_hand = [0] * len(pairs)
+        total = self.counts["stock_movements"]
+
+        def movements():
+            for i in range(1, total + 1):
+                pair = rng.randrange(len(pairs))
+                balance = on_hand[pair]
+                if balance > 0 and rng.random() < 0.6:
+                    change = -rng.randint(1, min(balance, 200))
+                    reason = rng.choice(ISSUE_REASONS)
+                else:
+                    change = rng.randint(20, 500)
+                    reason = rng.choice(RECEIPT_REASONS)
+                on_hand[pair] = balance + change
+                product_id, warehouse_id = pairs[pair]
+                yield i, product_id, warehouse_id, change, reason, _datetime(self.moment(rng, i / total))
+
+        self.write(StockMovement.__table__, ("id", "product_id", "warehouse_id", "change", "reason", "occurred_at"),
+                   movements())
+
+        rng = self.rng("orders")
+        available = list(on_hand)
+        items: List[Tuple] = []
+        reservations: List[Tuple] = []
+        orders = []
+        companies = self.counts["companies"]
+        order_count = self.counts["sales_orders"]
+        for order_id in range(1, order_count + 1):
+            order_date = (self.start + timedelta(seconds=order_id / order_count * self.span)).date()
+            orders.append((
+                order_id, rng.randint(1, companies), order_date.isoformat(),
+                (order_date + timedelta(days=30)).isoformat() if rng.random() < 0.8 else None,
+                "Urgent" if rng.random() < 0.05 else None,
+            ))
+            wanted = rng.choices((1, 2, 3, 4, 5), weights=(30, 25, 20, 15, 10))[0]
+            chosen = set()
+            for _ in range(wanted * 3):  # A few retries for out-of-stock products
+                if len(chosen) == wanted:
+                    break
+                product_id = rng.randint(1, products)
+                if product_id in chosen:
+                    continue
+                pair = 2 * (product_id - 1) + rng.randint(0, 1)
+                if available[pair] <= 0:
+                    pair ^= 1
+                    if available[pair] <= 0:
+                        continue
+                quantity = min(available[pair], rng.randint(1, 10))
+                available[pair] -= quantity
+                chosen.add(product_id)
+                items.append((len(items) + 1, order_id, product_id, quantity, _money(self.prices[product_id])))
+                reservations.append((len(reservations) + 1, product_id, pairs[pair][1], order_id, quantity,
+                                     f"{order_date.isoformat()} 00:00:00.000000"))
+        self.write(SalesOrder.__table__, ("id", "company_id", "order_date", "due_date", "notes"), orders)
+        self.write(SalesOrderItem.__table__, ("id", "sales_order_id", "product_id", "quantity", "unit_price"), items)
+        self.write(StockReservation.__table__, ("id", "product_id", "warehouse_id", "sales_order_id", "quantity",
+                                                "created_at"), reservations)
+        self.write(StockBalance.__table__, ("product_id", "warehouse_id", "available"), (
+            (product_id, warehouse_id, available[pair]) for pair, (product_id, warehouse_id) in enumerate(pairs)
+        ))
+
+    # ---- accounting ----
+    def accounting(self) -> None:
+        rng = self.rng("accounting")
+        ids = {code: i for i, (code, _, _) in enumerate(CHART_OF_ACCOUNTS, 1)}
+        expenses = [ids[code] for code in ("6100", "6200", "6300", "6400", "6500")]
+        net = [0] * (len(CHART_OF_ACCOUNTS) + 1)  # debits - credits, in cents
+        entries = []
+        lines: List[Tuple] = []
+        total = self.counts["journal_entries"]
+        for entry_id in range(1, total + 1):
+            amount = max(100, int(rng.lognormvariate(10, 1.2)))
+            kind = "capital" if entry_id == 1 else rng.choices(
+                ("sale", "receipt", "purchase", "payment", "expense", "payroll"), weights=(25, 30, 15, 12, 13, 5))[0]
+            tax = round(amount * GST_RATE)
+            if kind == "capital":  # Opening funds, so cash and bank stay positive
+                amount = total * 20_000
+                postings = [(ids["1100"], amount, 0), (ids["3000"], 0, amount)]
+            elif kind == "sale":
+                postings = [(ids["1200"], amount + tax, 0), (ids["4000"], 0, amount), (ids["2100"], 0, tax)]
+            elif kind == "receipt":
+                postings = [(ids["1000" if rng.random() < 0.3 else "1100"], amount, 0), (ids["1200"], 0, amount)]
+            elif kind == "purchase":
+                postings = [(ids["1300"], amount, 0), (ids["1400"], tax, 0), (ids["2000"], 0, amount + tax)]
+            elif kind == "payment":
+                postings = [(ids["2000"], amount, 0), (ids["1100"], 0, amount)]
+            elif kind == "expense":
+                postings = [(rng.choice(expenses), amount, 0), (ids["1000" if rng.random() < 0.3 else "1100"], 0, amount)]
+            else:
+                postings = [(ids["6000"], amount, 0), (ids["2200"], 0, amount)]
+            entries.append((entry_id, (self.start + timedelta(seconds=entry_id / total * self.span)).date().isoformat(),
+                            f"{kind.capitalize()} #{entry_id}"))
+            for account_id, debit, credit in postings:
+                net[account_id] += debit - credit
+                lines.append((len(lines) + 1, entry_id, account_id, _money(debit), _money(credit), None))
+        self.write(Account.__table__, ("id", "name", "code", "account_type", "balance"), (
+            (i, name, code, kind, _money(net[i] if kind in DEBIT_NORMAL else -net[i]))
+            for i, (code, name, kind) in enumerate(CHART_OF_ACCOUNTS, 1)
+        ))
+        self.write(JournalEntry.__table__, ("id", "date", "narration"), entries)
+        self.write(JournalEntryLine.__table__, ("id", "journal_entry_id", "account_id", "debit", "credit", "narration"),
+                   lines)
+
+    # ---- people ----
+    def employees(self) -> None:
+        rng = self.rng("employees")
+        days = []
+        day = END_DATE
+        while len(days) < ATTENDANCE_DAYS:
+            if day.weekday() < 5:
+                days.append(day)
+            day -= timedelta(days=1)
+        days.reverse()
+        hired_by = days[0] - timedelta(days=1)
+        employees = self.counts["employees"]
+        joined = [hired_by - timedelta(days=rng.randrange(6 * 365)) for _ in range(employees)]
+        self.write(Employee.__table__, ("id", "first_name", "last_name", "email", "phone", "emp_code", "joined_at"), (
+            (i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"employee{i}@example.com",
+             f"+91 8{rng.randint(100000000, 999999999)}", f"EMP{i:06d}", joined[i - 1].isoformat())
+            for i in range(1, employees + 1)
+        ))
+
+        def attendance():
+            record_id = 0
+            for day in days:
+                opens = datetime.combine(day, datetime.min.time()) + timedelta(hours=8, minutes=30)
+                for employee_id in range(1, employees + 1):
+                    if rng.random() >= 0.92:  # Leave, holidays, absences
+                        continue
+                    record_id += 1
+                    check_in = opens + timedelta(seconds=rng.randrange(90 * 60))
+                    check_out = check_in + timedelta(seconds=rng.randrange(int(7.5 * 3600), int(9.5 * 3600)))
+                    yield record_id, employee_id, day.isoformat(), _datetime(check_in), _datetime(check_out)
+
+        self.write(Attendance.__table__, ("id", "employee_id", "date", "check_in", "check_out"), attendance())
+
+
+def verify(conn: Connection) -> List[str]:
+    """Consistency checks over the finished database; returns the failures"""
+    failures = []
+    if conn.exec_driver_sql("PRAGMA foreign_key_check").first() is not None:
+        failures.append("foreign key violations")
+    unbalanced = conn.exec_driver_sql(
+        "SELECT COUNT(*) FROM (SELECT journal_entry_id FROM journal_entry_lines GROUP BY journal_entry_id "
+        "HAVING ROUND(SUM(debit) - SUM(credit), 2) != 0)").scalar()
+    if unbalanced:
+        failures.append(f"{unbalanced} unbalanced journal entries")
+    # Grouped once per table (stock_reservations has no product index to correlate on)
+    drift = conn.exec_driver_sql(
+        "SELECT COUNT(*) FROM stock_balances b "
+        "LEFT JOIN (SELECT product_id, warehouse_id, SUM(change) AS qty FROM stock_movements "
+        "           GROUP BY product_id, warehouse_id) m USING (product_id, warehouse_id) "
+        "LEFT JOIN (SELECT product_id, warehouse_id, SUM(quantity) AS qty FROM stock_reservations "
+        "           GROUP BY product_id, warehouse_id) r USING (product_id, warehouse_id) "
+        "WHERE b.available != COALESCE(m.qty, 0) - COALESCE(r.qty, 0)").scalar()
+    if drift:
+        failures.append(f"{drift} stock balances disagree with movements minus reservations")
+    return failures
+
+
+def build(path: str, scale: float = 1.0, seed: int = 42, chunk_size: int = CHUNK_SIZE,
+          check: bool = False) -> List[Tuple[str, int, float]]:
+    """Create the schema in a new database file at ``path`` and fill it; returns (table, rows, seconds)"""
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with engine.begin() as conn:
+            ensure_schema(conn)
+        with engine.connect() as conn:
+            # Bulk-load profile: no rollback journal, no fsync, big page cache
+            conn.exec_driver_sql("PRAGMA journal_mode=OFF")
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            conn.exec_driver_sql("PRAGMA cache_size=-262144")
+            conn.exec_driver_sql("PRAGMA temp_store=MEMORY")
+            indexes = [index for table in Base.metadata.sorted_tables for index in table.indexes]
+            existing = set(conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").scalars())
+            for index in indexes:
+                if index.name in existing:
+                    conn.exec_driver_sql(f"DROP INDEX {index.name}")
+            conn.commit()
+
+            seeder = Seeder(conn, scale, seed, chunk_size)
+            seeder.run()
+
+            started = time.perf_counter()
+            for index in indexes:
+                index.create(conn)
+            conn.commit()
+            seeder.written.append(("(indexes)", len(indexes), time.perf_counter() - started))
+
+            started = time.perf_counter()
+            reconcile_counts(conn)
+            conn.commit()
+            conn.exec_driver_sql("ANALYZE")
+            conn.commit()
+            seeder.written.append(("(row_counts, ANALYZE)", 0, time.perf_counter() - started))
+            if check:
+                failures = verify(conn)
+                if failures:
+                    raise RuntimeError(f"Seeded database is inconsistent: {'; '.join(failures)}")
+            conn.exec_driver_sql(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        return seeder.written
+    finally:
+        engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset (about 1.2M rows per unit of scale)")
+    parser.add_argument("--database", default="sql_app.db", help="SQLite file to create (default ./sql_app.db)")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--replace", action="store_true", help="Delete an existing database file first")
+    parser.add_argument("--verify", action="store_true", help="Check foreign keys, journal balance and stock afterwards")
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        if not args.replace:
+            print(f"{args.database} already exists; pass --replace to overwrite it")
+            return 2
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(args.database + suffix):
+                os.remove(args.database + suffix)
+
+    started = time.perf_counter()
+    written = build(args.database, args.scale, args.seed, args.chunk_size, args.verify)
+    for table, rows, seconds in written:
+        print(f"{table:<24}{rows:>12,}{seconds:>9.1f}s")
+    rows = sum(rows for table, rows, _ in written if not table.startswith("("))
+    elapsed = time.perf_counter() - started
+    print(f"{rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s) -> {args.database}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
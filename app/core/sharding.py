@@ -0,0 +1,380 @@
+"""
+Per-company sharding of the order tables.
+
+With ``SHARDS`` set (shard name -> database URL, e.g.
+``{"s1": "sqlite:///./shard_s1.db", "s2": "sqlite:///./shard_s2.db"}``)
+each company's sales orders and their items live in one shard file, so
+tenants stop competing for the one SQLite write lock and each file stays
+small. Everything else (companies, products, stock balances and
+reservations, the chart of accounts, journals) stays in the main database,
+called ``"shared"`` here. ``tenant_shards`` maps a company to its shard; a
+company is assigned to the shard with the fewest tenants on its first order.
+Orders written before sharding was turned on stay in the shared file and
+are read from there too.
+
+Order ids stay unique across files: they come from ``shard_sequences`` in
+the shared file. Creating an order is a short saga (see
+``crud.sales_order``): validate, allocate the id and hold the stock in the
+shared file with an expiry, insert the order through the shard's own write
+queue, then confirm the hold. A failure in between releases the hold; a
+crash leaves it to expire after SHARD_PENDING_TTL_SECONDS.
+
+Reads that are not limited to one company run on every location in
+parallel (:func:`fan_out`) and are merged by the caller.
+
+Moving tenants between shards::
+
+    python -m app.core.sharding status
+    python -m app.core.sharding move COMPANY_ID SHARD
+    python -m app.core.sharding rebalance [--apply]
+
+Pause the tenant's writes while it moves: the move refuses to switch the
+tenant over if orders were added to the source meanwhile, and can simply be
+run again after an interruption.
+"""
+import argparse
+import contextvars
+import logging
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, TypeVar
+
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.counts import record_rows
+from app.core.database import SHARED, WriteSessionLocal, shards
+from app.core.schema import SCHEMA_VERSION, drop_unused_indexes, get_schema_version
+from app.core.stock import reservations
+from app.models.models import (
+    Base, RowCount, SalesOrder, SalesOrderItem, SalesSummary, ShardSequence, TenantShard
+)
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+tenant_shards = TenantShard.__table__
+shard_sequences = ShardSequence.__table__
+orders = SalesOrder.__table__
+items = SalesOrderItem.__table__
+
+# Tables created in every shard file (row_counts keeps each shard's own counters, sales_summaries
+# the totals of its archived orders)
+SHARD_TABLES = (orders, items, RowCount.__table__, SalesSummary.__table__)
+
+# Rows per statement when copying or deleting a tenant
+MOVE_CHUNK = 500
+
+
+# ---- schema ----
+def ensure_shard_schema(conn: Connection) -> None:
+    """Create the shard tables in one shard file, once per schema version"""
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return
+    Base.metadata.create_all(bind=conn, tables=SHARD_TABLES)
+    drop_unused_indexes(conn)
+    conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
+
+
+def ensure_shard_schemas() -> None:
+    for name in shards.names:
+        with shards.engine(name).begin() as conn:
+            ensure_shard_schema(conn)
+
+
+# ---- routing ----
+def locations() -> List[str]:
+    """Every database holding orders, the shared one first"""
+    return [SHARED, *shards.names]
+
+
+def shard_for(db: Session, company_id: int) -> Optional[str]:
+    """The company's shard, None if it has none yet"""
+    return db.execute(select(tenant_shards.c.shard).where(tenant_shards.c.company_id == company_id)).scalar()
+
+
+def company_locations(db: Session, company_id: int) -> List[str]:
+    """Where the company's orders are: its shard, and the shared file for older orders"""
+    shard = shard_for(db, company_id)
+    return [SHARED] if shard in (None, SHARED) else [shard, SHARED]
+
+
+def assign_shard(wdb: Session, company_id: int) -> str:
+    """The company's shard, assigning the one with the fewest tenants if it has none (in a write unit)"""
+    shard = shard_for(wdb, company_id)
+    if shard is not None:
+        return shard
+    tenants = dict(wdb.execute(select(tenant_shards.c.shard, func.count()).group_by(tenant_shards.c.shard)).all())
+    shard = min(shards.names, key=lambda name: (tenants.get(name, 0), name))
+    wdb.execute(insert(tenant_shards).values(company_id=company_id, shard=shard))
+    logger.info(f"Company {company_id} assigned to shard {shard}")
+    return shard
+
+
+def next_id(wdb: Session, model: type) -> int:
+    """Next id of ``model`` unique across the shared file and every shard (in a shared write unit)"""
+    shared_next = select(func.coalesce(func.max(model.id), 0) + 1).scalar_subquery()
+    stmt = sqlite_insert(shard_sequences).values(name=model.__tablename__, last_id=shared_next)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[shard_sequences.c.name],
+        # Orders written to the shared file while sharding was off move the sequence forward too
+        set_={"last_id": func.max(shard_sequences.c.last_id + 1, shared_next)},
+    )
+    return wdb.execute(stmt.returning(shard_sequences.c.last_id)).scalar()
+
+
+# ---- parallel reads ----
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Created on first use, i.e. in the worker process after fork
+        _executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(shards.names)), thread_name_prefix="shard-read")
+    return _executor
+
+
+def _on_shard(name: str, fn: Callable[[Session], T], open_session: Optional[Callable[[str], Session]]) -> T:
+    with (open_session(name) if open_session else shards.session(name, read_only=True)) as session:
+        return fn(session)  # Loaded objects stay usable after close, detached
+
+
+def fan_out(db: Session, names: Sequence[str], fn: Callable[[Session], T],
+            open_session: Optional[Callable[[str], Session]] = None) -> Dict[str, T]:
+    """``fn(session)`` on every location in ``names`` at once; results by location.
+
+    ``SHARED`` runs on ``db`` in the calling thread (so it sees the caller's
+    own writes), every shard on a read-only session in the thread pool.
+    ``open_session(name)`` replaces the shard sessions (e.g. archive files).
+    """
+    futures = {
+        name: _pool().submit(contextvars.copy_context().run, _on_shard, name, fn, open_session)
+        for name in names if name != SHARED
+    }
+    results: Dict[str, T] = {}
+    if SHARED in names:
+        results[SHARED] = fn(db)
+    for name, future in futures.items():
+        results[name] = future.result()
+    return {name: results[name] for name in names}
+
+
+# ---- moving tenants ----
+def _order_ids(session: Session, company_id: int) -> Set[int]:
+    return set(session.execute(select(orders.c.id).where(orders.c.company_id == company_id)).scalars())
+
+
+def _ids_in(shared: Session, name: str, company_id: int) -> Set[int]:
+    if name == SHARED:
+        return _order_ids(shared, company_id)
+    with shards.session(name) as session:
+        return _order_ids(session, company_id)
+
+
+def _chunks(values: Iterable[int]) -> Iterable[List[int]]:
+    values = sorted(values)
+    for start in range(0, len(values), MOVE_CHUNK):
+        yield values[start:start + MOVE_CHUNK]
+
+
+def _copy(source: Session, target: Session, ids: Set[int]) -> None:
+    """Copy orders (keeping their ids) and their items (new ids: item ids are per file)"""
+    for chunk in _chunks(ids):
+        order_rows = [dict(row._mapping) for row in source.execute(select(orders).where(orders.c.id.in_(chunk)))]
+        item_rows = [dict(row._mapping) for row in source.execute(
+            select(items).where(items.c.sales_order_id.in_(chunk)).order_by(items.c.id))]
+        for row in item_rows:
+            del row["id"]
+        target.execute(insert(orders), order_rows)
+        if item_rows:
+            target.execute(insert(items), item_rows)
+        record_rows(target.connection(), SalesOrder, order_rows)
+
+
+def _purge(session: Session, company_id: int, ids: Set[int]) -> int:
+    """Delete the copies of ``ids`` left in a source"""
+    for chunk in _chunks(ids):
+        session.execute(delete(items).where(items.c.sales_order_id.in_(chunk)))
+        session.execute(delete(orders).where(orders.c.id.in_(chunk)))
+    record_rows(session.connection(), SalesOrder, [{"company_id": company_id}] * len(ids), sign=-1)
+    return len(ids)
+
+
+def move_tenant(company_id: int, target: str) -> int:
+    """Move every order of the company to ``target`` and point the company at it; orders copied.
+
+    Steps, each committed on its own and safe to repeat: copy whatever the
+    target is missing, switch ``tenant_shards`` (re-pointing the stock held
+    for orders leaving the shared file), delete the copies from the sources.
+    """
+    if target != SHARED and target not in shards.names:
+        raise ValueError(f"Unknown shard {target!r}; configured: {', '.join(shards.names) or 'none'}")
+    # BEGIN IMMEDIATE: while the switch is checked and made no order can be routed by the old assignment
+    with WriteSessionLocal() as shared:
+        sources = [name for name in locations() if name != target]
+        found = {name: _ids_in(shared, name, company_id) for name in sources}
+        shared.rollback()
+
+        # 1. Copy into the target what it does not have yet (left by an interrupted run)
+        with shards.session(target) as session:
+            present = _order_ids(session, company_id)
+            copied = 0
+            for name in sources:
+                missing = found[name] - present
+                if not missing:
+                    continue
+                with shards.session(name) as source:
+                    _copy(source, session, missing)
+                present |= missing
+                copied += len(missing)
+            session.commit()
+
+        # 2. Switch the company over, unless orders arrived in a source meanwhile
+        for name in sources:
+            current = _ids_in(shared, name, company_id)
+            if current - present:
+                raise RuntimeError(f"Company {company_id} got {len(current - present)} new orders in {name} "
+                                   "during the move; pause its writes and run the move again")
+        if SHARED in sources and target != SHARED and found[SHARED]:
+            # Reservations cannot keep a foreign key to orders in another file
+            for chunk in _chunks(found[SHARED]):
+                shared.execute(
+                    update(reservations).where(reservations.c.sales_order_id.in_(chunk))
+                    .values(order_ref=reservations.c.sales_order_id, sales_order_id=None))
+        shared.execute(sqlite_insert(tenant_shards).values(company_id=company_id, shard=target)
+                       .on_conflict_do_update(index_elements=[tenant_shards.c.company_id], set_={"shard": target}))
+        shared.commit()
+
+        # 3. Drop the copies left in the sources
+        for name in sources:
+            stale = found[name] & present
+            if not stale:
+                continue
+            if name == SHARED:
+                _purge(shared, company_id, stale)
+                shared.commit()
+            else:
+                with shards.session(name) as session:
+                    _purge(session, company_id, stale)
+                    session.commit()
+    logger.info(f"Company {company_id} moved to {target}: {copied} orders copied")
+    return copied
+
+
+# ---- status and rebalancing ----
+def tenant_loads() -> Dict[str, Dict[int, int]]:
+    """Orders per company in every location"""
+    loads: Dict[str, Dict[int, int]] = {}
+    for name in locations():
+        with shards.session(name, read_only=True) as session:
+            loads[name] = dict(session.execute(
+                select(orders.c.company_id, func.count()).group_by(orders.c.company_id)).all())
+    return loads
+
+
+def assignments() -> Dict[int, str]:
+    with shards.session(SHARED, read_only=True) as session:
+        return dict(session.execute(select(tenant_shards.c.company_id, tenant_shards.c.shard)).all())
+
+
+def plan_rebalance(loads: Dict[str, Dict[int, int]], assigned: Dict[int, str]) -> List[tuple]:
+    """Greedy plan of (company_id, orders, from, to) moves evening out the orders per shard.
+
+    Companies with orders in the shared file are consolidated first (onto
+    their shard, or the lightest one); then the largest company that
+    narrows the gap between the heaviest and the lightest shard moves,
+    until none does.
+    """
+    sizes: Dict[int, int] = defaultdict(int)
+    for counts in loads.values():
+        for company_id, count in counts.items():
+            sizes[company_id] += count
+    start = {company_id: assigned.get(company_id, SHARED) for company_id in sizes}
+    home = dict(start)
+    load = {name: 0 for name in shards.names}
+    for company_id, name in home.items():
+        if name in load:
+            load[name] += sizes[company_id]
+
+    legacy = {company_id for company_id in sizes if loads[SHARED].get(company_id)}
+    for company_id in sorted(legacy, key=lambda c: (-sizes[c], c)):
+        if home[company_id] not in load:
+            home[company_id] = min(load, key=lambda name: (load[name], name))
+            load[home[company_id]] += sizes[company_id]
+
+    while len(load) > 1:
+        heavy = max(load, key=lambda name: (load[name], name))
+        light = min(load, key=lambda name: (load[name], name))
+        gap = load[heavy] - load[light]
+        candidates = [c for c, name in home.items() if name == heavy and 0 < sizes[c] < gap]
+        if not candidates:
+            break
+        company_id = max(candidates, key=lambda c: (sizes[c], -c))
+        load[heavy] -= sizes[company_id]
+        load[light] += sizes[company_id]
+        home[company_id] = light
+
+    return [(company_id, sizes[company_id], start[company_id], home[company_id])
+            for company_id in sorted(sizes)
+            if home[company_id] != start[company_id] or company_id in legacy]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect and move tenants between order shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="orders per shard and tenant")
+    move = commands.add_parser("move", help="move one company's orders to a shard")
+    move.add_argument("company_id", type=int)
+    move.add_argument("shard")
+    rebalance = commands.add_parser("rebalance", help="plan (and with --apply, run) moves that even out the shards")
+    rebalance.add_argument("--apply", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not shards.enabled:
+        print("Sharding is off: set SHARDS to a JSON object of shard name -> database URL", file=sys.stderr)
+        return 2
+    ensure_shard_schemas()
+
+    if args.command == "status":
+        loads, assigned = tenant_loads(), assignments()
+        tenants: Dict[str, int] = defaultdict(int)
+        for name in assigned.values():
+            tenants[name] += 1
+        print(f"{'location':<16}{'tenants':>8}{'orders':>10}")
+        for name in locations():
+            print(f"{name:<16}{tenants[name]:>8}{sum(loads[name].values()):>10}")
+        strays = [(c, name) for name, counts in loads.items() for c in counts
+                  if name != SHARED and assigned.get(c) != name]
+        for company_id, name in strays:
+            print(f"company {company_id} has orders left in {name} (assigned to {assigned.get(company_id)}); "
+                  f"finish with: move {company_id} {assigned.get(company_id)}")
+        return 0
+
+    if args.command == "move":
+        move_tenant(args.company_id, args.shard)
+        return 0
+
+    plan = plan_rebalance(tenant_loads(), assignments())
+    if not plan:
+        print("Shards are balanced")
+        return 0
+    for company_id, size, source, target in plan:
+        route = f"{source} -> {target}" if source != target else f"{SHARED} -> {target} (older orders)"
+        print(f"company {company_id}: {size} orders {route}")
+        if args.apply:
+            move_tenant(company_id, target)
+    if not args.apply:
+        print("Dry run; pass --apply to move")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
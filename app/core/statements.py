@@ -0,0 +1,36 @@
+"""
+Statements built once for the hot CRUD lookups.
+
+``db.query(User).filter(User.email == email).first()`` builds a Query,
+converts it to a ``select()`` and walks that to compute its compiled-cache
+key, all on every call: for a primary-key or unique-column lookup most of
+the time goes to Python before SQLite sees the statement. The statements
+here are built once per model and column set with bind parameters. A
+statement memoizes its cache key, so a call only binds new values and goes
+straight to the engine's compiled cache (hit rate on /metrics as
+``db_statement_cache_total``, see ``instrument_statement_cache``).
+
+Extra loader options or filters make a new statement, which is keyed
+again; those calls still skip the Query layer.
+"""
+from functools import lru_cache
+from typing import Tuple
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.sql import Select
+
+
+def _equals(model: type, columns: Tuple[str, ...]) -> list:
+    return [getattr(model, column) == bindparam(column) for column in columns]
+
+
+@lru_cache(maxsize=None)
+def lookup(model: type, columns: Tuple[str, ...] = ("id",)) -> Select:
+    """``SELECT <model> WHERE <column> = :<column> AND ... LIMIT 1``"""
+    return select(model).where(*_equals(model, columns)).limit(1)
+
+
+@lru_cache(maxsize=None)
+def page(model: type, columns: Tuple[str, ...] = ()) -> Select:
+    """``SELECT <model> WHERE <column> = :<column> ... LIMIT :limit OFFSET :skip`` (unordered, like get_multi)"""
+    return select(model).where(*_equals(model, columns)).offset(bindparam("skip")).limit(bindparam("limit"))
@@ -0,0 +1,238 @@
+"""
+Stock balances and reservations.
+
+``stock_balances`` holds the unreserved quantity per (product, warehouse).
+It is only ever changed with single conditional statements::
+
+    UPDATE stock_balances SET available = available - :qty
+    WHERE product_id = :p AND warehouse_id = (<best-stocked warehouse>) AND available >= :qty
+    RETURNING warehouse_id
+
+so checking and taking stock is one atomic step: no SELECT-then-UPDATE
+window, no row or table lock held across application code, and an order
+for one SKU never waits on another SKU's rows. Every successful decrement
+writes a ``stock_reservations`` row; deleting an order or releasing a hold
+(explicitly or when ``expires_at`` passes) adds the quantity back.
+
+Physical changes (receipts, adjustments) are ``stock_movements`` and move
+the balance in the same write unit. Products without any balance row are
+not stock-tracked and are never reserved.
+
+All functions here run inside a write unit (``write_queue.execute``).
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, or_, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core import events, metrics
+from app.core.config import get_settings
+from app.core.writer import write_queue
+from app.models.models import StockBalance, StockMovement, StockReservation, Warehouse
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+balances = StockBalance.__table__
+reservations = StockReservation.__table__
+
+STOCK_RESERVATIONS = metrics.registry.counter(
+    "stock_reservations_total", "Stock reservation attempts", ("outcome",))
+
+
+def tracked_products(wdb: Session, product_ids: Iterable[int]) -> set:
+    """Products that have at least one balance row"""
+    return set(wdb.execute(
+        select(balances.c.product_id).where(balances.c.product_id.in_(set(product_ids))).distinct()
+    ).scalars())
+
+
+def take(wdb: Session, product_id: int, quantity: int) -> Optional[int]:
+    """Atomically decrement the best-stocked warehouse holding ``quantity``; its id, or None"""
+    best = (
+        select(balances.c.warehouse_id)
+        .where(balances.c.product_id == product_id, balances.c.available >= quantity)
+        .order_by(balances.c.available.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return wdb.execute(
+        update(balances)
+        .where(balances.c.product_id == product_id,
+               balances.c.warehouse_id == best,
+               balances.c.available >= quantity)
+        .values(available=balances.c.available - quantity)
+        .returning(balances.c.warehouse_id)
+    ).scalar()
+
+
+def reserve_items(wdb: Session, items: Iterable[Tuple[int, int]], *, sales_order_id: Optional[int] = None,
+                  order_ref: Optional[int] = None,
+                  expires_at: Optional[datetime] = None) -> Tuple[List[int], List[int]]:
+    """Reserve (product_id, quantity) pairs; returns (reservation ids, products short of stock).
+
+    Untracked products are skipped. On shortage the caller should roll the
+    unit back; the decrements already made are part of it. An order kept in
+    a shard file is referenced by ``order_ref`` instead of ``sales_order_id``.
+    """
+    wanted: Dict[int, int] = defaultdict(int)
+    for product_id, quantity in items:
+        wanted[product_id] += quantity
+    tracked = tracked_products(wdb, wanted)
+
+    rows, short = [], []
+    for product_id in sorted(tracked):  # fixed order keeps concurrent units from interleaving differently
+        warehouse_id = take(wdb, product_id, wanted[product_id])
+        if warehouse_id is None:
+            short.append(product_id)
+            continue
+        rows.append({"product_id": product_id, "warehouse_id": warehouse_id, "quantity": wanted[product_id],
+                     "sales_order_id": sales_order_id, "order_ref": order_ref, "expires_at": expires_at,
+                     "created_at": datetime.utcnow()})
+    STOCK_RESERVATIONS.inc("short" if short else "reserved")
+    if short or not rows:
+        return [], short
+    ids = list(wdb.execute(insert(reservations).returning(reservations.c.id), rows).scalars())
+    return ids, short
+
+
+def release(wdb: Session, *criteria) -> int:
+    """Return the stock of the reservations matching ``criteria`` and delete them; how many were released"""
+    held = wdb.execute(
+        select(reservations.c.id, reservations.c.product_id, reservations.c.warehouse_id, reservations.c.quantity)
+        .where(*criteria)
+    ).all()
+    if not held:
+        return 0
+    back: Dict[Tuple[int, int], int] = defaultdict(int)
+    for row in held:
+        back[(row.product_id, row.warehouse_id)] += row.quantity
+    stmt = sqlite_insert(balances)
+    wdb.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[balances.c.product_id, balances.c.warehouse_id],
+            set_={"available": balances.c.available + stmt.excluded.available},
+        ),
+        [{"product_id": p, "warehouse_id": w, "available": q} for (p, w), q in back.items()],
+    )
+    wdb.execute(delete(reservations).where(reservations.c.id.in_([row.id for row in held])))
+    return len(held)
+
+
+def release_order(wdb: Session, sales_order_id: int) -> int:
+    return release(wdb, or_(reservations.c.sales_order_id == sales_order_id,
+                            reservations.c.order_ref == sales_order_id))
+
+
+def release_expired(wdb: Session) -> int:
+    return release(wdb, reservations.c.expires_at.isnot(None), reservations.c.expires_at <= datetime.utcnow())
+
+
+def apply_movement(wdb: Session, *, product_id: int, warehouse_id: int, change: int,
+                   reason: Optional[str] = None, occurred_at: Optional[datetime] = None) -> Optional[int]:
+    """Record a physical stock change and move the balance with it; None if it would go negative"""
+    if change < 0:
+        moved = wdb.execute(
+            update(balances)
+            .where(balances.c.product_id == product_id,
+                   balances.c.warehouse_id == warehouse_id,
+                   balances.c.available >= -change)
+            .values(available=balances.c.available + change)
+        ).rowcount
+        if not moved:
+            return None
+    else:
+        stmt = sqlite_insert(balances).values(product_id=product_id, warehouse_id=warehouse_id, available=change)
+        wdb.execute(stmt.on_conflict_do_update(
+            index_elements=[balances.c.product_id, balances.c.warehouse_id],
+            set_={"available": balances.c.available + stmt.excluded.available},
+        ))
+    movement = StockMovement(product_id=product_id, warehouse_id=warehouse_id, change=change, reason=reason)
+    if occurred_at is not None:
+        movement.occurred_at = occurred_at
+    wdb.add(movement)
+    wdb.flush()
+    return movement.id
+
+
+def publish_availability(db: Session, product_ids: Iterable[int]) -> None:
+    """After commit: one ``stock.available`` event per tracked product with its new total"""
+    levels = db.execute(
+        select(balances.c.product_id, func.sum(balances.c.available))
+        .where(balances.c.product_id.in_(set(product_ids)))
+        .group_by(balances.c.product_id)
+        .order_by(balances.c.product_id)
+    ).all()
+    for product_id, available in levels:
+        events.publish("stock", "available", {"product_id": product_id, "available": available}, db=db)
+
+
+def default_warehouse_id(wdb: Session) -> int:
+    """First warehouse, creating a "Main" one on an empty install"""
+    # Not the reference snapshot: it lags the writer's own uncommitted and just-deleted rows
+    warehouse_id = wdb.execute(select(Warehouse.id).order_by(Warehouse.id).limit(1)).scalar()
+    if warehouse_id is None:
+        warehouse = Warehouse(name="Main")
+        wdb.add(warehouse)
+        wdb.flush()
+        warehouse_id = warehouse.id
+    return warehouse_id
+
+
+def seed_stock_balances(conn: Connection) -> None:
+    """Migration: opening balances from the movement history"""
+    movements = StockMovement.__table__
+    conn.execute(
+        insert(balances).from_select(
+            ["product_id", "warehouse_id", "available"],
+            select(movements.c.product_id, movements.c.warehouse_id, func.max(func.sum(movements.c.change), 0))
+            .group_by(movements.c.product_id, movements.c.warehouse_id),
+        )
+    )
+
+
+def add_reservation_order_ref(conn: Connection) -> None:
+    """Migration: ``stock_reservations.order_ref`` for orders kept in shard files"""
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(stock_reservations)"))}
+    if "order_ref" not in columns:
+        conn.execute(text("ALTER TABLE stock_reservations ADD COLUMN order_ref INTEGER"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stock_reservations_order_ref "
+                      "ON stock_reservations (order_ref)"))
+
+
+# ---- expiry sweeper ----
+_sweep_task: Optional[asyncio.Task] = None
+
+async def _sweep_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            released = await write_queue.run(release_expired)
+            if released:
+                logger.info(f"Released {released} expired stock holds")
+        except Exception as e:
+            logger.warning(f"Releasing expired stock holds failed: {e}")
+
+def start_hold_sweeper() -> None:
+    """Release expired holds every STOCK_SWEEP_INTERVAL seconds"""
+    global _sweep_task
+    if settings.STOCK_SWEEP_INTERVAL <= 0:
+        return
+    if _sweep_task is None or _sweep_task.done():
+        _sweep_task = asyncio.create_task(_sweep_periodically(settings.STOCK_SWEEP_INTERVAL))
+
+async def stop_hold_sweeper() -> None:
+    global _sweep_task
+    if _sweep_task is not None:
+        _sweep_task.cancel()
+        try:
+            await _sweep_task
+        except asyncio.CancelledError:
+            pass
+        _sweep_task = None
@@ -0,0 +1,180 @@
+"""
+Single-writer queue with group commit.
+
+SQLite allows one writer at a time, so instead of every threadpool worker
+committing on its own connection (and racing for the lock), CRUD writes are
+submitted as units of work to one writer thread that owns the write
+connection. Units that queue up while a commit is in flight are coalesced:
+each runs inside its own SAVEPOINT and the whole group shares one COMMIT
+(one fsync). A failing unit only rolls back its savepoint.
+
+A unit is ``fn(db: Session) -> result``; it should return plain values
+(e.g. primary keys), never ORM objects bound to the writer's session.
+"""
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.core.database import WriteSessionLocal, shared_session
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+UnitOfWork = Callable[[Session], Any]
+
+WRITE_COMMITS = metrics.registry.counter("write_queue_commits_total", "Group commits issued by the writer")
+WRITE_UNITS = metrics.registry.counter(
+    "write_queue_units_total", "Units of work processed by the writer", ("outcome",))
+WRITE_BATCH_SIZE = metrics.registry.histogram(
+    "write_queue_batch_size", "Units of work per group commit", buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+WRITE_QUEUE_DEPTH = metrics.registry.gauge("write_queue_depth", "Units of work waiting for the writer")
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Dedicated writer thread that group-commits submitted units of work"""
+
+    def __init__(self, session_factory: Callable[[], Session], *, enabled: bool = True,
+                 max_batch: int = 64, window_ms: float = 0.0):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        metrics.registry.add_collector(lambda: WRITE_QUEUE_DEPTH.set(self._queue.qsize()))
+
+    # ---- lifecycle ----
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Finish everything already queued, then stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    # ---- submission ----
+    def submit(self, unit: UnitOfWork) -> Future:
+        """Queue ``unit``; the returned future resolves after its group commits"""
+        shared = shared_session.get()
+        if shared is not None:
+            # Inside an atomic batch, itself a unit on the writer thread: queueing would wait for it forever
+            future: Future = Future()
+            try:
+                with shared.begin_nested():
+                    future.set_result(unit(shared))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if self._thread is None:
+            self.start()
+        future = Future()
+        # Carry the caller's context so the SQL profiler attributes the statements
+        self._queue.put((unit, future, contextvars.copy_context()))
+        return future
+
+    async def run(self, unit: UnitOfWork) -> Any:
+        """Async callers: await the unit's individual result"""
+        return await asyncio.wrap_future(self.submit(unit))
+
+    def execute(self, db: Session, unit: Callable[[Session], T]) -> T:
+        """Run ``unit`` as one transaction: via the writer, or inline on ``db`` when disabled"""
+        if shared_session.get() is db:
+            # Atomic batch: only a savepoint here, the batch commits or rolls back everything
+            with db.begin_nested():
+                return unit(db)
+        if not self.enabled:
+            try:
+                result = unit(db)
+                db.commit()
+                return result
+            except Exception:
+                db.rollback()
+                raise
+        return self.submit(unit).result()
+
+    # ---- writer thread ----
+    def _run(self) -> None:
+        db = self.session_factory()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                batch = [item]
+                stop = self._fill_batch(batch)
+                self._commit_batch(db, batch)
+                if stop:
+                    return
+        finally:
+            db.close()
+
+    def _fill_batch(self, batch: List[Any]) -> bool:
+        """Drain whatever queued up meanwhile (waiting at most ``window``); True if asked to stop"""
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return False
+            if item is _STOP:
+                return True
+            batch.append(item)
+        return False
+
+    def _commit_batch(self, db: Session, batch: List[Tuple[UnitOfWork, Future, contextvars.Context]]) -> None:
+        outcomes: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        try:
+            for unit, future, context in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.begin_nested():
+                        result = context.run(unit, db)
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            db.commit()
+            WRITE_COMMITS.inc()
+            WRITE_BATCH_SIZE.observe(len(batch))
+        except Exception as e:
+            logger.error(f"Group commit of {len(outcomes)} units failed: {e}")
+            db.rollback()
+            outcomes = [(future, None, error or e) for future, _, error in outcomes]
+        finally:
+            db.close()
+
+        for future, result, error in outcomes:
+            if error is None:
+                WRITE_UNITS.inc("committed")
+                future.set_result(result)
+            else:
+                WRITE_UNITS.inc("failed")
+                future.set_exception(error)
+
+
+write_queue = WriteQueue(
+    WriteSessionLocal,
+    enabled=settings.WRITE_QUEUE_ENABLED,
+    max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+    window_ms=settings.WRITE_QUEUE_WINDOW_MS,
+)
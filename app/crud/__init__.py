@@ -3,4 +3,6 @@ from .products import product, category
 from .companies import company, address
 from .orders import sales_order
 from .employees import employee, attendance
-from .accounts import account, journal_entry
\ No newline at end of file
+from .accounts import account, journal_entry
+from .stock import stock_balance, stock_movement, stock_reservation
+from .jobs import job
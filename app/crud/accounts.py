@@ -1,5 +1,7 @@
 from typing import Any, Dict, Optional, Union, List
 from sqlalchemy.orm import Session
+from app.core.reference import reference
+from app.core.writer import write_queue
 from app.crud.base import CRUDBase
 from app.models.models import Account, JournalEntry, JournalEntryLine
 from app.schemas.schemas import JournalEntryCreate
@@ -8,29 +10,31 @@ class CRUDAccount(CRUDBase[Account, Any, Any]):
     def get_by_code(self, db: Session, *, code: str) -> Optional[Account]:
         return db.query(Account).filter(Account.code == code).first()
 
+    def get_code_map(self, db: Session) -> Dict[str, Optional[int]]:
+        """Every account code -> id, from the reference snapshot; None for codes shared by several accounts"""
+        return reference.current(db).accounts.key_map()
+
     def get_by_type(self, db: Session, *, account_type: str, skip: int = 0, limit: int = 100) -> List[Account]:
-        return db.query(Account).filter(Account.account_type == account_type).offset(skip).limit(limit).all()
+        return self.get_multi_by(db, account_type=account_type, skip=skip, limit=limit)
 
 account = CRUDAccount(Account)
 
 class CRUDJournalEntry(CRUDBase[JournalEntry, JournalEntryCreate, Any]):
     def create_with_lines(self, db: Session, *, obj_in: JournalEntryCreate) -> JournalEntry:
-        # Create the journal entry first
         entry_data = obj_in.dict(exclude={'lines'})
-        db_entry = JournalEntry(**entry_data)
-        db.add(db_entry)
-        db.flush()  # Flush to get the ID
-        
-        # Create journal entry lines
-        for line_data in obj_in.lines:
-            db_line = JournalEntryLine(
-                journal_entry_id=db_entry.id,
-                **line_data.dict()
-            )
-            db.add(db_line)
-        
-        db.commit()
-        db.refresh(db_entry)
-        return db_entry
+        lines_data = [line_data.dict() for line_data in obj_in.lines]
+
+        def unit(wdb: Session) -> int:
+            # Create the journal entry first
+            db_entry = JournalEntry(**entry_data)
+            wdb.add(db_entry)
+            wdb.flush()  # Flush to get the ID
+
+            # Create journal entry lines
+            for line_data in lines_data:
+                wdb.add(JournalEntryLine(journal_entry_id=db_entry.id, **line_data))
+            return db_entry.id
+
+        return self.get(db, id=write_queue.execute(db, unit))
 
 journal_entry = CRUDJournalEntry(JournalEntry)
\ No newline at end of file
@@ -1,35 +1,92 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from app.core import archive, statements
+from app.core.counts import count_rows
+from app.core.filters import FilterQuery, FilterSpec, merge_pages
+from app.core.writer import write_queue
 from app.models.models import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+class StillReferencedError(Exception):
+    """Raised by remove() when rows in other tables still point at the row (foreign keys are enforced)"""
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # Filters/sorts list endpoints may accept (see app.core.filters)
+    filter_spec: Optional[FilterSpec] = None
+    # Old rows may live in archive files (see app.core.archive); read with include_archived=True
+    archived = False
+
     def __init__(self, model: Type[ModelType]):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
         """
         self.model = model
 
-    def get(self, db: Session, id: Any) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+    def get(
+        self, db: Session, id: Any, *, options: Sequence[Any] = (), include_archived: bool = False
+    ) -> Optional[ModelType]:
+        stmt = statements.lookup(self.model)
+        if options:
+            stmt = stmt.options(*options)
+        obj = db.execute(stmt, {"id": id}).scalars().first()
+        if obj is None and include_archived and self.archived:
+            obj = archive.get_archived(db, self.model, id, options)
+        return obj
+
+    def get_by(self, db: Session, **criteria: Any) -> Optional[ModelType]:
+        """First row with every ``column=value`` (prebuilt statement per column set)"""
+        return db.execute(statements.lookup(self.model, tuple(sorted(criteria))), criteria).scalars().first()
 
     def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+        self, db: Session, *, skip: int = 0, limit: int = 100, options: Sequence[Any] = (),
+        filters: Optional[FilterQuery] = None, include_archived: bool = False
     ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        if include_archived and self.archived:
+            # Every source returns its first skip + limit rows; the page is cut from the merged rows
+            def fetch(session: Session) -> List[ModelType]:
+                return CRUDBase.get_multi(self, session, skip=0, limit=skip + limit, options=options, filters=filters)
+
+            pages = [fetch(db), *archive.on_archives(db, self.model, fetch)]
+            return merge_pages(pages, filters.order_by if filters is not None else [], skip, limit)
+        if not options and filters is None:
+            return db.execute(statements.page(self.model), {"skip": skip, "limit": limit}).scalars().all()
+        query = select(self.model).options(*options)
+        if filters is not None:
+            query = filters.apply(query)
+        return db.execute(query.offset(skip).limit(limit)).scalars().all()
+
+    def get_multi_by(
+        self, db: Session, *, skip: int = 0, limit: int = 100, options: Sequence[Any] = (), **criteria: Any
+    ) -> List[ModelType]:
+        """Rows with every ``column=value`` (prebuilt statement per column set)"""
+        stmt = statements.page(self.model, tuple(sorted(criteria)))
+        if options:
+            stmt = stmt.options(*options)
+        return db.execute(stmt, {**criteria, "skip": skip, "limit": limit}).scalars().all()
+
+    def count(self, db: Session, *, filters: Optional[FilterQuery] = None, include_archived: bool = False) -> int:
+        total = count_rows(db, self.model, filters)
+        if include_archived and self.archived:
+            total += archive.count_archived(db, self.model, filters)
+        return total
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+
+        def unit(wdb: Session) -> Any:
+            db_obj = self.model(**obj_in_data)
+            wdb.add(db_obj)
+            wdb.flush()
+            return db_obj.id
+
+        return self.get(db, id=write_queue.execute(db, unit))
 
     def update(
         self,
@@ -43,17 +100,28 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
-        db.commit()
+        changes = {field: update_data[field] for field in obj_data if field in update_data}
+        obj_id = db_obj.id
+
+        def unit(wdb: Session) -> None:
+            target = wdb.get(self.model, obj_id)
+            for field, value in changes.items():
+                setattr(target, field, value)
+
+        write_queue.execute(db, unit)
         db.refresh(db_obj)
         return db_obj
 
     def remove(self, db: Session, *, id: int) -> Optional[ModelType]:
         obj = db.get(self.model, id)
         if obj:
-            db.delete(obj)
-            db.commit()
+            def unit(wdb: Session) -> None:
+                target = wdb.get(self.model, id)
+                if target is not None:
+                    wdb.delete(target)
+
+            try:
+                write_queue.execute(db, unit)
+            except IntegrityError as e:
+                raise StillReferencedError(str(e.orig)) from e
         return obj
\ No newline at end of file
@@ -6,10 +6,10 @@ from app.schemas.schemas import CompanyCreate, CompanyRead
 
 class CRUDCompany(CRUDBase[Company, CompanyCreate, Any]):
     def get_by_name(self, db: Session, *, name: str) -> Optional[Company]:
-        return db.query(Company).filter(Company.name == name).first()
+        return self.get_by(db, name=name)
 
     def get_by_gstin(self, db: Session, *, gstin: str) -> Optional[Company]:
-        return db.query(Company).filter(Company.gstin == gstin).first()
+        return self.get_by(db, gstin=gstin)
 
 company = CRUDCompany(Company)
 
@@ -1,23 +1,47 @@
 from typing import Any, Dict, Optional, Union, List
 from sqlalchemy.orm import Session
+from app.core.filters import EQUAL, RANGE, FilterSpec
+from app.core.writer import write_queue
 from app.crud.base import CRUDBase
 from app.models.models import Employee, Attendance
-from app.schemas.schemas import EmployeeRead
+from app.schemas.schemas import AttendanceRecord, EmployeeRead
 
 class CRUDEmployee(CRUDBase[Employee, Any, Any]):
+    filter_spec = FilterSpec(
+        Employee,
+        filters={"joined_at": RANGE, "first_name": ("eq",), "last_name": ("eq",)},
+        sorts=("joined_at", "first_name"),
+    )
+
     def get_by_emp_code(self, db: Session, *, emp_code: str) -> Optional[Employee]:
-        return db.query(Employee).filter(Employee.emp_code == emp_code).first()
+        return self.get_by(db, emp_code=emp_code)
 
     def get_by_email(self, db: Session, *, email: str) -> Optional[Employee]:
-        return db.query(Employee).filter(Employee.email == email).first()
+        return self.get_by(db, email=email)
 
 employee = CRUDEmployee(Employee)
 
-class CRUDAttendance(CRUDBase[Attendance, Any, Any]):
+class CRUDAttendance(CRUDBase[Attendance, AttendanceRecord, Any]):
+    filter_spec = FilterSpec(
+        Attendance,
+        filters={"employee_id": EQUAL, "date": RANGE, "check_in": RANGE},
+        sorts=("date", "check_in"),
+    )
+    archived = True
+
+    def create(self, db: Session, *, obj_in: AttendanceRecord) -> Attendance:
+        # model_dump keeps date/datetime objects, which the Date/DateTime columns require
+        data = obj_in.model_dump()
+
+        def unit(wdb: Session) -> int:
+            record = Attendance(**data)
+            wdb.add(record)
+            wdb.flush()
+            return record.id
+
+        return self.get(db, id=write_queue.execute(db, unit))
+
     def get_by_employee_date(self, db: Session, *, employee_id: int, date: str) -> Optional[Attendance]:
-        return db.query(Attendance).filter(
-            Attendance.employee_id == employee_id,
-            Attendance.date == date
-        ).first()
+        return self.get_by(db, employee_id=employee_id, date=date)
 
 attendance = CRUDAttendance(Attendance)
\ No newline at end of file
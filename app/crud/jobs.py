@@ -0,0 +1,39 @@
+from typing import Any, Optional
+from sqlalchemy.orm import Session
+from app.core.filters import EQUAL, FilterSpec
+from app.core.jobs import JOB_TYPES, job_runner, request_cancel, validate_params
+from app.core.writer import write_queue
+from app.crud.base import CRUDBase
+from app.models.models import Job
+from app.schemas.schemas import JobCreate
+
+class CRUDJob(CRUDBase[Job, JobCreate, Any]):
+    filter_spec = FilterSpec(
+        Job,
+        filters={"status": EQUAL, "type": EQUAL},
+        sorts=("created_at",),
+    )
+
+    def create(self, db: Session, *, obj_in: JobCreate) -> Job:
+        """Queue a job (raises JobError for an unknown type or invalid params)"""
+        params = validate_params(obj_in.type, obj_in.params)
+        max_attempts = JOB_TYPES[obj_in.type].max_attempts
+
+        def unit(wdb: Session) -> int:
+            job = Job(type=obj_in.type, params=params, max_attempts=max_attempts)
+            wdb.add(job)
+            wdb.flush()
+            return job.id
+
+        job = self.get(db, id=write_queue.execute(db, unit))
+        job_runner.wake()
+        return job
+
+    def cancel(self, db: Session, *, id: int) -> Optional[Job]:
+        """Cancel a queued job or ask a running one to stop; None if there is no such job"""
+        if write_queue.execute(db, lambda wdb: request_cancel(wdb, id)):
+            job_runner.wake()
+        db.expire_all()
+        return self.get(db, id=id)
+
+job = CRUDJob(Job)
@@ -1,30 +1,246 @@
-from typing import Any, Dict, Optional, Union, List
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Union, List
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session, selectinload, undefer
+from app.core import archive, events
+from app.core.config import get_settings
+from app.core.counts import count_rows
+from app.core.database import SHARED, shared_session, shards
+from app.core.filters import EQUAL, RANGE, FilterQuery, FilterSpec, merge_pages
+from app.core.idempotency import IdempotencyClaim
+from app.core.sharding import assign_shard, company_locations, fan_out, locations, next_id
+from app.core.stock import publish_availability, release_order, reservations, reserve_items
+from app.core.writer import write_queue
 from app.crud.base import CRUDBase
-from app.models.models import SalesOrder, SalesOrderItem
+from app.models.models import Company, Product, SalesOrder, SalesOrderItem
 from app.schemas.schemas import SalesOrderCreate
 
+settings = get_settings()
+
+class OrderValidationError(ValueError):
+    """Order references missing/inactive products, an unknown company or stock it cannot get"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(errors)
+        self.errors = errors
+
+def _catalog(wdb: Session, product_ids: Iterable[int], company_id: int) -> Dict[int, Decimal]:
+    """Catalog price per product; raises OrderValidationError for missing/inactive products or company"""
+    # Validate every product and read its catalog price in one IN (...) query
+    product_ids = set(product_ids)
+    catalog = dict(
+        (row.id, row) for row in wdb.execute(
+            select(Product.id, Product.unit_price, Product.is_active).where(Product.id.in_(product_ids)))
+    )
+    errors = [{"product_id": product_id, "error": "not found"}
+              for product_id in sorted(product_ids - catalog.keys())]
+    errors += [{"product_id": row.id, "error": "inactive"}
+               for row in catalog.values() if row.is_active is False]
+    if wdb.get(Company, company_id) is None:
+        errors.append({"company_id": company_id, "error": "not found"})
+    if errors:
+        raise OrderValidationError(errors)
+    return {product_id: row.unit_price for product_id, row in catalog.items()}
+
+def _insert_order(wdb: Session, order_data: Dict[str, Any], items_data: List[Dict[str, Any]],
+                  prices: Dict[int, Decimal], order_id: Optional[int] = None) -> int:
+    # Create the order first
+    db_order = SalesOrder(**order_data, id=order_id)
+    wdb.add(db_order)
+    wdb.flush()  # Flush to get the ID
+
+    # All items in one executemany INSERT, priced from the catalog
+    wdb.execute(insert(SalesOrderItem), [
+        dict(item_data, sales_order_id=db_order.id, unit_price=prices[item_data['product_id']])
+        for item_data in items_data
+    ])
+    return db_order.id
+
+def _delete_order(wdb: Session, order_id: int) -> None:
+    target = wdb.get(SalesOrder, order_id)
+    if target is not None:
+        wdb.delete(target)
+
+def _shortage(short: List[int]) -> OrderValidationError:
+    return OrderValidationError([{"product_id": product_id, "error": "insufficient stock"} for product_id in short])
+
 class CRUDSalesOrder(CRUDBase[SalesOrder, SalesOrderCreate, Any]):
+    filter_spec = FilterSpec(
+        SalesOrder,
+        filters={"company_id": EQUAL, "order_date": RANGE, "due_date": RANGE},
+        sorts=("order_date", "due_date"),
+    )
+    archived = True
+
+    # ---- shard routing (see app.core.sharding); one location when sharding is off ----
+    def _locations(self, db: Session, filters: Optional[FilterQuery] = None) -> List[str]:
+        if not shards.enabled:
+            return [SHARED]
+        company_id = (filters.equal if filters is not None else {}).get("company_id")
+        return locations() if company_id is None else company_locations(db, company_id)
+
+    def _locate(self, db: Session, id: int, options: Sequence[Any] = ()) -> Tuple[Optional[str], Optional[SalesOrder]]:
+        """Location and row of an order (a point lookup on every location at once)"""
+        found = fan_out(db, locations(), lambda session: super(CRUDSalesOrder, self).get(session, id, options=options))
+        return next(((name, order) for name, order in found.items() if order is not None), (None, None))
+
+    def get(
+        self, db: Session, id: Any, *, options: Sequence[Any] = (), include_archived: bool = False
+    ) -> Optional[SalesOrder]:
+        if shards.enabled:
+            # Shard rows come back detached: load what serialization needs up front
+            order = self._locate(db, id, options or (selectinload(SalesOrder.items),))[1]
+        else:
+            order = super().get(db, id, options=options)
+        if order is None and include_archived:
+            # So do archived ones
+            order = archive.get_archived(db, SalesOrder, id, options or (selectinload(SalesOrder.items),))
+        return order
+
+    def get_multi(
+        self, db: Session, *, skip: int = 0, limit: int = 100, options: Sequence[Any] = (),
+        filters: Optional[FilterQuery] = None, include_archived: bool = False
+    ) -> List[SalesOrder]:
+        # Items are serialized (and summed into total_amount) unless a sparse fieldset says otherwise
+        options = options or (selectinload(SalesOrder.items),)
+        names = self._locations(db, filters)
+        if names == [SHARED] and not include_archived:
+            return super().get_multi(db, skip=skip, limit=limit, options=options, filters=filters)
+        order_by = filters.order_by if filters is not None else []
+        # Every location and archive file returns its first skip + limit rows; the page is cut from the merged rows
+        options = (*options, *(undefer(getattr(SalesOrder, clause.element.key)) for clause in order_by))
+
+        def fetch(session: Session) -> List[SalesOrder]:
+            return CRUDBase.get_multi(self, session, skip=0, limit=skip + limit, options=options, filters=filters)
+
+        pages = list(fan_out(db, names, fetch).values())
+        if include_archived:
+            pages += archive.on_archives(db, SalesOrder, fetch)
+        return merge_pages(pages, order_by, skip, limit)
+
     def get_by_company(self, db: Session, *, company_id: int, skip: int = 0, limit: int = 100) -> List[SalesOrder]:
-        return db.query(SalesOrder).filter(SalesOrder.company_id == company_id).offset(skip).limit(limit).all()
+        if not shards.enabled:
+            return self.get_multi_by(db, company_id=company_id, skip=skip, limit=limit)
+        filters = FilterQuery([SalesOrder.company_id == company_id], equal={"company_id": company_id})
+        return self.get_multi(db, skip=skip, limit=limit, filters=filters)
+
+    def count(self, db: Session, *, filters: Optional[FilterQuery] = None, include_archived: bool = False) -> int:
+        names = self._locations(db, filters)
+        if names == [SHARED]:
+            return super().count(db, filters=filters, include_archived=include_archived)
+        # Each shard keeps its own row counters
+        total = sum(fan_out(db, names, lambda session: count_rows(session, SalesOrder, filters)).values())
+        if include_archived:
+            total += archive.count_archived(db, SalesOrder, filters)
+        return total
 
-    def create_with_items(self, db: Session, *, obj_in: SalesOrderCreate) -> SalesOrder:
-        # Create the order first
+    # ---- writes ----
+    def create_with_items(
+        self, db: Session, *, obj_in: SalesOrderCreate, idempotency: Optional[IdempotencyClaim] = None
+    ) -> SalesOrder:
         order_data = obj_in.dict(exclude={'items'})
-        db_order = SalesOrder(**order_data)
-        db.add(db_order)
-        db.flush()  # Flush to get the ID
-        
-        # Create order items
-        for item_data in obj_in.items:
-            db_item = SalesOrderItem(
-                sales_order_id=db_order.id,
-                **item_data.dict()
-            )
-            db.add(db_item)
-        
-        db.commit()
-        db.refresh(db_order)
-        return db_order
-
-sales_order = CRUDSalesOrder(SalesOrder)
\ No newline at end of file
+        items_data = [item_data.dict(exclude={'unit_price'}) for item_data in obj_in.items]
+        product_ids = {item_data['product_id'] for item_data in items_data}
+
+        if shards.enabled:
+            order_id = self._create_sharded(db, order_data, items_data, product_ids, idempotency)
+        else:
+            def unit(wdb: Session) -> int:
+                prices = _catalog(wdb, product_ids, order_data['company_id'])
+                order_id = _insert_order(wdb, order_data, items_data, prices)
+                # Hold the stock; a shortage rolls the whole unit (order and earlier decrements) back
+                _, short = reserve_items(
+                    wdb, [(item_data['product_id'], item_data['quantity']) for item_data in items_data],
+                    sales_order_id=order_id)
+                if short:
+                    raise _shortage(short)
+                if idempotency is not None:
+                    idempotency.save(wdb, order_id)
+                return order_id
+
+            order_id = write_queue.execute(db, unit)
+
+        order = self.get(db, id=order_id)
+        events.publish("orders", "created", {
+            "id": order.id, "company_id": order.company_id, "order_date": order.order_date,
+            "total_amount": order.total_amount,
+            "items": [{"product_id": item.product_id, "quantity": item.quantity} for item in order.items],
+        }, db=db)
+        publish_availability(db, product_ids)
+        return order
+
+    def _create_sharded(
+        self, db: Session, order_data: Dict[str, Any], items_data: List[Dict[str, Any]], product_ids: set,
+        idempotency: Optional[IdempotencyClaim]
+    ) -> int:
+        """Hold stock in the shared file, insert in the company's shard, confirm the hold"""
+        if shared_session.get() is db:
+            raise OrderValidationError([{"error": "orders cannot be created in an atomic batch while sharding is on"}])
+        wanted = [(item_data['product_id'], item_data['quantity']) for item_data in items_data]
+        expires_at = datetime.utcnow() + timedelta(seconds=settings.SHARD_PENDING_TTL_SECONDS)
+
+        def prepare(wdb: Session) -> Tuple[int, str, Dict[int, Decimal]]:
+            prices = _catalog(wdb, product_ids, order_data['company_id'])
+            order_id = next_id(wdb, SalesOrder)
+            shard = assign_shard(wdb, order_data['company_id'])
+            if shard == SHARED:  # Company moved back to the shared file: one unit, as without sharding
+                _insert_order(wdb, order_data, items_data, prices, order_id)
+                _, short = reserve_items(wdb, wanted, sales_order_id=order_id)
+            else:
+                # Expires unless confirmed, so a crash before the confirmation gives the stock back
+                _, short = reserve_items(wdb, wanted, order_ref=order_id, expires_at=expires_at)
+            if short:
+                raise _shortage(short)
+            if shard == SHARED and idempotency is not None:
+                idempotency.save(wdb, order_id)
+            return order_id, shard, prices
+
+        order_id, shard, prices = write_queue.execute(db, prepare)
+        if shard == SHARED:
+            return order_id
+
+        def confirm(wdb: Session) -> None:
+            wdb.execute(update(reservations).where(reservations.c.order_ref == order_id).values(expires_at=None))
+            if idempotency is not None:
+                idempotency.save(wdb, order_id)
+
+        inserted = False
+        try:
+            shards.writer(shard).submit(
+                lambda sdb: _insert_order(sdb, order_data, items_data, prices, order_id)).result()
+            inserted = True
+            write_queue.execute(db, confirm)
+        except Exception:
+            # Compensate: drop the shard row (e.g. a concurrent retry won the Idempotency-Key) and the hold
+            if inserted:
+                shards.writer(shard).submit(lambda sdb: _delete_order(sdb, order_id)).result()
+            write_queue.execute(db, lambda wdb: release_order(wdb, order_id))
+            raise
+        return order_id
+
+    def remove(self, db: Session, *, id: int) -> Optional[SalesOrder]:
+        if shards.enabled:
+            location, obj = self._locate(db, id, (selectinload(SalesOrder.items),))
+        else:
+            location, obj = SHARED, db.get(SalesOrder, id)
+        if obj:
+            product_ids = {item.product_id for item in obj.items}
+
+            if location == SHARED:
+                def unit(wdb: Session) -> None:
+                    release_order(wdb, id)
+                    _delete_order(wdb, id)
+
+                write_queue.execute(db, unit)
+            else:
+                if shared_session.get() is db:
+                    raise OrderValidationError(
+                        [{"error": "orders cannot be deleted in an atomic batch while sharding is on"}])
+                shards.writer(location).submit(lambda sdb: _delete_order(sdb, id)).result()
+                write_queue.execute(db, lambda wdb: release_order(wdb, id))
+            events.publish("orders", "deleted", {"id": id, "company_id": obj.company_id}, db=db)
+            publish_availability(db, product_ids)
+        return obj
+
+sales_order = CRUDSalesOrder(SalesOrder)
@@ -1,18 +1,62 @@
 from typing import Any, Dict, Optional, Union, List
-from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session, undefer
+from app.core import events
+from app.core.filters import EQUAL, RANGE, FilterSpec
+from app.core.stock import apply_movement, default_warehouse_id, publish_availability
+from app.core.writer import write_queue
 from app.crud.base import CRUDBase
 from app.models.models import Product, Category
 from app.schemas.schemas import ProductCreate, ProductUpdate
 
 class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
+    filter_spec = FilterSpec(
+        Product,
+        filters={"unit_price": RANGE, "cost_price": RANGE, "is_active": ("eq",),
+                 "category_id": EQUAL, "name": ("eq",)},
+        sorts=("unit_price", "cost_price", "name"),
+    )
+    # Loader options for reads answered with ProductRead (available_stock is deferred)
+    read_options = (undefer(Product.available_stock),)
+
+    def create(self, db: Session, *, obj_in: ProductCreate) -> Product:
+        obj_in_data = jsonable_encoder(obj_in, exclude={'initial_stock'})
+        initial_stock = obj_in.initial_stock or 0
+
+        def unit(wdb: Session) -> int:
+            db_obj = Product(**obj_in_data)
+            wdb.add(db_obj)
+            wdb.flush()
+            if initial_stock > 0:
+                # Opening balance goes to the default warehouse as a regular movement
+                apply_movement(wdb, product_id=db_obj.id, warehouse_id=default_warehouse_id(wdb),
+                               change=initial_stock, reason="initial stock")
+            return db_obj.id
+
+        db_obj = self.get(db, id=write_queue.execute(db, unit), options=self.read_options)
+        if initial_stock > 0:
+            publish_availability(db, [db_obj.id])
+        return db_obj
+
+    def update(
+        self, db: Session, *, db_obj: Product, obj_in: Union[ProductUpdate, Dict[str, Any]]
+    ) -> Product:
+        previous_price = db_obj.unit_price
+        db_obj = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        if db_obj.unit_price != previous_price:
+            events.publish("products", "price_changed", {
+                "id": db_obj.id, "sku": db_obj.sku, "unit_price": db_obj.unit_price, "previous": previous_price,
+            }, db=db)
+        return db_obj
+
     def get_by_sku(self, db: Session, *, sku: str) -> Optional[Product]:
-        return db.query(Product).filter(Product.sku == sku).first()
+        return self.get_by(db, sku=sku)
 
     def get_by_category(self, db: Session, *, category_id: int, skip: int = 0, limit: int = 100) -> List[Product]:
-        return db.query(Product).filter(Product.category_id == category_id).offset(skip).limit(limit).all()
+        return self.get_multi_by(db, category_id=category_id, skip=skip, limit=limit, options=self.read_options)
 
     def get_active_products(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[Product]:
-        return db.query(Product).filter(Product.is_active == True).offset(skip).limit(limit).all()
+        return self.get_multi_by(db, is_active=True, skip=skip, limit=limit)
 
 product = CRUDProduct(Product)
 
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+from app.core import events
+from app.core.config import get_settings
+from app.core.archive import OPENING_REASON
+from app.core.filters import EQUAL, RANGE, FilterQuery, FilterSpec
+from app.core.reference import reference
+from app.core.stock import apply_movement, publish_availability, release, reserve_items, reservations
+from app.core.writer import write_queue
+from app.crud.base import CRUDBase
+from app.models.models import Product, StockBalance, StockMovement, StockReservation
+from app.schemas.schemas import StockHoldCreate, StockMovementBase
+
+settings = get_settings()
+
+class StockError(ValueError):
+    """Stock change that the balances cannot cover"""
+
+class CRUDStockBalance(CRUDBase[StockBalance, Any, Any]):
+    filter_spec = FilterSpec(
+        StockBalance,
+        filters={"product_id": EQUAL, "warehouse_id": EQUAL},
+    )
+
+stock_balance = CRUDStockBalance(StockBalance)
+
+class CRUDStockMovement(CRUDBase[StockMovement, StockMovementBase, Any]):
+    filter_spec = FilterSpec(
+        StockMovement,
+        filters={"product_id": EQUAL, "warehouse_id": EQUAL, "occurred_at": RANGE},
+        sorts=("occurred_at",),
+    )
+    archived = True
+
+    @staticmethod
+    def _without_openings(filters: Optional[FilterQuery]) -> FilterQuery:
+        """With the archived movements listed, their opening balance movements would count them twice"""
+        filters = filters or FilterQuery()
+        return FilterQuery([*filters.clauses, StockMovement.reason.is_distinct_from(OPENING_REASON)],
+                           order_by=filters.order_by, equal=filters.equal)
+
+    def get_multi(
+        self, db: Session, *, skip: int = 0, limit: int = 100, options: Sequence[Any] = (),
+        filters: Optional[FilterQuery] = None, include_archived: bool = False
+    ) -> List[StockMovement]:
+        if include_archived:
+            filters = self._without_openings(filters)
+        return super().get_multi(db, skip=skip, limit=limit, options=options, filters=filters,
+                                 include_archived=include_archived)
+
+    def count(self, db: Session, *, filters: Optional[FilterQuery] = None, include_archived: bool = False) -> int:
+        if include_archived:
+            filters = self._without_openings(filters)
+        return super().count(db, filters=filters, include_archived=include_archived)
+
+    def create(self, db: Session, *, obj_in: StockMovementBase) -> StockMovement:
+        data = obj_in.model_dump()
+        if reference.warehouse(data["warehouse_id"], db=db) is None:
+            raise StockError(f"Warehouse {data['warehouse_id']} does not exist")
+        if db.scalar(select(Product.id).where(Product.id == data["product_id"])) is None:
+            raise StockError(f"Product {data['product_id']} does not exist")
+
+        def unit(wdb: Session) -> int:
+            movement_id = apply_movement(wdb, **data)
+            if movement_id is None:
+                raise StockError(f"Fewer than {-data['change']} units of product {data['product_id']} "
+                                 f"are available in warehouse {data['warehouse_id']}")
+            return movement_id
+
+        movement = self.get(db, id=write_queue.execute(db, unit))
+        events.publish("stock", "movement", {
+            "id": movement.id, "product_id": movement.product_id, "warehouse_id": movement.warehouse_id,
+            "change": movement.change, "reason": movement.reason, "occurred_at": movement.occurred_at,
+        }, db=db)
+        publish_availability(db, [movement.product_id])
+        return movement
+
+stock_movement = CRUDStockMovement(StockMovement)
+
+# Holds not tied to an order, built once (see app.core.statements)
+STANDALONE_HOLDS = (
+    select(StockReservation)
+    .where(StockReservation.product_id == bindparam("product_id"), StockReservation.sales_order_id.is_(None),
+           StockReservation.order_ref.is_(None))
+    .offset(bindparam("skip")).limit(bindparam("limit"))
+)
+
+class CRUDStockReservation(CRUDBase[StockReservation, StockHoldCreate, Any]):
+    def hold(self, db: Session, *, obj_in: StockHoldCreate) -> StockReservation:
+        """Standalone hold that is released automatically when it expires"""
+        ttl = obj_in.ttl_seconds or settings.STOCK_HOLD_TTL_SECONDS
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+
+        def unit(wdb: Session) -> int:
+            ids, short = reserve_items(wdb, [(obj_in.product_id, obj_in.quantity)], expires_at=expires_at)
+            if short:
+                raise StockError(f"Insufficient stock for product {obj_in.product_id}")
+            if not ids:
+                raise StockError(f"Product {obj_in.product_id} is not stock-tracked")
+            return ids[0]
+
+        hold = self.get(db, id=write_queue.execute(db, unit))
+        publish_availability(db, [hold.product_id])
+        return hold
+
+    def get_holds(self, db: Session, *, product_id: int, skip: int = 0, limit: int = 100) -> List[StockReservation]:
+        return db.execute(STANDALONE_HOLDS, {"product_id": product_id, "skip": skip, "limit": limit}).scalars().all()
+
+    def release_hold(self, db: Session, *, id: int) -> bool:
+        """Give a standalone hold's stock back; False if there is no such hold"""
+        hold = db.get(StockReservation, id)
+        released = bool(write_queue.execute(db, lambda wdb: release(
+            wdb, reservations.c.id == id, reservations.c.sales_order_id.is_(None),
+            reservations.c.order_ref.is_(None))))
+        if released:
+            publish_availability(db, [hold.product_id])
+        return released
+
+stock_reservation = CRUDStockReservation(StockReservation)
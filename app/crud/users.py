@@ -1,13 +1,21 @@
 from typing import Any, Dict, Optional, Union
 from sqlalchemy.orm import Session
+from app.core.filters import RANGE, FilterSpec
+from app.core.writer import write_queue
 from app.crud.base import CRUDBase
 from app.models.models import User
 from app.schemas.schemas import UserCreate, UserUpdate
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    filter_spec = FilterSpec(
+        User,
+        filters={"is_active": ("eq",), "created_at": RANGE},
+        sorts=("created_at",),
+    )
+
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
-        return db.query(User).filter(User.email == email).first()
+        return self.get_by(db, email=email)
 
     def create(self, db: Session, *, obj_in: Union[UserCreate, Dict[str, Any]]) -> User:
         if isinstance(obj_in, dict):
@@ -15,11 +23,13 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         else:
             create_data = obj_in.model_dump()
 
-        db_obj = User(**create_data)
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        def unit(wdb: Session) -> int:
+            db_obj = User(**create_data)
+            wdb.add(db_obj)
+            wdb.flush()
+            return db_obj.id
+
+        return self.get(db, id=write_queue.execute(db, unit))
 
     def update(
         self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
@@ -1,12 +1,19 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy import text
 from app.api.v1.api import api_router
 from app.core.config import get_settings
-from app.core.database import engine, async_engine
-from app.models.models import Base
+from app.core.database import engine, async_engine, shards, start_optimize_scheduler, stop_optimize_scheduler
+from app.core import metrics
+from app.core.counts import start_count_verifier, stop_count_verifier
+from app.core.events import broker
+from app.core.jobs import start_job_runner, stop_job_runner
+from app.core.stock import start_hold_sweeper, stop_hold_sweeper
+from app.core.openapi import install_cached_openapi
+from app.core.schema import ensure_schema
+from app.core.sharding import ensure_shard_schemas
+from app.core.writer import write_queue
 from app.core.middleware import (
     add_cors_middleware, 
     add_compression_middleware, 
@@ -14,7 +21,6 @@ from app.core.middleware import (
     limiter,
     rate_limit_handler
 )
-from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 import asyncio
 import logging
@@ -29,16 +35,13 @@ logger = logging.getLogger(__name__)
 # Get settings
 settings = get_settings()
 
-# Create database tables (sync for initial setup)
-Base.metadata.create_all(bind=engine)
-
 # Async database initialization
 async def init_async_db():
-    """Initialize async database"""
+    """Check the schema version; create/migrate only when the database is behind"""
     try:
         async with async_engine.begin() as conn:
-            # Create tables if they don't exist
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(ensure_schema)
+        await asyncio.to_thread(ensure_shard_schemas)
         logger.info("Async database initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize async database: {e}")
@@ -70,18 +73,35 @@ app.add_exception_handler(RateLimitExceeded, rate_limit_handler)
 # Include routers
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# Build the OpenAPI document once (or load the prebuilt one) instead of per process/request
+install_cached_openapi(app, settings.OPENAPI_CACHE_PATH)
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
     logger.info(f"Starting {settings.PROJECT_NAME} v{settings.VERSION}")
     await init_async_db()
+    metrics.start_samplers()
+    start_optimize_scheduler()
+    write_queue.start()
+    start_count_verifier()
+    start_hold_sweeper()
+    start_job_runner()
     logger.info("Application startup complete")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down application")
+    broker.close()
+    await stop_count_verifier()
+    await stop_hold_sweeper()
+    await stop_job_runner()
+    await asyncio.to_thread(write_queue.stop)
+    await asyncio.to_thread(shards.stop_writers)
+    await metrics.stop_samplers()
+    await stop_optimize_scheduler()
     await async_engine.dispose()
     logger.info("Application shutdown complete")
 
@@ -131,12 +151,7 @@ async def health_check(request: Request):
             }
         )
 
-@app.get("/metrics")
+@app.get("/metrics", response_class=PlainTextResponse)
 async def get_metrics(request: Request):
-    """Basic performance metrics"""
-    return {
-        "total_requests": getattr(app.state, 'total_requests', 0),
-        "active_connections": getattr(app.state, 'active_connections', 0),
-        "cache_hits": getattr(app.state, 'cache_hits', 0),
-        "database_queries": getattr(app.state, 'db_queries', 0)
-    }
\ No newline at end of file
+    """Prometheus metrics, aggregated across workers when METRICS_MULTIPROC_DIR is set"""
+    return PlainTextResponse(metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
@@ -1,9 +1,11 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Numeric, Text, Table, Index
+    Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Numeric, Text, Table, Index,
+    CheckConstraint, func, select
 )
 from sqlalchemy.ext.asyncio import AsyncAttrs
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, column_property, object_session
 from datetime import datetime
+from decimal import Decimal
 
 Base = declarative_base(cls=AsyncAttrs)
 
@@ -23,9 +25,9 @@ user_role = Table(
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
-    full_name = Column(String(255), index=True)  # Index for search
+    full_name = Column(String(255))
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True, index=True)  # Index for filtering
     created_at = Column(DateTime, default=datetime.utcnow, index=True)  # Index for sorting
@@ -33,7 +35,6 @@ class User(Base):
     roles = relationship("Role", secondary=user_role, back_populates="users")
 
     __table_args__ = (
-        Index('idx_user_email_active', 'email', 'is_active'),  # Composite index
         Index('idx_user_created_active', 'created_at', 'is_active'),
     )
 
@@ -59,32 +60,23 @@ class Address(Base):
     id = Column(Integer, primary_key=True)
     line1 = Column(String(255), nullable=False)
     line2 = Column(String(255))
-    city = Column(String(100), index=True)  # Index for city searches
-    state = Column(String(100), index=True)  # Index for state searches
-    postal_code = Column(String(32), index=True)  # Index for postal code searches
-    country = Column(String(100), default="India", index=True)
-
-    __table_args__ = (
-        Index('idx_address_city_state', 'city', 'state'),
-        Index('idx_address_postal_country', 'postal_code', 'country'),
-    )
+    city = Column(String(100))
+    state = Column(String(100))
+    postal_code = Column(String(32))
+    country = Column(String(100), default="India")
 
 class Company(Base):
     __tablename__ = "companies"
     id = Column(Integer, primary_key=True)
-    name = Column(String(255), nullable=False, index=True)  # Index for company search
+    name = Column(String(255), nullable=False)
     gstin = Column(String(32), unique=True, index=True)  # Index for GSTIN lookup
-    contact_email = Column(String(255), index=True)
-    contact_phone = Column(String(50), index=True)
+    contact_email = Column(String(255))
+    contact_phone = Column(String(50))
     address_id = Column(Integer, ForeignKey("addresses.id"), index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
     address = relationship("Address")
 
-    __table_args__ = (
-        Index('idx_company_name_active', 'name', 'created_at'),
-    )
-
 class Category(Base):
     __tablename__ = "categories"
     id = Column(Integer, primary_key=True)
@@ -106,6 +98,12 @@ class Product(Base):
 
     category = relationship("Category")
 
+    @property
+    def category_ref(self):
+        """Category from the in-memory reference snapshot (no query, see app.core.reference)"""
+        from app.core.reference import reference
+        return reference.category(self.category_id, db=object_session(self))
+
     __table_args__ = (
         Index('idx_product_name_active', 'name', 'is_active'),
         Index('idx_product_category_active', 'category_id', 'is_active'),
@@ -123,7 +121,7 @@ class StockMovement(Base):
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False, index=True)
-    change = Column(Integer, nullable=False, index=True)
+    change = Column(Integer, nullable=False)
     reason = Column(String(255))
     occurred_at = Column(DateTime, default=datetime.utcnow, index=True)
 
@@ -136,17 +134,55 @@ class StockMovement(Base):
         Index('idx_stock_product_warehouse', 'product_id', 'warehouse_id'),
     )
 
+class StockBalance(Base):
+    """Unreserved on-hand quantity per product and warehouse, changed only by conditional UPDATEs"""
+    __tablename__ = "stock_balances"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), primary_key=True)
+    available = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        CheckConstraint('available >= 0', name='ck_stock_balance_available'),
+    )
+
+class StockReservation(Base):
+    """Stock held for an order (until it is deleted) or a standalone hold (until expires_at)"""
+    __tablename__ = "stock_reservations"
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False)
+    sales_order_id = Column(Integer, ForeignKey("sales_orders.id"), index=True)
+    order_ref = Column(Integer, index=True)  # Order kept in a shard file (no foreign key across files)
+    quantity = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)  # NULL = held until released
+
+# Sum of the balance rows. Deferred: only queries whose response shows it load it, with
+# undefer (crud.product.read_options) or a sparse ?fields= selection naming it
+Product.available_stock = column_property(
+    select(func.coalesce(func.sum(StockBalance.available), 0))
+    .where(StockBalance.product_id == Product.id)
+    .correlate_except(StockBalance)
+    .scalar_subquery(),
+    deferred=True,
+)
+
 class SalesOrder(Base):
     __tablename__ = "sales_orders"
     id = Column(Integer, primary_key=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
     order_date = Column(Date, nullable=False, index=True)
-    due_date = Column(Date, index=True)
+    due_date = Column(Date)
     notes = Column(Text)
 
     company = relationship("Company")
     items = relationship("SalesOrderItem", cascade="all, delete-orphan")
 
+    @property
+    def total_amount(self) -> Decimal:
+        """Order total derived from its items"""
+        return sum((item.quantity * item.unit_price for item in self.items), Decimal("0"))
+
     __table_args__ = (
         Index('idx_order_company_date', 'company_id', 'order_date'),
         Index('idx_order_due_date', 'due_date'),
@@ -156,9 +192,9 @@ class SalesOrder(Base):
 class SalesOrderItem(Base):
     __tablename__ = "sales_order_items"
     id = Column(Integer, primary_key=True)
-    sales_order_id = Column(Integer, ForeignKey("sales_orders.id"), nullable=False, index=True)
+    sales_order_id = Column(Integer, ForeignKey("sales_orders.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
-    quantity = Column(Integer, nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
     unit_price = Column(Numeric(12,2), nullable=False)
 
     product = relationship("Product")
@@ -200,9 +236,9 @@ class Employee(Base):
     first_name = Column(String(150), nullable=False, index=True)
     last_name = Column(String(150), index=True)
     email = Column(String(255), unique=True, index=True)
-    phone = Column(String(50), index=True)
+    phone = Column(String(50))
     emp_code = Column(String(64), unique=True, index=True)
-    joined_at = Column(Date, index=True)
+    joined_at = Column(Date)
 
     __table_args__ = (
         Index('idx_employee_name', 'first_name', 'last_name'),
@@ -215,11 +251,94 @@ class Attendance(Base):
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False, index=True)
     date = Column(Date, nullable=False, index=True)
     check_in = Column(DateTime, index=True)
-    check_out = Column(DateTime, index=True)
+    check_out = Column(DateTime)
 
     employee = relationship("Employee")
 
     __table_args__ = (
         Index('idx_attendance_emp_date', 'employee_id', 'date'),
         Index('idx_attendance_date_range', 'date', 'check_in', 'check_out'),
-    )
\ No newline at end of file
+    )
+class RowCount(Base):
+    """Maintained row counter: "<table>" or "<table>:<column>=<value>" (see app.core.counts)"""
+    __tablename__ = "row_counts"
+    key = Column(String(255), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKey(Base):
+    """Idempotency-Key seen on a POST: replays return the resource it created (see app.core.idempotency)"""
+    __tablename__ = "idempotency_keys"
+    key = Column(String(255), primary_key=True)  # "<scope>:<client key>"
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request payload
+    resource_id = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class Job(Base):
+    """Background job (see app.core.jobs): queued -> running -> succeeded / failed / cancelled"""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    type = Column(String(64), nullable=False, index=True)
+    status = Column(String(16), nullable=False, default="queued")
+    params = Column(Text, nullable=False, default="{}")  # JSON
+    progress = Column(Numeric(5, 4), nullable=False, default=0)  # 0..1
+    message = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=1)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    worker_pid = Column(Integer)  # Process running it; a dead one means the job is requeued on startup
+    error = Column(Text)
+    result_path = Column(String(512))
+    run_after = Column(DateTime)  # Retry backoff
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_jobs_status_created", "status", "created_at"),
+    )
+
+    @property
+    def result_available(self) -> bool:
+        return self.status == "succeeded" and self.result_path is not None
+
+class ReferenceVersion(Base):
+    """Change counter per reference table, bumped with every write to it (see app.core.reference)"""
+    __tablename__ = "reference_versions"
+    name = Column(String(64), primary_key=True)  # "categories", "accounts", ...
+    version = Column(Integer, nullable=False, default=0)
+
+class TenantShard(Base):
+    """Shard holding a company's orders (see app.core.sharding); no row = not assigned yet"""
+    __tablename__ = "tenant_shards"
+    company_id = Column(Integer, ForeignKey("companies.id"), primary_key=True)
+    shard = Column(String(64), nullable=False)
+
+class ShardSequence(Base):
+    """Last id handed out for a table whose rows are spread over shard files"""
+    __tablename__ = "shard_sequences"
+    name = Column(String(64), primary_key=True)  # Table name
+    last_id = Column(Integer, nullable=False, default=0)
+
+class ArchivePeriod(Base):
+    """Archive file holding one year of an archived table's rows (see app.core.archive)"""
+    __tablename__ = "archive_periods"
+    table_name = Column(String(64), primary_key=True)
+    period = Column(String(16), primary_key=True)  # "2024"
+    url = Column(String(512), nullable=False)
+
+class AttendanceSummary(Base):
+    """Archived attendance per employee and month"""
+    __tablename__ = "attendance_summaries"
+    employee_id = Column(Integer, ForeignKey("employees.id"), primary_key=True)
+    month = Column(String(7), primary_key=True)  # "2024-03"
+    days = Column(Integer, nullable=False, default=0)
+    minutes = Column(Integer, nullable=False, default=0)  # Checked-in time of the records with a check-out
+
+class SalesSummary(Base):
+    """Archived orders per company and month, kept in the database (shard) the orders came from"""
+    __tablename__ = "sales_summaries"
+    company_id = Column(Integer, ForeignKey("companies.id"), primary_key=True)
+    month = Column(String(7), primary_key=True)  # "2024-03"
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
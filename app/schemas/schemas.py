@@ -1,6 +1,6 @@
-from typing import Optional, List, Annotated
+from typing import Any, Dict, Generic, Optional, List, Annotated, Literal, TypeVar
 from datetime import date, datetime
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import AliasChoices, BaseModel, EmailStr, Field, Json
 from decimal import Decimal
 
 # ---- Base ----
@@ -96,7 +96,7 @@ class ProductBase(BaseModel):
     category_id: Optional[int] = None
 
 class ProductCreate(ProductBase):
-    initial_stock: Optional[int] = 0
+    initial_stock: Optional[Annotated[int, Field(ge=0)]] = 0
 
 class ProductUpdate(BaseModel):
     name: Optional[str] = None
@@ -105,7 +105,8 @@ class ProductUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 class ProductRead(ProductBase, IDModel):
-    category: Optional[CategoryRead] = None
+    # Read from the reference snapshot (Product.category_ref) rather than the lazy relationship
+    category: Optional[CategoryRead] = Field(None, validation_alias=AliasChoices("category_ref", "category"))
     available_stock: int = 0
 
 # ---- Warehouse & Stock ----
@@ -130,6 +131,25 @@ class StockMovementRead(IDModel):
     reason: Optional[str] = None
     occurred_at: datetime
 
+class StockBalanceRead(BaseModel):
+    product_id: int
+    warehouse_id: int
+    available: int
+
+    model_config = {"from_attributes": True}
+
+class StockHoldCreate(BaseModel):
+    product_id: int
+    quantity: Annotated[int, Field(gt=0)]
+    ttl_seconds: Optional[Annotated[int, Field(gt=0, le=86400)]] = None  # Defaults to STOCK_HOLD_TTL_SECONDS
+
+class StockReservationRead(IDModel):
+    product_id: int
+    warehouse_id: int
+    sales_order_id: Optional[int] = None
+    quantity: int
+    expires_at: Optional[datetime] = None
+
 # ---- Sales / Purchase ----
 class OrderItemBase(BaseModel):
     product_id: int
@@ -142,8 +162,13 @@ class OrderBase(BaseModel):
     due_date: Optional[date] = None
     notes: Optional[str] = None
 
+class OrderItemCreate(BaseModel):
+    product_id: int
+    quantity: Annotated[int, Field(gt=0)]
+    unit_price: Optional[Annotated[Decimal, Field(max_digits=12, decimal_places=2)]] = None  # Ignored: catalog price applies
+
 class SalesOrderCreate(OrderBase):
-    items: List[OrderItemBase]
+    items: Annotated[List[OrderItemCreate], Field(min_length=1)]
 
 class SalesOrderRead(OrderBase, IDModel):
     total_amount: Annotated[Decimal, Field(max_digits=14, decimal_places=2)]
@@ -174,6 +199,28 @@ class JournalEntryRead(IDModel):
     narration: Optional[str] = None
     lines: List[JournalEntryLine]
 
+class JournalImportLine(BaseModel):
+    account_id: Optional[int] = None
+    account_code: Optional[str] = None  # Resolved to account_id during the import
+    debit: Annotated[Decimal, Field(ge=0, max_digits=14, decimal_places=2)] = Decimal('0')
+    credit: Annotated[Decimal, Field(ge=0, max_digits=14, decimal_places=2)] = Decimal('0')
+    narration: Optional[str] = None
+
+class JournalImportEntry(BaseModel):
+    date: date
+    narration: Optional[str] = None
+    lines: Annotated[List[JournalImportLine], Field(min_length=2)]
+
+class JournalImportRejection(BaseModel):
+    line: int  # Line number in the NDJSON input
+    errors: List[str]
+
+class JournalImportReport(BaseModel):
+    accepted: int = 0
+    rejected: int = 0
+    chunks: int = 0
+    rejections: List[JournalImportRejection] = []  # First JOURNAL_IMPORT_MAX_REPORTED only
+
 # ---- HR / Employee ----
 class EmployeeBase(BaseModel):
     first_name: str
@@ -191,12 +238,61 @@ class AttendanceRecord(BaseModel):
     check_in: Optional[datetime] = None
     check_out: Optional[datetime] = None
 
+class AttendanceRead(AttendanceRecord, IDModel):
+    pass
+
 # ---- Pagination / Filters ----
 class Pagination(BaseModel):
-    page: int = 1
-    size: int = 25
+    page: Annotated[int, Field(ge=1)] = 1
+    size: Annotated[int, Field(ge=1, le=500)] = 25
 
 class FilterResponse(BaseModel):
     total: int
     page: int
-    size: int
\ No newline at end of file
+    size: int
+
+T = TypeVar("T")
+
+class Page(FilterResponse, Generic[T]):
+    items: List[T]
+
+# ---- Batch ----
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None  # Echoed back so clients can match responses
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str  # e.g. /api/v1/products/3?fields=id,name
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+    atomic: bool = False  # Run writes in one DB transaction; stop at the first failure
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class JobCreate(BaseModel):
+    type: str
+    params: Dict[str, Any] = {}
+
+class JobRead(IDModel):
+    type: str
+    status: str
+    params: Json[Dict[str, Any]]  # Stored as JSON text
+    progress: float
+    message: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    error: Optional[str] = None
+    result_available: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+    committed: bool = True
@@ -0,0 +1,259 @@
+"""
+Pre-fork production launcher.
+
+    python -m app.server [--host 0.0.0.0] [--port 8000] [--workers N] [--max-requests 10000]
+
+The master binds the listening socket, imports ``app.main`` and does the
+work that is identical in every worker once: the schema version check (of
+every shard file too), the reference data snapshot, the OpenAPI document
+and the job type registry, with the garbage collector disabled. Right
+before each fork it freezes the heap (``gc.freeze``) and the worker then
+re-enables the collector, so worker collections never touch the preloaded
+objects and their pages stay shared copy-on-write. ``--workers`` (default:
+one per CPU core) uvicorn servers are forked on the inherited socket. Each worker runs the normal startup (write queue, job
+runner, schedulers) after the fork, and exits after ``--max-requests``
+(plus jitter, so they do not all recycle at once); the master replaces any
+worker that exits.
+
+SQLite rule: the master never opens a connection on the app's engines.
+The schema check and the reference snapshot use a throwaway engine, and the launcher refuses to fork
+if a pool holds a connection, because a SQLite connection must not be used
+in two processes. Workers also drop whatever pool state they inherited.
+
+Signals to the master:
+  TERM, INT  graceful stop: workers finish in-flight requests (up to --graceful-timeout)
+  HUP        graceful reload: workers drain, then the master re-executes itself
+             on the same socket and preloads the new code; connections wait in
+             the listen backlog meanwhile, none are refused
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("app.server")
+
+LISTEN_FD_ENV = "APP_SERVER_LISTEN_FD"
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    inherited = os.environ.pop(LISTEN_FD_ENV, None)
+    if inherited is not None:  # Re-executed by a reload: keep serving on the same socket
+        sock = socket.socket(fileno=int(inherited))
+    else:
+        sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Import the app and build everything workers would otherwise each build; returns the app"""
+    from sqlalchemy import create_engine
+
+    from app.core.config import get_settings
+    from app.core.jobs import load_job_types
+    from app.core.reference import reference
+    from app.core.schema import ensure_schema
+    from app.core.sharding import ensure_shard_schema
+    from app.main import app
+
+    settings = get_settings()
+    # Throwaway engine: the app's own pools must stay empty until after fork
+    schema_engine = create_engine(settings.DATABASE_URL)
+    try:
+        with schema_engine.begin() as conn:
+            ensure_schema(conn)
+            reference.refresh(conn=conn)  # Workers start with it and only re-check the versions
+    finally:
+        schema_engine.dispose()
+    for url in settings.SHARDS.values():
+        shard_engine = create_engine(url)
+        try:
+            with shard_engine.begin() as conn:
+                ensure_shard_schema(conn)
+        finally:
+            shard_engine.dispose()
+    load_job_types()
+    app.openapi()
+    check_no_connections()
+    return app
+
+
+def _engines():
+    from app.core.database import async_engine, engine, read_engine, shards, write_engine
+
+    return {"sync": engine, "read": read_engine, "async": async_engine.sync_engine, "writer": write_engine,
+            **shards.engines()}
+
+
+def check_no_connections() -> None:
+    """Refuse to fork with open SQLite connections: a child would share the parent's file handles and locks"""
+    for name, engine in _engines().items():
+        pool = engine.pool
+        if pool.checkedin() or pool.checkedout():
+            raise RuntimeError(f"The {name} engine opened a connection before fork; "
+                               "move that work into the startup event or use a throwaway engine")
+
+
+class Arbiter:
+    """Master process: forks, watches and replaces workers"""
+
+    def __init__(self, app, sock: socket.socket, args: argparse.Namespace):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, float] = {}  # pid -> started (monotonic)
+        self.stopping = False
+        self.reloading = False
+
+    # ---- workers ----
+    def spawn(self) -> None:
+        gc.freeze()  # Everything allocated so far goes to the permanent generation, never scanned by a worker's GC
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+        status = 0
+        try:
+            self.run_worker()
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logger.exception("Worker crashed")
+            status = 1
+        finally:
+            os._exit(status)
+
+    def run_worker(self) -> None:
+        import uvicorn
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        gc.enable()  # Collects only what the worker allocates itself
+        for engine in _engines().values():
+            engine.dispose(close=False)  # Forget (never close) anything inherited from the master
+        max_requests = None
+        if self.args.max_requests > 0:
+            max_requests = self.args.max_requests + random.randint(0, self.args.max_requests_jitter)
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            limit_max_requests=max_requests,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+            timeout_keep_alive=self.args.keep_alive,
+            backlog=self.args.backlog,
+            log_level=self.args.log_level,
+            access_log=self.args.access_log,
+            proxy_headers=True,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if not (self.stopping or self.reloading):
+                if code == 0:
+                    logger.info(f"Worker {pid} recycled after {time.monotonic() - started:.0f}s")
+                else:
+                    logger.warning(f"Worker {pid} exited with {code}; replacing it")
+                    if time.monotonic() - started < 1:
+                        time.sleep(1)  # Crashing on startup: do not fork in a tight loop
+
+    def stop_workers(self, timeout: float) -> None:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning(f"Worker {pid} did not stop within {timeout:.0f}s; killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.workers:
+            self.reap()
+            time.sleep(0.05)
+
+    # ---- master loop ----
+    def handle_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def handle_reload(self, signum, frame) -> None:
+        self.reloading = True
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        logger.info(f"Master {os.getpid()} listening on {self.sock.getsockname()} with {self.args.workers} workers")
+        while not (self.stopping or self.reloading):
+            while len(self.workers) < self.args.workers and not (self.stopping or self.reloading):
+                self.spawn()
+            self.reap()
+            time.sleep(0.2)
+
+        # Graceful shutdown also ends the event streams (broker.close at shutdown)
+        self.stop_workers(self.args.graceful_timeout + 5)
+        if self.reloading:
+            logger.info("Reloading: re-executing the master on the same socket")
+            os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+            os.execv(sys.executable, [sys.executable, "-m", "app.server", *sys.argv[1:]])
+        logger.info("Master stopped")
+        return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-fork launcher for app.main:app")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", 0)),
+                        help="Worker processes (default: number of CPU cores)")
+    parser.add_argument("--max-requests", type=int, default=10000, help="Recycle a worker after this many; 0 = never")
+    parser.add_argument("--max-requests-jitter", type=int, default=1000)
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+    args.workers = args.workers or os.cpu_count() or 1
+
+    if args.workers > 1 and not os.environ.get("METRICS_MULTIPROC_DIR"):
+        # Must be set before app settings load, so /metrics sums every worker
+        os.environ["METRICS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="bidua-metrics-")
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    started = time.perf_counter()
+    # Collector off in the master (it allocates little after the preload); see Arbiter.spawn / run_worker
+    gc.disable()
+    app = preload()
+    logger.info(f"Preloaded app.main in {time.perf_counter() - started:.2f}s")
+    return Arbiter(app, sock, args).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Shared helpers for the in-process benchmarks"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+
+def use_scratch_database() -> str:
+    """Run from a temporary directory so the repo's sql_app.db is never touched.
+
+    Settings pin the database to ./sql_app.db, so this must be called before
+    anything under ``app`` is imported.
+    """
+    workdir = tempfile.mkdtemp(prefix="bidua-bench-")
+    os.chdir(workdir)
+    return workdir
+
+
+async def asgi_request(
+    app,
+    method: str,
+    url: str,
+    body: bytes = b"",
+    headers: Sequence[Tuple[bytes, bytes]] = (),
+) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """Drive one HTTP request straight through an ASGI app, no sockets involved"""
+    parts = urlsplit(url)
+    scope: Dict[str, Any] = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-length", str(len(body)).encode()), *headers],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status = 0
+    response_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = list(message.get("headers", ()))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, b"".join(chunks)
+
+
+async def measure(app, method: str, url: str, *, requests: int, concurrency: int, body: bytes = b"",
+                  headers: Sequence[Tuple[bytes, bytes]] = ()) -> Dict[str, float]:
+    """Fire ``requests`` calls with ``concurrency`` in flight; return throughput and latency stats"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            status, _, _ = await asgi_request(app, method, url, body, headers)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    # Warm-up so first-call costs (imports, pool creation) are not measured
+    await asgi_request(app, method, url, body, headers)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def print_table(title: str, rows: List[Tuple[str, Dict[str, float]]], baseline: Optional[str] = None) -> None:
+    """Print benchmark rows, with speed-up relative to the ``baseline`` row"""
+    print(f"\n{title}")
+    print(f"{'variant':<32}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'speedup':>9}")
+    base = dict(rows).get(baseline) if baseline else None
+    for name, r in rows:
+        speedup = f"{r['rps'] / base['rps']:.2f}x" if base else ""
+        print(f"{name:<32}{r['rps']:>10.0f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>8}{speedup:>9}")
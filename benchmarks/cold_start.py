@@ -0,0 +1,70 @@
+"""Cold-start cost of a fresh instance: import time and time-to-first-request.
+
+Each sample runs in a new interpreter against a scratch database: the
+first run creates the schema, later runs only pay the version check.
+
+Usage: python -m benchmarks.cold_start [--runs 5] [--openapi-cache]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from benchmarks._asgi import asgi_request
+
+async def first_request():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        ready = time.perf_counter()
+        status, _, _ = await asgi_request(app.main.app, "GET", "/health")
+        served = time.perf_counter()
+        await asgi_request(app.main.app, "GET", "/openapi.json")
+        docs = time.perf_counter()
+    return ready, served, docs, status
+
+ready, served, docs, status = asyncio.run(first_request())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - started) * 1000,
+    "first_openapi_ms": (docs - served) * 1000,
+    "status": status,
+}))
+"""
+
+
+def sample(workdir: str, env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=workdir, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(runs: int, openapi_cache: bool) -> None:
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix="bidua-coldstart-")
+    env = {**os.environ, "PYTHONPATH": repo}
+    if openapi_cache:
+        env["OPENAPI_CACHE_PATH"] = os.path.join(workdir, "openapi.json")
+
+    first = sample(workdir, env)
+    warm = [sample(workdir, env) for _ in range(runs)]
+    print(f"{'':<28}{'import':>10}{'startup':>10}{'1st req':>10}{'openapi':>10}   (ms)")
+    for name, rows in (("empty database (1 run)", [first]), (f"current schema (median of {runs})", warm)):
+        med = {k: statistics.median(r[k] for r in rows) for k in first if k != "status"}
+        print(f"{name:<28}{med['import_ms']:>10.0f}{med['startup_ms']:>10.0f}"
+              f"{med['first_request_ms']:>10.0f}{med['first_openapi_ms']:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--openapi-cache", action="store_true", help="use a prebuilt OpenAPI file")
+    args = parser.parse_args()
+    main(args.runs, args.openapi_cache)
@@ -0,0 +1,100 @@
+"""Idempotent order retries: replay throughput and the replay edge cases.
+
+A client retrying ``POST /api/v1/orders/`` with one Idempotency-Key must
+get one order no matter how many retries race each other, and a retry
+after that order was deleted gets 409 instead of a second order (or a
+500). Measures retries per second against fresh creates and exits non-zero
+if any of this does not hold.
+
+Usage: python -m benchmarks.idempotency [--retries 500] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from decimal import Decimal
+
+from benchmarks._asgi import asgi_request, measure, print_table, use_scratch_database
+
+use_scratch_database()
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.models.models import Company, Product, SalesOrder, StockBalance, Warehouse  # noqa: E402
+
+URL = "/api/v1/orders/"
+ORDER = json.dumps({"company_id": 1, "order_date": "2025-03-31",
+                    "items": [{"product_id": 1, "quantity": 1}]}).encode()
+JSON = (b"content-type", b"application/json")
+
+
+def seed() -> None:
+    with engine.begin() as conn:
+        ensure_schema(conn)
+        conn.execute(insert(Company), [{"name": "Bench"}])
+        conn.execute(insert(Warehouse), [{"name": "Main"}])
+        conn.execute(insert(Product), [{"sku": "IDEM-1", "name": "Retried product", "unit_price": Decimal("5.00")}])
+        conn.execute(insert(StockBalance), [{"product_id": 1, "warehouse_id": 1, "available": 10 ** 6}])
+
+
+def orders() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(SalesOrder))
+
+
+async def post(app, key: str):
+    try:
+        status, _, body = await asgi_request(app, "POST", URL, ORDER, [JSON, (b"idempotency-key", key.encode())])
+    except Exception as e:  # Starlette re-raises after sending the 500
+        return 500, {"detail": repr(e)}
+    return status, json.loads(body)
+
+
+async def main(retries: int, concurrency: int) -> int:
+    from app.main import app
+
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    logging.getLogger("app.core.middleware").setLevel(logging.ERROR)
+    seed()
+    failures = []
+    async with app.router.lifespan_context(app):
+        # Racing retries of one key: one order, every response carrying its id
+        results = await asyncio.gather(*(post(app, "race") for _ in range(concurrency)))
+        ids = {body.get("id") for status, body in results if status == 200}
+        if len(ids) != 1 or any(status != 200 for status, _ in results) or orders() != 1:
+            failures.append(f"{concurrency} racing retries: statuses {sorted(s for s, _ in results)}, "
+                            f"order ids {ids}, {orders()} orders stored")
+
+        # A retry after the order was deleted
+        (order_id,) = ids or {None}
+        await asgi_request(app, "DELETE", f"{URL}{order_id}")
+        status, body = await post(app, "race")
+        if status != 409 or orders() != 0:
+            failures.append(f"retry after delete: {status} {body}, {orders()} orders stored")
+
+        created = await measure(app, "POST", URL, requests=retries, concurrency=concurrency, body=ORDER,
+                                headers=[JSON])
+        await post(app, "replay")
+        stored = orders()
+        replayed = await measure(app, "POST", URL, requests=retries, concurrency=concurrency, body=ORDER,
+                                 headers=[JSON, (b"idempotency-key", b"replay")])
+        if orders() != stored or replayed["errors"]:
+            failures.append(f"{retries} sequential retries: {orders() - stored} extra orders, "
+                            f"{replayed['errors']} errors")
+
+    print_table(f"{retries} order POSTs, {concurrency} in flight", [
+        ("fresh creates", created), ("retries of one key", replayed)], baseline="fresh creates")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.retries, args.concurrency)))
@@ -0,0 +1,416 @@
+"""Index audit: which indexes the app's queries use, which only cost writes, and a migration dropping the latter.
+
+1. Runs the load-test scenarios in-process (plus one pass of the work they
+   miss: order delete, hold sweep, count check, jobs, archival scan) against a scratch
+   database and records every distinct statement shape with one sample of
+   its parameters. The filter/sort combinations the list endpoints accept
+   (app.core.filters) are added as shapes too.
+2. ``EXPLAIN QUERY PLAN`` maps each shape to the index SQLite picks, on a copy
+   of the scratch database. Without ``ANALYZE`` statistics, like the plan
+   checks in app.core.filters: the planner then prefers indexes whatever
+   the row counts of the scratch data, so no index looks unused just
+   because a test table is small.
+3. Candidates are non-unique indexes that are a column prefix of another
+   index on the same table (redundant), or that no plan uses (unused). Each
+   is dropped on the copy in turn and put back if a shape whose plan used
+   it gets worse (a new table scan or temp b-tree sort, fewer constrained columns),
+   a foreign key column loses its last index, or a filter combination
+   would stop being accepted.
+4. Insert cost per table is measured with all indexes vs without the
+   dropped ones, on a file with the app's PRAGMAs.
+
+Usage: python -m benchmarks.index_audit [--iterations 40] [--rows 20000] [--migration drop_indexes.py]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from benchmarks import loadtest
+
+from sqlalchemy import event
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlalchemy.engine import Engine
+
+import app.crud  # noqa: F401  registers the filter specs
+from app.core.archive import Archiver, default_cutoff
+from app.core.counts import verify_counts
+from app.core.database import ReadSessionLocal, sqlite_pragmas
+from app.core.filters import FILTER_SPECS
+from app.core.profiler import normalize_statement
+from app.core.reports import _sales_totals
+from app.core.stock import release_expired
+from app.core.writer import write_queue
+from app.models.models import Base
+
+API = loadtest.API
+DATABASE = os.path.join(loadtest.WORKDIR, "sql_app.db")
+
+_PLANNED = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+_USING_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+
+# ---- 1. capture ----
+class ShapeLog:
+    """Distinct statements seen on any engine: normalized text -> [sql, parameters, executions]"""
+
+    def __init__(self):
+        self.shapes: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if not _PLANNED.match(statement):
+            return
+        normalized = normalize_statement(statement)
+        with self._lock:
+            entry = self.shapes.get(normalized)
+            if entry is None:
+                if executemany and parameters and isinstance(parameters[0], (list, tuple)):
+                    parameters = parameters[0]
+                self.shapes[normalized] = [statement, tuple(parameters or ()), 1]
+            else:
+                entry[2] += 1
+
+
+async def background_pass(client) -> None:
+    """One round of the work that runs outside the scenarios"""
+    order = {"company_id": 1, "order_date": "2025-06-01", "items": [{"product_id": 1, "quantity": 1}]}
+    for _ in range(2):  # The retry finds the stored key
+        status, body = await client.request("POST", f"{API}/orders/", json_body=order,
+                                            headers={"Idempotency-Key": "audit"})
+    if status == 200:
+        await client.request("DELETE", f"{API}/orders/{json.loads(body)['id']}")  # Releases its stock holds
+    for job_type in ("export_products", "export_journal", "rebuild_ledger"):
+        await client.request("POST", f"{API}/jobs/", json_body={"type": job_type, "params": {}})
+    await write_queue.run(release_expired)
+    await verify_counts()
+
+    def scans() -> None:
+        Archiver(default_cutoff()).pending()
+        with ReadSessionLocal() as db:
+            _sales_totals(db, 2025)  # The sales_report job itself runs in another process
+
+    await asyncio.to_thread(scans)
+    await asyncio.sleep(2)  # Let the jobs finish
+
+
+async def run_workload(iterations: int, concurrency: int, seed: int) -> None:
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        client = loadtest.AsgiClient(app)
+        for name, scenario in loadtest.SCENARIOS.items():
+            count = max(1, iterations // 5) if name == "login" else iterations
+            await loadtest.run_scenario(client, name, scenario, iterations=count, concurrency=concurrency, seed=seed)
+        await background_pass(client)
+
+
+def declared_shapes() -> Dict[str, list]:
+    """Every filter/sort combination the list endpoints accept, as a query"""
+    dialect = sqlite_dialect.dialect()
+    shapes = {}
+    for spec in FILTER_SPECS:
+        for combination in spec.combinations():
+            sql = str(spec.sample_query(*combination).compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+            shapes[normalize_statement(sql)] = [sql, (), 0]
+    return shapes
+
+
+# ---- 2. plans ----
+class Schema:
+    """Indexes of a database copy, dropped and restored by name"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        self.sql: Dict[str, str] = {}
+        self.table_of: Dict[str, str] = {}
+        self.columns: Dict[str, Tuple[str, ...]] = {}
+        self.unique: Set[str] = set()
+        for table in self.tables:
+            for _, name, unique, origin, _ in conn.execute(f"PRAGMA index_list('{table}')"):
+                self.table_of[name] = table
+                self.columns[name] = tuple(row[2] for row in conn.execute(f"PRAGMA index_info('{name}')"))
+                if unique:
+                    self.unique.add(name)
+        for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"):
+            self.sql[name] = sql
+        self.dropped: List[str] = []
+        # Child columns of foreign keys, which SQLite searches on every parent delete
+        self.foreign_keys = {(table, row[3]) for table in self.tables
+                             for row in conn.execute(f"PRAGMA foreign_key_list('{table}')")}
+
+    def indexes(self, table: str) -> List[str]:
+        return [name for name, owner in self.table_of.items() if owner == table and name not in self.dropped]
+
+    def leading(self) -> Set[Tuple[str, str]]:
+        return {(self.table_of[name], self.columns[name][0]) for name in self.table_of
+                if name not in self.dropped and self.columns[name]}
+
+    def drop(self, name: str) -> None:
+        self.conn.execute(f"DROP INDEX {name}")
+        self.dropped.append(name)
+
+    def restore(self, name: str) -> None:
+        self.conn.execute(self.sql[name])
+        self.dropped.remove(name)
+
+
+def explain(conn: sqlite3.Connection, sql: str, parameters: Sequence[Any]) -> Optional[List[str]]:
+    try:
+        return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)]
+    except sqlite3.Error:
+        return None  # A statement for another file (shard, archive) or a temp table
+
+
+def plan_cost(plan: List[str]) -> Tuple[int, int, int]:
+    """(table scans, temp b-tree sorts, constrained columns)"""
+    scans = sum(1 for line in plan if line.startswith("SCAN ") and " USING " not in line
+                and not line.startswith("SCAN CONSTANT"))
+    sorts = sum(1 for line in plan if "TEMP B-TREE" in line)
+    constrained = sum(line.count("?") for line in plan if line.startswith("SEARCH "))
+    return scans, sorts, constrained
+
+
+def worse(before: Tuple[int, int, int], after: Tuple[int, int, int]) -> bool:
+    return after[0] > before[0] or after[1] > before[1] or after[2] < before[2]
+
+
+def accepted_filters(schema: Schema) -> Dict[str, Set[Any]]:
+    """Accepted combinations per spec with the indexes still present"""
+    accepted = {}
+    for spec in FILTER_SPECS:
+        saved = spec.indexes
+        spec.indexes = [tuple(column.key for column in index.columns) + spec.primary_key
+                        for index in spec.table.indexes if index.name not in schema.dropped] + [spec.primary_key]
+        try:
+            accepted[f"{spec.table.name}:{id(spec)}"] = set(spec.combinations())
+        finally:
+            spec.indexes = saved
+    return accepted
+
+
+# ---- 3. candidates ----
+def declared_on_column(name: str) -> bool:
+    """``Column(..., index=True)`` rather than an ``Index(...)`` in __table_args__"""
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return bool(getattr(index, "_column_flag", False))
+    return name.startswith("ix_")
+
+
+def candidates(schema: Schema, used: Dict[str, int]) -> List[Tuple[str, str]]:
+    """(index, reason) for every droppable-looking index, redundant ones first"""
+    redundant, unused = [], []
+    for name, table in schema.table_of.items():
+        if name in schema.unique or name not in schema.sql:
+            continue
+        columns = schema.columns[name]
+        for other in schema.indexes(table):
+            longer = schema.columns[other]
+            if other == name or longer[:len(columns)] != columns:
+                continue
+            # Of two identical indexes keep the one declared in __table_args__
+            if len(longer) > len(columns) or (declared_on_column(name) and not declared_on_column(other)):
+                redundant.append((name, f"redundant with {other} ({', '.join(longer)})"))
+                break
+        else:
+            if not used.get(name):
+                unused.append((name, "unused by every captured query"))
+    return sorted(redundant) + sorted(unused)
+
+
+def audit(schema: Schema, shapes: Dict[str, list]) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]], Dict]:
+    """Drop what can go; returns (dropped, kept) with reasons and the baseline plans"""
+    baseline = {}
+    used: Dict[str, int] = {}
+    for normalized, (sql, parameters, _) in shapes.items():
+        plan = explain(schema.conn, sql, parameters)
+        if plan is None:
+            continue
+        baseline[normalized] = (plan, plan_cost(plan))
+        for line in plan:
+            for name in _USING_INDEX.findall(line):
+                used[name] = used.get(name, 0) + 1
+    covered = schema.leading()
+    filters = accepted_filters(schema)
+
+    dropped, kept = [], []
+    for name, reason in candidates(schema, used):
+        schema.drop(name)
+        blocker = None
+        table, column = schema.table_of[name], schema.columns[name][0]
+        if (table, column) in schema.foreign_keys and (table, column) in covered - schema.leading():
+            blocker = f"only index on foreign key {table}.{column}"
+        if blocker is None and accepted_filters(schema) != filters:
+            blocker = "backs an accepted filter/sort combination"
+        if blocker is None:
+            for normalized, (plan, cost) in baseline.items():
+                if not any(name in _USING_INDEX.findall(line) for line in plan):
+                    continue  # Its plan is still there; other changes are the planner breaking ties anew
+                sql, parameters, _ = shapes[normalized]
+                after = explain(schema.conn, sql, parameters)
+                if after is not None and worse(cost, plan_cost(after)):
+                    blocker = f"needed by: {normalized[:100]}"
+                    break
+        if blocker is None:
+            dropped.append((name, reason))
+        else:
+            schema.restore(name)
+            kept.append((name, blocker))
+    return dropped, kept, {"used": used, "shapes": len(baseline)}
+
+
+# ---- 4. write cost ----
+def _value(declared: str, i: int, rng: random.Random, unique: bool) -> Any:
+    n = i if unique else rng.randrange(1000)
+    declared = declared.upper()
+    if "INT" in declared or "BOOL" in declared:
+        return n if "INT" in declared else n % 2
+    if "DATETIME" in declared or "TIMESTAMP" in declared:
+        return str(datetime(2024, 1, 1) + timedelta(minutes=n if unique else rng.randrange(10 ** 6)))
+    if "DATE" in declared:
+        return str(date(2020, 1, 1) + timedelta(days=n % 3650))
+    if "NUMERIC" in declared or "DECIMAL" in declared or "REAL" in declared:
+        return round(n * 1.37, 2)
+    return f"v{n:08d}"
+
+
+def insert_us(path: str, schema: Schema, table: str, indexes: Sequence[str], rows: int) -> Optional[float]:
+    """Microseconds per inserted row, in batches of 500 per transaction like the write queue"""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        for pragma in sqlite_pragmas():
+            conn.execute(pragma)
+        conn.execute("PRAGMA foreign_keys=OFF")
+        (table_sql,) = schema.conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+        conn.execute(table_sql)
+        for name in indexes:
+            if name in schema.sql:
+                conn.execute(schema.sql[name])
+        info = list(schema.conn.execute(f"PRAGMA table_info('{table}')"))
+        unique_columns = {schema.columns[name][0] for name in schema.unique if schema.table_of[name] == table}
+        primary_key = [row for row in info if row[5]]
+        rowid_alias = primary_key[0][1] if len(primary_key) == 1 and primary_key[0][2].upper() == "INTEGER" else None
+        names = [row[1] for row in info if row[1] != rowid_alias]
+        types = {row[1]: row[2] for row in info}
+        rng = random.Random(7)
+        order = list(range(rows))
+        rng.shuffle(order)  # Unique values arrive out of order, like real keys
+        data = [tuple(_value(types[column], order[i], rng, column in unique_columns) for column in names)
+                for i in range(rows)]
+        sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+        started = time.perf_counter()
+        for start in range(0, rows, 500):
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(sql, data[start:start + 500])
+            conn.execute("COMMIT")
+        return (time.perf_counter() - started) / rows * 1e6
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def write_costs(schema: Schema, rows: int) -> List[Tuple[str, int, int, Optional[float], Optional[float]]]:
+    path = os.path.join(loadtest.WORKDIR, "write_cost.db")
+    costs = []
+    for table in sorted({schema.table_of[name] for name in schema.dropped}):
+        every = [name for name, owner in schema.table_of.items() if owner == table]
+        remaining = schema.indexes(table)
+        before = min(filter(None, (insert_us(path, schema, table, every, rows) for _ in range(3))), default=None)
+        after = min(filter(None, (insert_us(path, schema, table, remaining, rows) for _ in range(3))), default=None)
+        costs.append((table, len(every) + 1, len(remaining) + 1, before, after))
+    return costs
+
+
+# ---- migration ----
+def migration(dropped: List[Tuple[str, str]], schema: Schema) -> str:
+    lines = [f"# Generated by python -m benchmarks.index_audit on {date.today().isoformat()}",
+             "DROPPED_INDEXES = ("]
+    for name, reason in sorted(dropped, key=lambda item: (schema.table_of[item[0]], item[0])):
+        lines.append(f"    \"{name}\",  # {schema.table_of[name]}: {reason}")
+    lines += [")", "", "",
+              "def drop_unused_indexes(conn: Connection) -> None:",
+              "    \"\"\"Drop the indexes the index audit found unused or redundant\"\"\"",
+              "    for name in DROPPED_INDEXES:",
+              "        conn.execute(text(f\"DROP INDEX IF EXISTS {name}\"))", "", "",
+              "# Matching model changes:"]
+    for table in Base.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in schema.dropped:
+                if getattr(index, "_column_flag", False):
+                    lines.append(f"#   {table.name}.{index.columns[0].key}: drop index=True ({index.name})")
+                else:
+                    lines.append(f"#   {table.name}: drop Index('{index.name}', ...) from __table_args__")
+    return "\n".join(lines) + "\n"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=40, help="per load-test scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rows", type=int, default=20000, help="rows inserted per write-cost measurement")
+    parser.add_argument("--migration", help="write the migration here instead of printing it")
+    args = parser.parse_args()
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    logging.getLogger("app.core.profiler").setLevel(logging.ERROR)
+    logging.getLogger("app.core.middleware").setLevel(logging.ERROR)
+
+    loadtest.seed()
+    log = ShapeLog()
+    event.listen(Engine, "before_cursor_execute", log)
+    try:
+        asyncio.run(run_workload(args.iterations, args.concurrency, args.seed))
+    finally:
+        event.remove(Engine, "before_cursor_execute", log)
+    shapes = {**declared_shapes(), **log.shapes}
+
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    with sqlite3.connect(DATABASE) as source:
+        source.backup(conn)
+    schema = Schema(conn)
+    dropped, kept, stats = audit(schema, shapes)
+
+    print(f"\n{len(log.shapes)} statement shapes captured, {len(shapes) - len(log.shapes)} declared by filter specs, "
+          f"{stats['shapes']} explained")
+    print(f"\n{'index':<40}{'table':<22}{'plans':>6}  verdict")
+    verdicts = {**{name: f"DROP - {reason}" for name, reason in dropped},
+                **{name: f"keep - {reason}" for name, reason in kept}}
+    for name in sorted(schema.table_of, key=lambda name: (schema.table_of[name], name)):
+        verdict = verdicts.get(name, "keep - unique" if name in schema.unique else "keep - used")
+        print(f"{name:<40}{schema.table_of[name]:<22}{stats['used'].get(name, 0):>6}  {verdict}")
+
+    print(f"\n{'table':<22}{'b-trees/row':>13}{'insert us/row':>16}{'saved':>8}")
+    for table, before_trees, after_trees, before, after in write_costs(schema, args.rows):
+        timing = f"{before:>7.1f} -> {after:<6.1f}" if before and after else f"{'n/a':>16}"
+        saved = f"{1 - after / before:>8.0%}" if before and after else ""
+        print(f"{table:<22}{before_trees:>6} -> {after_trees:<4}{timing:>16}{saved}")
+
+    text = migration(dropped, schema)
+    if args.migration:
+        path = os.path.join(loadtest.INVOKED_FROM, args.migration)
+        with open(path, "w") as f:
+            f.write(text)
+        print(f"\nmigration written to {path}")
+    else:
+        print(f"\n{text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Year-end migration: one ``create_with_lines`` call per entry vs the chunked NDJSON import.
+
+Usage: python -m benchmarks.journal_import [--entries 20000] [--per-entry 2000] [--chunk-size 2000]
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+from benchmarks._asgi import use_scratch_database
+
+use_scratch_database()
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.journal_import import import_lines  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.core.writer import write_queue  # noqa: E402
+from app.models.models import Account, JournalEntryLine  # noqa: E402
+from app.schemas.schemas import JournalEntryCreate  # noqa: E402
+
+ACCOUNTS = [("Cash", "1000", "Asset"), ("Bank", "1100", "Asset"), ("Sales", "4000", "Revenue"),
+            ("Rent", "6100", "Expense"), ("Equity", "3000", "Equity")]
+
+
+def ndjson(entries: int):
+    for i in range(entries):
+        amount = f"{10 + i % 500}.00"
+        yield json.dumps({"date": "2025-03-31", "narration": f"Migrated {i}", "lines": [
+            {"account_code": ACCOUNTS[i % 2][1], "debit": amount},
+            {"account_code": ACCOUNTS[2 + i % 3][1], "credit": amount},
+        ]})
+    yield json.dumps({"date": "2025-03-31", "lines": [{"account_code": "1000", "debit": "1.00"},
+                                                      {"account_code": "4000", "credit": "2.00"}]})
+
+
+def main(entries: int, per_entry: int, chunk_size: int) -> int:
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    logging.getLogger("app.core.profiler").setLevel(logging.ERROR)
+    with engine.begin() as conn:
+        ensure_schema(conn)
+    with SessionLocal() as db:
+        db.add_all([Account(name=name, code=code, account_type=kind) for name, code, kind in ACCOUNTS])
+        db.commit()
+        codes = crud.account.get_code_map(db)
+
+        started = time.perf_counter()
+        for line in list(ndjson(per_entry))[:-1]:
+            entry = json.loads(line)
+            for item in entry["lines"]:
+                item["account_id"] = codes[item.pop("account_code")]
+            crud.journal_entry.create_with_lines(db, obj_in=JournalEntryCreate(**entry))
+        single_rate = per_entry / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        report = import_lines(db, ndjson(entries), chunk_size)
+        bulk_rate = report.accepted / (time.perf_counter() - started)
+        lines = db.scalar(select(func.count()).select_from(JournalEntryLine))
+    write_queue.stop()
+
+    print(f"{'mode':<28}{'entries/s':>10}")
+    print(f"{'one entry per call':<28}{single_rate:>10.0f}")
+    print(f"{'NDJSON import':<28}{bulk_rate:>10.0f}   ({report.chunks} chunks, {report.rejected} rejected)")
+    print(f"speed-up {bulk_rate / single_rate:.1f}x")
+    if report.accepted != entries or report.rejected != 1 or lines != 2 * (entries + per_entry):
+        print(f"FAILED: accepted {report.accepted}/{entries}, rejected {report.rejected} (expected 1), {lines} lines")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--per-entry", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+    sys.exit(main(args.entries, args.per_entry, args.chunk_size))
@@ -0,0 +1,417 @@
+"""Load harness: scripted scenarios against the real ``app.main:app``, in-process or through uvicorn.
+
+Scenarios (each iteration is one virtual-user session):
+  browse      list, page and filter the catalog, open a product
+  order       place an order for 1-3 products, read it back
+  journal     post a balanced journal entry
+  login       log in (bcrypt) and fetch /auth/me with the token
+  attendance  check an employee in, read their attendance
+
+``--mix browse=60,order=20,...`` additionally runs a ``mix`` scenario where
+every iteration picks one of them by weight. Request contents are derived
+from ``--seed`` and the iteration number only, so two runs send the same
+traffic whatever the scheduling. Results (p50/p95/p99, throughput and error
+rate per scenario and per step) go to ``--output``; with ``--baseline`` the
+run is compared against a committed report and exits non-zero on a
+regression beyond ``--tolerance``.
+
+Usage: python -m benchmarks.loadtest [--target asgi|uvicorn] [--workers 1] [--scenarios browse,order]
+           [--concurrency 50] [--iterations 200] [--mix browse=60,order=20,journal=10,login=5,attendance=5]
+           [--seed 1] [--output loadtest.json] [--baseline benchmarks/baselines/loadtest.json] [--tolerance 0.3]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from benchmarks._asgi import asgi_request, use_scratch_database
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INVOKED_FROM = os.getcwd()  # Relative --output/--baseline paths are resolved against this
+WORKDIR = use_scratch_database()
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.core.auth import get_password_hash  # noqa: E402
+from app.core.config import get_settings  # noqa: E402
+from app.core.counts import reconcile_counts  # noqa: E402
+from app.core.database import engine  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.models.models import (  # noqa: E402
+    Account, Category, Company, Employee, Product, StockBalance, User, Warehouse
+)
+
+settings = get_settings()
+API = settings.API_V1_STR
+
+PRODUCTS = 2000
+CATEGORIES = 20
+EMPLOYEES = 500
+USERS = 20
+PASSWORD = "load-test-password"
+
+
+def seed() -> None:
+    """Fixed dataset: the same rows on every run"""
+    with engine.begin() as conn:
+        ensure_schema(conn)
+        conn.execute(insert(Company), [{"name": "Load Test Co"}])
+        conn.execute(insert(Warehouse), [{"name": "Main"}])
+        conn.execute(insert(Category), [{"name": f"Category {i}"} for i in range(CATEGORIES)])
+        conn.execute(insert(Product), [
+            {"sku": f"LT-{i:05d}", "name": f"Product {i}", "unit_price": Decimal(f"{5 + i % 200}.99"),
+             "category_id": 1 + i % CATEGORIES, "is_active": True}
+            for i in range(PRODUCTS)
+        ])
+        conn.execute(insert(StockBalance), [
+            {"product_id": i + 1, "warehouse_id": 1, "available": 10_000_000} for i in range(PRODUCTS)])
+        conn.execute(insert(Account), [{"name": "Cash", "code": "1000", "account_type": "Asset"},
+                                       {"name": "Sales", "code": "4000", "account_type": "Revenue"}])
+        hashed = get_password_hash(PASSWORD)
+        conn.execute(insert(User), [{"email": f"user{i}@example.com", "full_name": f"User {i}",
+                                     "hashed_password": hashed, "is_active": True} for i in range(USERS)])
+        conn.execute(insert(Employee), [
+            {"first_name": f"Emp{i}", "last_name": "Load", "emp_code": f"E{i:05d}", "joined_at": date(2024, 1, 1)}
+            for i in range(EMPLOYEES)
+        ])
+        reconcile_counts(conn)
+
+
+# ---- clients ----
+Response = Tuple[int, bytes]
+
+
+class AsgiClient:
+    """Requests straight into the app object (no sockets)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, *, json_body: Any = None, form: Optional[Dict[str, str]] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        body, content_type = _encode(json_body, form)
+        raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        if content_type:
+            raw_headers.append((b"content-type", content_type.encode()))
+        status, _, payload = await asgi_request(self.app, method, path, body, raw_headers)
+        return status, payload
+
+
+class HttpClient:
+    """Requests through a real HTTP server"""
+
+    def __init__(self, base_url: str, concurrency: int):
+        import httpx
+
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=60,
+                                        limits=httpx.Limits(max_connections=concurrency))
+
+    async def request(self, method: str, path: str, *, json_body: Any = None, form: Optional[Dict[str, str]] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        body, content_type = _encode(json_body, form)
+        headers = dict(headers or {})
+        if content_type:
+            headers["content-type"] = content_type
+        response = await self.client.request(method, path, content=body, headers=headers)
+        return response.status_code, response.content
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def _encode(json_body: Any, form: Optional[Dict[str, str]]) -> Tuple[bytes, Optional[str]]:
+    if json_body is not None:
+        return json.dumps(json_body, default=str).encode(), "application/json"
+    if form is not None:
+        return urlencode(form).encode(), "application/x-www-form-urlencoded"
+    return b"", None
+
+
+# ---- recording ----
+class Recorder:
+    def __init__(self):
+        self.steps: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, step: str, seconds: float, status: int) -> None:
+        self.steps.setdefault(step, []).append(seconds)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if status >= 400:
+            self.errors[step] = self.errors.get(step, 0) + 1
+
+
+class Session:
+    """One virtual user's iteration: timed steps on a shared client"""
+
+    def __init__(self, client, recorder: Recorder, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+
+    async def step(self, name: str, method: str, path: str, **kwargs) -> Tuple[int, Any]:
+        started = time.perf_counter()
+        try:
+            status, body = await self.client.request(method, f"{API}{path}", **kwargs)
+        except Exception:
+            status, body = 599, b""
+        self.recorder.record(name, time.perf_counter() - started, status)
+        try:
+            return status, json.loads(body) if body else None
+        except ValueError:
+            return status, None
+
+
+# ---- scenarios ----
+async def browse(s: Session) -> None:
+    await s.step("list products", "GET", f"/products/?limit=20&skip={s.rng.randrange(0, PRODUCTS - 20)}")
+    await s.step("products page", "GET", f"/products/page?page={s.rng.randint(1, 20)}&size=25")
+    await s.step("filter by category", "GET", f"/products/?category_id={s.rng.randint(1, CATEGORIES)}&limit=20")
+    await s.step("product detail", "GET", f"/products/{s.rng.randint(1, PRODUCTS)}")
+
+
+async def order(s: Session) -> None:
+    product_ids = s.rng.sample(range(1, PRODUCTS + 1), s.rng.randint(1, 3))
+    status, body = await s.step("create order", "POST", "/orders/", json_body={
+        "company_id": 1, "order_date": date(2025, 1, 1) + timedelta(days=s.rng.randrange(365)),
+        "items": [{"product_id": product_id, "quantity": s.rng.randint(1, 5)} for product_id in product_ids],
+    })
+    if status == 200:
+        await s.step("read order", "GET", f"/orders/{body['id']}")
+
+
+async def journal(s: Session) -> None:
+    amount = f"{s.rng.randint(1, 5000)}.{s.rng.randint(0, 99):02d}"
+    await s.step("post journal entry", "POST", "/accounts/journal-entries/", json_body={
+        "date": date(2025, 3, 31), "narration": "load test",
+        "lines": [{"account_id": 1, "debit": amount}, {"account_id": 2, "credit": amount}],
+    })
+
+
+async def login(s: Session) -> None:
+    status, body = await s.step("login", "POST", "/auth/login", form={
+        "username": f"user{s.rng.randrange(USERS)}@example.com", "password": PASSWORD})
+    if status == 200:
+        await s.step("me", "GET", "/auth/me", headers={"authorization": f"Bearer {body['access_token']}"})
+
+
+async def attendance(s: Session) -> None:
+    employee_id = s.rng.randint(1, EMPLOYEES)
+    check_in = datetime(2025, 3, 3, 8, 45) + timedelta(seconds=s.rng.randrange(1800))
+    await s.step("check in", "POST", "/employees/attendance", json_body={
+        "employee_id": employee_id, "date": check_in.date(), "check_in": check_in})
+    await s.step("read attendance", "GET", f"/employees/attendance?employee_id={employee_id}&limit=10")
+
+
+SCENARIOS: Dict[str, Callable[[Session], Awaitable[None]]] = {
+    "browse": browse, "order": order, "journal": journal, "login": login, "attendance": attendance,
+}
+
+
+def mixed(weights: Dict[str, int]) -> Callable[[Session], Awaitable[None]]:
+    names, cumulative = list(weights), list(weights.values())
+
+    async def run(s: Session) -> None:
+        await SCENARIOS[s.rng.choices(names, weights=cumulative)[0]](s)
+
+    return run
+
+
+# ---- running ----
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, min(len(sorted_values) - 1, round(q * len(sorted_values)) - 1))]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def run_scenario(client, name: str, scenario: Callable[[Session], Awaitable[None]], *,
+                       iterations: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    recorder = Recorder()
+    pending = iter(range(iterations))
+
+    async def user() -> None:
+        for iteration in pending:
+            # Same seed + iteration -> same requests, independent of which user runs it
+            await scenario(Session(client, recorder, random.Random(f"{seed}:{name}:{iteration}")))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    every = [latency for latencies in recorder.steps.values() for latency in latencies]
+    result = {"iterations": iterations, "seconds": round(elapsed, 2),
+              **summarize(every, sum(recorder.errors.values()), elapsed), "statuses": recorder.statuses}
+    result["steps"] = {step: summarize(latencies, recorder.errors.get(step, 0), elapsed)
+                       for step, latencies in recorder.steps.items()}
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command: List[str]) -> Tuple[subprocess.Popen, str]:
+    """``python -m <command> --host/--port`` in the scratch directory; returns once it accepts connections"""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", *command, "--host", "127.0.0.1", "--port", str(port)],
+        cwd=WORKDIR, env={**os.environ, "PYTHONPATH": REPO},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return server, base_url
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError(f"{command[0]} exited during startup")
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"{command[0]} did not start within 60s")
+
+
+def start_uvicorn(workers: int) -> Tuple[subprocess.Popen, str]:
+    return start_server(["uvicorn", "app.main:app", "--workers", str(workers), "--log-level", "warning",
+                         "--no-access-log"])
+
+
+async def run_all(args: argparse.Namespace, plan: List[Tuple[str, Callable, int]]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+
+    async def run_plan(client) -> None:
+        for name, scenario, iterations in plan:
+            results[name] = await run_scenario(client, name, scenario, iterations=iterations,
+                                               concurrency=args.concurrency, seed=args.seed)
+            r = results[name]
+            print(f"{name:<12}{r['requests']:>9}{r['rps']:>9.0f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+                  f"{r['p99_ms']:>9.1f}{r['error_rate'] * 100:>8.2f}%")
+
+    print(f"{'scenario':<12}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}")
+    if args.target == "asgi":
+        from app.main import app
+
+        async with app.router.lifespan_context(app):
+            await run_plan(AsgiClient(app))
+    else:
+        server, base_url = start_uvicorn(args.workers)
+        client = HttpClient(base_url, args.concurrency)
+        try:
+            await run_plan(client)
+        finally:
+            await client.close()
+            server.terminate()
+            server.wait(30)
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of this run against ``baseline`` (p95 latency, throughput, error rate)"""
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']} req/s vs baseline {base['rps']} req/s")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {current['error_rate']:.2%} vs baseline {base['error_rate']:.2%}")
+    return regressions
+
+
+def parse_mix(raw: str) -> Dict[str, int]:
+    weights = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario in --mix: {name!r}")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200, help="per scenario; login runs a fifth (bcrypt)")
+    parser.add_argument("--mix", default="browse=60,order=20,journal=10,login=5,attendance=5")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="loadtest.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+    args.output = os.path.join(INVOKED_FROM, args.output)
+    if args.baseline:
+        args.baseline = os.path.join(INVOKED_FROM, args.baseline)
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    plan = [(name, SCENARIOS[name], max(1, args.iterations // 5) if name == "login" else args.iterations)
+            for name in names]
+    if args.mix:
+        plan.append(("mix", mixed(parse_mix(args.mix)), args.iterations))
+
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    logging.getLogger("app.core.profiler").setLevel(logging.ERROR)
+    seed()
+    print(f"target {args.target}, concurrency {args.concurrency}, seed {args.seed}")
+    results = asyncio.run(run_all(args, plan))
+    report = {
+        "config": {"target": args.target, "workers": args.workers, "concurrency": args.concurrency,
+                   "iterations": args.iterations, "mix": args.mix, "seed": args.seed},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "scenarios": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differs = {key: value for key, value in baseline.get("config", {}).items() if report["config"].get(key) != value}
+        if differs:
+            print(f"warning: baseline was recorded with {differs}; numbers may not be comparable")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
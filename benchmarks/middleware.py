@@ -0,0 +1,109 @@
+"""Compare the legacy BaseHTTPMiddleware stack with the pure ASGI middleware.
+
+Usage: python -m benchmarks.middleware [--requests 5000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import time
+from decimal import Decimal
+from typing import Callable
+
+from benchmarks._asgi import measure, print_table, use_scratch_database
+
+use_scratch_database()
+
+from fastapi import FastAPI  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+from app.api.v1.api import api_router  # noqa: E402
+from app.core import middleware  # noqa: E402
+from app.core.config import get_settings  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.main import health_check  # noqa: E402
+from app.models.models import Product  # noqa: E402
+
+settings = get_settings()
+
+
+# ---- The stack as it was before the pure ASGI rewrite ----
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Content-Security-Policy"] = middleware.SecurityHeadersMiddleware.CSP
+        if request.url.path.startswith("/api/"):
+            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+            response.headers["Pragma"] = "no-cache"
+            response.headers["Expires"] = "0"
+        return response
+
+
+class LegacyPerformanceMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        start_time = time.time()
+        request_id = f"{int(time.time() * 1000000)}"
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+class LegacyDatabaseConnectionMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        if hasattr(request.state, 'db_pool_size'):
+            request.state.db_pool_size = min(20, request.state.db_pool_size + 1)
+        else:
+            request.state.db_pool_size = 1
+        return await call_next(request)
+
+
+def build_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+    app.add_api_route("/health", health_check, methods=["GET"])
+    middleware.add_cors_middleware(app)
+    middleware.add_compression_middleware(app)
+    if legacy:
+        app.add_middleware(LegacySecurityHeadersMiddleware)
+        app.add_middleware(LegacyPerformanceMiddleware)
+        app.add_middleware(LegacyDatabaseConnectionMiddleware)
+    else:
+        middleware.add_custom_middleware(app)
+    return app
+
+
+def seed_products(count: int = 100) -> None:
+    with engine.begin() as conn:
+        ensure_schema(conn)
+    with SessionLocal() as db:
+        db.add_all(
+            Product(sku=f"BENCH-{i:05d}", name=f"Bench product {i}", unit_price=Decimal("9.99"))
+            for i in range(count)
+        )
+        db.commit()
+
+
+async def main(requests: int, concurrency: int) -> None:
+    seed_products()
+    apps = {"BaseHTTPMiddleware (before)": build_app(legacy=True), "pure ASGI (after)": build_app(legacy=False)}
+    for path in ("/health", f"{settings.API_V1_STR}/products/?limit=20"):
+        rows = []
+        for name, app in apps.items():
+            rows.append((name, await measure(app, "GET", path, requests=requests, concurrency=concurrency)))
+        print_table(f"GET {path}  ({requests} requests, concurrency {concurrency})", rows,
+                    baseline="BaseHTTPMiddleware (before)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
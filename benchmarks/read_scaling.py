@@ -0,0 +1,101 @@
+"""Read throughput through the pre-fork server as workers are added, alone and beside writes.
+
+GET handlers use the read-only connection pool (``mode=ro``). In WAL mode
+those readers run in parallel with the single writer, so read throughput
+should grow with worker processes up to the core count and hold up while
+orders are being written. For every ``--workers`` value the load harness's
+``browse`` scenario runs alone, then together with its ``order`` scenario.
+
+The client shares the machine and needs a core of its own, so on N cores
+expect gains up to about N - 1 workers.
+
+Usage: python -m benchmarks.read_scaling [--workers 1,2,4] [--concurrency 64] [--writers 8] [--iterations 300]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.loadtest import HttpClient, browse, order, run_scenario, seed, start_server
+
+
+def default_workers() -> str:
+    """1, 2, 4, ... up to the core count"""
+    cores = os.cpu_count() or 1
+    counts, n = {cores}, 1
+    while n < cores:
+        counts.add(n)
+        n *= 2
+    if cores == 1:
+        counts.add(2)  # Still shows what a second process costs on one core
+    return ",".join(str(c) for c in sorted(counts))
+
+
+async def wait_ready(client: HttpClient, timeout: float = 60) -> None:
+    """The socket accepts before the workers finish starting; wait for a real response"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.client.get("/health")
+            if response.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def measure(workers: int, args: argparse.Namespace) -> Dict[str, Any]:
+    server, base_url = start_server(["app.server", "--workers", str(workers), "--max-requests", "0",
+                                     "--log-level", "warning"])
+    client = HttpClient(base_url, args.concurrency + args.writers)
+    try:
+        await wait_ready(client)
+        await run_scenario(client, "warmup", browse, iterations=args.concurrency, concurrency=args.concurrency,
+                           seed=0)
+        reads = await run_scenario(client, "browse", browse, iterations=args.iterations,
+                                   concurrency=args.concurrency, seed=args.seed)
+        mixed_reads, writes = await asyncio.gather(
+            run_scenario(client, "browse", browse, iterations=args.iterations, concurrency=args.concurrency,
+                         seed=args.seed + 1),
+            run_scenario(client, "order", order, iterations=args.iterations // 2, concurrency=args.writers,
+                         seed=args.seed),
+        )
+    finally:
+        await client.close()
+        server.terminate()
+        server.wait(60)
+    return {"reads": reads, "mixed_reads": mixed_reads, "writes": writes}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default=default_workers(), help="comma-separated worker counts")
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent readers")
+    parser.add_argument("--writers", type=int, default=8, help="concurrent order writers in the mixed run")
+    parser.add_argument("--iterations", type=int, default=300, help="browse sessions (4 GETs each) per run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    counts: List[int] = [int(part) for part in args.workers.split(",") if part.strip()]
+
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    seed()
+    print(f"{os.cpu_count()} cores, {args.concurrency} readers, {args.writers} writers in the mixed run")
+    print(f"{'workers':>8}{'reads/s':>10}{'p95 ms':>9}{'| mixed reads/s':>16}{'p95 ms':>9}{'writes/s':>10}"
+          f"{'errors':>8}")
+    failed = False
+    for workers in counts:
+        result = asyncio.run(measure(workers, args))
+        reads, mixed_reads, writes = result["reads"], result["mixed_reads"], result["writes"]
+        errors = reads["errors"] + mixed_reads["errors"] + writes["errors"]
+        failed |= errors > 0
+        print(f"{workers:>8}{reads['rps']:>10.0f}{reads['p95_ms']:>9.1f}{mixed_reads['rps']:>16.0f}"
+              f"{mixed_reads['p95_ms']:>9.1f}{writes['rps']:>10.0f}{errors:>8}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Paginated totals: COUNT(*) vs the maintained row counters.
+
+Usage: python -m benchmarks.row_counts [--rows 200000] [--loops 200]
+"""
+import argparse
+import logging
+import time
+from decimal import Decimal
+
+from benchmarks._asgi import use_scratch_database
+
+use_scratch_database()
+
+from sqlalchemy import func, insert  # noqa: E402
+
+from app.core.counts import get_count, reconcile_counts  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.models.models import Category, Product  # noqa: E402
+
+
+def seed(rows: int) -> None:
+    with engine.begin() as conn:
+        ensure_schema(conn)
+        conn.execute(insert(Category), [{"name": f"Category {i}"} for i in range(20)])
+        conn.execute(insert(Product), [
+            {"sku": f"SKU-{i:07d}", "name": f"Product {i}", "unit_price": Decimal("9.99"),
+             "category_id": 1 + i % 20, "is_active": i % 3 != 0}
+            for i in range(rows)
+        ])
+        reconcile_counts(conn)
+
+
+def timed(fn, loops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return (time.perf_counter() - started) / loops * 1000
+
+
+def main(rows: int, loops: int) -> None:
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    seed(rows)
+    print(f"{'total':<26}{'COUNT(*) ms':>13}{'counter ms':>12}{'speedup':>9}")
+    with SessionLocal() as db:
+        cases = (
+            ("all products", (), (None, None)),
+            ("products in category 7", (Product.category_id == 7,), ("category_id", 7)),
+            ("active products", (Product.is_active == True,), ("is_active", True)),  # noqa: E712
+        )
+        for name, clauses, (column, value) in cases:
+            scan = lambda: db.query(func.count()).select_from(Product).filter(*clauses).scalar()  # noqa: E731
+            counter = lambda: get_count(db, Product, column, value)  # noqa: E731
+            assert scan() == counter(), f"{name}: counter disagrees with COUNT(*)"
+            scan_ms, counter_ms = timed(scan, loops), timed(counter, loops)
+            print(f"{name:<26}{scan_ms:>13.3f}{counter_ms:>12.3f}{scan_ms / counter_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--loops", type=int, default=200)
+    args = parser.parse_args()
+    main(args.rows, args.loops)
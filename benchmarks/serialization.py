@@ -0,0 +1,114 @@
+"""List-endpoint serialization: FastAPI's default response_model path vs FastJSONRoute.
+
+Usage: python -m benchmarks.serialization [--rows 100] [--requests 2000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List
+
+from benchmarks._asgi import asgi_request, measure, print_table, use_scratch_database
+
+use_scratch_database()
+
+from fastapi import APIRouter, FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from app import crud, schemas  # noqa: E402
+from app.api.v1.endpoints import orders, products  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.core.serialization import dump_json, get_type_adapter  # noqa: E402
+from app.models.models import Category, Company, Product, SalesOrder, SalesOrderItem  # noqa: E402
+
+
+def seed(rows: int) -> None:
+    with engine.begin() as conn:
+        ensure_schema(conn)
+    with SessionLocal() as db:
+        category = Category(name="Hardware")
+        company = Company(name="Acme")
+        db.add_all([category, company])
+        db.flush()
+        db.add_all(
+            Product(sku=f"SKU-{i:05d}", name=f"Product {i}", description="A fairly long description " * 8,
+                    unit_price=Decimal("19.99") + i, cost_price=Decimal("7.25"), category_id=category.id)
+            for i in range(rows)
+        )
+        db.flush()
+        for i in range(rows):
+            order = SalesOrder(company_id=company.id, order_date=date(2025, 1, 1) + timedelta(days=i),
+                               notes="Deliver before noon")
+            order.items = [SalesOrderItem(product_id=1 + (i + k) % rows, quantity=k + 1,
+                                          unit_price=Decimal("19.99")) for k in range(3)]
+            db.add(order)
+        db.commit()
+
+
+def default_router(fast_router: APIRouter) -> APIRouter:
+    """Same endpoints, registered with FastAPI's stock APIRoute"""
+    router = APIRouter()
+    for route in fast_router.routes:
+        router.add_api_route(route.path, getattr(route.endpoint, "__wrapped__", route.endpoint),
+                             response_model=route.response_model, methods=list(route.methods))
+    return router
+
+
+def build_app(fast: bool) -> FastAPI:
+    app = FastAPI()
+    for prefix, module in (("/products", products), ("/orders", orders)):
+        router = module.router if fast else default_router(module.router)
+        app.include_router(router, prefix=f"/api/v1{prefix}")
+    return app
+
+
+async def micro(rows: int, loops: int = 200) -> None:
+    """Serialization alone, per 100-row page, excluding the DB query"""
+    print(f"\nSerialization only ({rows} rows, mean of {loops} loops)")
+    print(f"{'payload':<20}{'FastAPI ms':>12}{'TypeAdapter ms':>16}{'speedup':>9}")
+    with SessionLocal() as db:
+        cases = (
+            ("List[ProductRead]", List[schemas.ProductRead], crud.product.get_multi(db, limit=rows)),
+            ("List[SalesOrderRead]", List[schemas.SalesOrderRead], crud.sales_order.get_multi(db, limit=rows)),
+        )
+        for name, tp, objs in cases:
+            field = create_model_field(name="Response", type_=tp, mode="serialization")
+            started = time.perf_counter()
+            for _ in range(loops):
+                content = await serialize_response(field=field, response_content=objs, is_coroutine=True)
+                JSONResponse(content).body
+            default_ms = (time.perf_counter() - started) / loops * 1000
+            adapter = get_type_adapter(tp)
+            started = time.perf_counter()
+            for _ in range(loops):
+                dump_json(adapter, objs)
+            fast_ms = (time.perf_counter() - started) / loops * 1000
+            print(f"{name:<20}{default_ms:>12.3f}{fast_ms:>16.3f}{default_ms / fast_ms:>8.2f}x")
+
+
+async def main(rows: int, requests: int, concurrency: int) -> None:
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    seed(rows)
+    await micro(rows)
+    apps = {"FastAPI response_model": build_app(fast=False), "FastJSONRoute": build_app(fast=True)}
+    for path in (f"/api/v1/products/?limit={rows}", f"/api/v1/orders/?limit={rows}"):
+        bodies = {name: (await asgi_request(app, "GET", path))[2] for name, app in apps.items()}
+        assert len(set(bodies.values())) == 1, f"{path}: serializers disagree"
+        rows_out = []
+        for name, app in apps.items():
+            rows_out.append((name, await measure(app, "GET", path, requests=requests, concurrency=concurrency)))
+        print_table(f"GET {path}", rows_out, baseline="FastAPI response_model")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests, args.concurrency))
@@ -0,0 +1,77 @@
+"""Sparse fieldsets: full list responses vs ``?fields=`` selections (bytes on the wire and throughput).
+
+Usage: python -m benchmarks.sparse_fields [--rows 100] [--requests 2000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks._asgi import asgi_request, measure, print_table, use_scratch_database
+
+use_scratch_database()
+
+from fastapi import FastAPI  # noqa: E402
+
+from app.api.v1.endpoints import orders, products  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.models.models import Category, Company, Product, SalesOrder, SalesOrderItem  # noqa: E402
+
+CASES = (
+    ("products", "/api/v1/products/?limit={rows}", "id,sku,name,unit_price"),
+    ("orders", "/api/v1/orders/?limit={rows}", "id,order_date,items.product_id"),
+)
+
+
+def seed(rows: int) -> None:
+    with engine.begin() as conn:
+        ensure_schema(conn)
+    with SessionLocal() as db:
+        category = Category(name="Hardware")
+        company = Company(name="Acme")
+        db.add_all([category, company])
+        db.flush()
+        db.add_all(
+            Product(sku=f"SKU-{i:05d}", name=f"Product {i}", description="A fairly long description " * 8,
+                    unit_price=Decimal("19.99") + i, cost_price=Decimal("7.25"), category_id=category.id)
+            for i in range(rows)
+        )
+        db.flush()
+        for i in range(rows):
+            order = SalesOrder(company_id=company.id, order_date=date(2025, 1, 1) + timedelta(days=i),
+                               notes="Deliver before noon, ring the bell twice")
+            order.items = [SalesOrderItem(product_id=1 + (i + k) % rows, quantity=k + 1,
+                                          unit_price=Decimal("19.99")) for k in range(3)]
+            db.add(order)
+        db.commit()
+
+
+async def main(rows: int, requests: int, concurrency: int) -> None:
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    seed(rows)
+    app = FastAPI()
+    app.include_router(products.router, prefix="/api/v1/products")
+    app.include_router(orders.router, prefix="/api/v1/orders")
+
+    for name, path, fields in CASES:
+        full_path = path.format(rows=rows)
+        sparse_path = f"{full_path}&fields={fields}"
+        full_bytes = len((await asgi_request(app, "GET", full_path))[2])
+        sparse_bytes = len((await asgi_request(app, "GET", sparse_path))[2])
+        print(f"\n{name}: {full_bytes} bytes full, {sparse_bytes} bytes with fields={fields} "
+              f"({sparse_bytes / full_bytes:.0%})")
+        print_table(f"GET {full_path}", [
+            ("full", await measure(app, "GET", full_path, requests=requests, concurrency=concurrency)),
+            ("sparse", await measure(app, "GET", sparse_path, requests=requests, concurrency=concurrency)),
+        ], baseline="full")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests, args.concurrency))
@@ -0,0 +1,94 @@
+"""Per-call cost of the hot CRUD lookups: ``db.query(...)`` built per call vs the prebuilt statements.
+
+Both variants run the same SQL against the same rows on one session, so
+the difference is the Python work before SQLite sees the statement (Query
+construction, conversion and cache-key generation). Also prints the
+engine's compiled-cache hit rate over the run.
+
+Usage: python -m benchmarks.statement_cache [--calls 5000] [--rows 1000]
+"""
+import argparse
+import time
+from decimal import Decimal
+
+from benchmarks._asgi import use_scratch_database
+
+use_scratch_database()
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.metrics import DB_STATEMENT_CACHE  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.models.models import Category, Product, User  # noqa: E402
+
+
+def seed(rows: int) -> None:
+    with engine.begin() as conn:
+        ensure_schema(conn)
+        conn.execute(insert(Category), [{"name": f"Category {i}"} for i in range(10)])
+        conn.execute(insert(Product), [{"sku": f"SKU-{i:05d}", "name": f"Product {i}", "unit_price": Decimal("9.99"),
+                                        "category_id": 1 + i % 10} for i in range(rows)])
+        conn.execute(insert(User), [{"email": f"user{i}@example.com", "hashed_password": "x"} for i in range(rows)])
+
+
+# The same lookups as they were written before app.core.statements
+LEGACY = {
+    "get": lambda db, i: db.query(Product).filter(Product.id == i).first(),
+    "get_by_sku": lambda db, i: db.query(Product).filter(Product.sku == f"SKU-{i - 1:05d}").first(),
+    "get_by_email": lambda db, i: db.query(User).filter(User.email == f"user{i - 1}@example.com").first(),
+    "get_multi": lambda db, i: db.query(Product).offset(i % 50).limit(20).all(),
+    "get_by_category": lambda db, i: db.query(Product).filter(Product.category_id == 1 + i % 10)
+    .offset(0).limit(20).all(),
+}
+
+PREBUILT = {
+    "get": lambda db, i: crud.product.get(db, id=i),
+    "get_by_sku": lambda db, i: crud.product.get_by_sku(db, sku=f"SKU-{i - 1:05d}"),
+    "get_by_email": lambda db, i: crud.user.get_by_email(db, email=f"user{i - 1}@example.com"),
+    "get_multi": lambda db, i: crud.product.get_multi(db, skip=i % 50, limit=20),
+    "get_by_category": lambda db, i: crud.product.get_by_category(db, category_id=1 + i % 10, limit=20),
+}
+
+
+def per_call_us(fn, calls: int, rows: int) -> float:
+    with SessionLocal() as db:
+        for i in range(200):  # Warm the compiled cache and the page cache
+            fn(db, 1 + i % rows)
+        started = time.perf_counter()
+        for i in range(calls):
+            fn(db, 1 + i % rows)
+        return (time.perf_counter() - started) / calls * 1e6
+
+
+def cache_counts() -> dict:
+    counts = {"hit": 0, "miss": 0, "uncached": 0}
+    for (engine_name, result), value in DB_STATEMENT_CACHE.samples().items():
+        if engine_name == "sync":
+            counts[result] += value
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+    seed(args.rows)
+
+    before = cache_counts()
+    print(f"{'lookup':<18}{'query() us':>12}{'prebuilt us':>13}{'saved':>8}")
+    for name in LEGACY:
+        legacy = per_call_us(LEGACY[name], args.calls, args.rows)
+        prebuilt = per_call_us(PREBUILT[name], args.calls, args.rows)
+        print(f"{name:<18}{legacy:>12.1f}{prebuilt:>13.1f}{1 - prebuilt / legacy:>8.0%}")
+    after = cache_counts()
+    delta = {key: after[key] - before[key] for key in after}
+    total = sum(delta.values()) or 1
+    print(f"compiled cache: {delta['hit']:.0f} hits, {delta['miss']:.0f} misses, "
+          f"{delta['uncached']:.0f} uncached ({delta['hit'] / total:.1%} hit rate)")
+
+
+if __name__ == "__main__":
+    main()
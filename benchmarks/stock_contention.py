@@ -0,0 +1,146 @@
+"""Thousands of concurrent orders racing for a handful of SKUs: oversell check and throughput.
+
+Every order goes through ``crud.sales_order.create_with_items`` from its own
+thread and session, as the endpoint does. Afterwards, per SKU, the remaining
+balance plus the reserved quantity must equal the opening stock and the
+number of accepted orders must equal what the stock could cover. The naive
+variant (read the balance, then write it back) runs the same load to show
+what the single conditional UPDATE prevents. Exits non-zero if the
+reservation path oversells or loses stock.
+
+Usage: python -m benchmarks.stock_contention [--orders 4000] [--skus 5] [--stock 300] [--threads 64]
+"""
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Tuple
+
+from benchmarks._asgi import use_scratch_database
+
+use_scratch_database()
+
+from sqlalchemy import func, insert, select, update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.schema import ensure_schema  # noqa: E402
+from app.core.writer import write_queue  # noqa: E402
+from app.crud.orders import OrderValidationError  # noqa: E402
+from app.models.models import Company, Product, StockBalance, StockReservation, Warehouse  # noqa: E402
+from app.schemas.schemas import SalesOrderCreate  # noqa: E402
+
+
+def seed(skus: int, stock: int) -> None:
+    with engine.begin() as conn:
+        ensure_schema(conn)
+        conn.execute(insert(Company), [{"name": "Bench"}])
+        conn.execute(insert(Warehouse), [{"name": "Main"}])
+        conn.execute(insert(Product), [
+            {"sku": f"HOT-{i}", "name": f"Hot product {i}", "unit_price": Decimal("5.00")} for i in range(skus)])
+        conn.execute(insert(StockBalance), [
+            {"product_id": i + 1, "warehouse_id": 1, "available": stock} for i in range(skus)])
+
+
+def reset(skus: int, stock: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(StockReservation.__table__.delete())
+        conn.execute(update(StockBalance).values(available=stock))
+
+
+def order(product_id: int) -> SalesOrderCreate:
+    return SalesOrderCreate(company_id=1, order_date=date(2025, 3, 31),
+                            items=[{"product_id": product_id, "quantity": 1}])
+
+
+def reserve_naively(product_id: int) -> bool:
+    """Read-then-write on the balance, each step its own statement"""
+    with SessionLocal() as db:
+        available = db.scalar(select(StockBalance.available).where(StockBalance.product_id == product_id))
+        if available < 1:
+            return False
+        try:
+            db.execute(update(StockBalance).where(StockBalance.product_id == product_id)
+                       .values(available=available - 1))
+            db.commit()
+        except OperationalError:  # database is locked
+            return False
+        return True
+
+
+def reserve_with_order(product_id: int) -> bool:
+    with SessionLocal() as db:
+        try:
+            crud.sales_order.create_with_items(db, obj_in=order(product_id))
+        except OrderValidationError:
+            return False
+        return True
+
+
+def run(reserve, orders: int, skus: int, threads: int) -> Tuple[float, Dict[int, int]]:
+    accepted: Dict[int, int] = {i + 1: 0 for i in range(skus)}
+
+    def one(n: int) -> Tuple[int, bool]:
+        product_id = 1 + n % skus
+        return product_id, reserve(product_id)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for product_id, ok in pool.map(one, range(orders)):
+            accepted[product_id] += ok
+    return orders / (time.perf_counter() - started), accepted
+
+
+def audit(accepted: Dict[int, int], stock: int) -> Tuple[int, int]:
+    """(oversold units, SKUs whose books do not balance)"""
+    with SessionLocal() as db:
+        left = dict(db.execute(select(StockBalance.product_id, StockBalance.available)).all())
+        held = dict(db.execute(select(StockReservation.product_id, func.sum(StockReservation.quantity))
+                               .group_by(StockReservation.product_id)).all())
+    oversold = sum(max(count - stock, 0) for count in accepted.values())
+    unbalanced = sum(1 for product_id, count in accepted.items()
+                     if left[product_id] + held.get(product_id, 0) != stock or held.get(product_id, 0) != count)
+    return oversold, unbalanced
+
+
+def main(orders: int, skus: int, stock: int, threads: int) -> int:
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    logging.getLogger("app.crud.orders").setLevel(logging.ERROR)
+    seed(skus, stock)
+    print(f"{orders} orders from {threads} threads on {skus} SKUs with {stock} units each")
+    print(f"{'variant':<28}{'orders/s':>10}{'accepted':>10}{'oversold':>10}")
+
+    naive_rate, naive = run(reserve_naively, orders, skus, threads)
+    naive_sold = sum(naive.values())
+    with SessionLocal() as db:
+        naive_left = db.scalar(select(func.sum(StockBalance.available)))
+    # Read-then-write loses updates: more orders accepted than units actually left the balance
+    print(f"{'read-then-write':<28}{naive_rate:>10.0f}{naive_sold:>10}{naive_sold - (skus * stock - naive_left):>10}")
+
+    reset(skus, stock)
+    rate, accepted = run(reserve_with_order, orders, skus, threads)
+    oversold, unbalanced = audit(accepted, stock)
+    print(f"{'conditional UPDATE':<28}{rate:>10.0f}{sum(accepted.values()):>10}{oversold:>10}")
+    write_queue.stop()
+
+    expected = min(orders // skus, stock) * skus
+    if oversold or unbalanced or sum(accepted.values()) != expected:
+        print(f"FAILED: {oversold} units oversold, {unbalanced} SKUs out of balance, "
+              f"{sum(accepted.values())} orders accepted (expected {expected})")
+        return 1
+    print("no oversell: available + reserved equals the opening stock for every SKU")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=4000)
+    parser.add_argument("--skus", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+    sys.exit(main(args.orders, args.skus, args.stock, args.threads))
@@ -0,0 +1,93 @@
+"""Journal-entry throughput under many concurrent writers: direct commits vs the single-writer queue.
+
+Every writer thread posts entries through ``crud.journal_entry.create_with_lines``,
+as the endpoint does. With the queue disabled each thread commits on its own
+pooled connection; enabled, the writer thread group-commits them. Exits
+non-zero if the queued run loses or fails any write.
+
+Usage: python -m benchmarks.write_queue [--writers 200] [--entries 10]
+"""
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+
+from benchmarks._asgi import use_scratch_database
+
+use_scratch_database()
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.core.writer import WRITE_COMMITS, write_queue  # noqa: E402
+from app.models.models import Account, Base, JournalEntry  # noqa: E402
+from app.schemas.schemas import JournalEntryCreate  # noqa: E402
+
+
+def entry() -> JournalEntryCreate:
+    return JournalEntryCreate(date=date(2025, 3, 31), narration="bench", lines=[
+        {"account_id": 1, "debit": Decimal("10.00")},
+        {"account_id": 2, "credit": Decimal("10.00")},
+    ])
+
+
+def run(queued: bool, writers: int, entries: int):
+    write_queue.enabled = queued
+    commits_before = sum(WRITE_COMMITS.samples().values())
+
+    def writer(_: int) -> int:
+        failures = 0
+        for _ in range(entries):
+            # One session per entry, like one per request
+            with SessionLocal() as db:
+                try:
+                    crud.journal_entry.create_with_lines(db, obj_in=entry())
+                except Exception:
+                    failures += 1
+        return failures
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(writers) as pool:
+        failures = sum(pool.map(writer, range(writers)))
+    elapsed = time.perf_counter() - started
+    commits = sum(WRITE_COMMITS.samples().values()) - commits_before
+    return (writers * entries - failures) / elapsed, failures, commits
+
+
+def main(writers: int, entries: int) -> int:
+    logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add_all([Account(name="Cash", code="1000", account_type="Asset"),
+                    Account(name="Sales", code="4000", account_type="Revenue")])
+        db.commit()
+
+    total = writers * entries
+    print(f"{writers} concurrent writers x {entries} journal entries")
+    print(f"{'mode':<22}{'entries/s':>10}{'failed':>8}{'commits':>9}")
+    direct = run(False, writers, entries)
+    print(f"{'direct commits':<22}{direct[0]:>10.0f}{direct[1]:>8}{total - direct[1]:>9}")
+    queued = run(True, writers, entries)
+    print(f"{'single-writer queue':<22}{queued[0]:>10.0f}{queued[1]:>8}{queued[2]:>9}")
+    print(f"speed-up {queued[0] / direct[0]:.2f}x, {total / max(queued[2], 1):.1f} entries per commit")
+    write_queue.stop()
+
+    with SessionLocal() as db:
+        stored = db.scalar(select(func.count()).select_from(JournalEntry))
+    expected = 2 * total - direct[1]
+    if queued[1] or stored != expected:
+        print(f"FAIL: {queued[1]} queued writes failed, {stored} entries stored, expected {expected}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=200)
+    parser.add_argument("--entries", type=int, default=10)
+    args = parser.parse_args()
+    sys.exit(main(args.writers, args.entries))